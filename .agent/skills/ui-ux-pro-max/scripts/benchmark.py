@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+UI/UX Pro Max Benchmark - search engine timings on a synthetic corpus
+Usage: python benchmark.py bm25 [--docs 100000] [--queries 200]
+       python benchmark.py cache [--docs 100000]
+       python benchmark.py server [--queries 2000]
+       python benchmark.py many [--docs 100000] [--queries 200]
+       python benchmark.py tokenize [--repeat 20]
+       python benchmark.py quality [--samples 3]
+"""
+
+import argparse
+import csv
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import core
+from core import BM25, BM25F, CSV_CONFIG, DATA_DIR, Tokenizer, search, search_many
+from client import SearchClient
+from server import make_server
+
+
+def synthetic_corpus(n_docs, vocab_size=20000, seed=42):
+    """Documents shaped like the CSV rows: a few short fields, Zipf-ish word frequencies"""
+    rnd = random.Random(seed)
+    vocab = [f"term{i:05d}" for i in range(vocab_size)]
+    weights = [1 / (i + 1) for i in range(vocab_size)]
+    return [" ".join(rnd.choices(vocab, weights, k=rnd.randint(8, 60))) for _ in range(n_docs)], vocab
+
+
+def legacy_score(bm25, corpus_tokens, query):
+    """Previous scoring path: every document, term frequencies rebuilt per query"""
+    query_tokens = bm25.tokenize(query)
+    scores = []
+    for idx, doc in enumerate(corpus_tokens):
+        score = 0
+        doc_len = len(doc)
+        term_freqs = defaultdict(int)
+        for word in doc:
+            term_freqs[word] += 1
+        for token in query_tokens:
+            if token in bm25.idf:
+                tf = term_freqs[token]
+                numerator = tf * (bm25.k1 + 1)
+                denominator = tf + bm25.k1 * (1 - bm25.b + bm25.b * doc_len / bm25.avgdl)
+                score += bm25.idf[token] * numerator / denominator
+        scores.append((idx, score))
+    return sorted(scores, key=lambda x: x[1], reverse=True)
+
+
+def bench_bm25(n_docs, n_queries, legacy_queries):
+    docs, vocab = synthetic_corpus(n_docs)
+    rnd = random.Random(7)
+    queries = [" ".join(rnd.choices(vocab[:5000], k=rnd.randint(1, 4))) for _ in range(n_queries)]
+
+    bm25 = BM25()
+    start = time.perf_counter()
+    bm25.fit(docs)
+    print(f"{n_docs} docs, {len(bm25.postings)} terms, fit {time.perf_counter() - start:.2f} s")
+
+    start = time.perf_counter()
+    for q in queries:
+        bm25.score(q, top_k=3)
+    indexed = (time.perf_counter() - start) / n_queries
+
+    corpus_tokens = [bm25.tokenize(d) for d in docs]
+    start = time.perf_counter()
+    for q in queries[:legacy_queries]:
+        legacy = legacy_score(bm25, corpus_tokens, q)[:3]
+        top = bm25.score(q, top_k=3)
+        assert [i for i, s in legacy if s > 0] == [i for i, _ in top], q
+    full_scan = (time.perf_counter() - start) / legacy_queries
+
+    print(f"  full scan (previous)   {1000 * full_scan:9.2f} ms/query")
+    print(f"  postings + heap top-3  {1000 * indexed:9.2f} ms/query")
+
+
+def bench_cache(n_docs):
+    """Cold search (parse CSV + fit) vs warm on-disk cache vs in-process index"""
+    docs, _ = synthetic_corpus(n_docs)
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = Path(tmp) / "synthetic.csv"
+        with open(filepath, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Category", "Keywords", "Description"])
+            for i, doc in enumerate(docs):
+                words = doc.split()
+                writer.writerow([f"cat{i % 50}", " ".join(words[:5]), " ".join(words[5:])])
+
+        core.CACHE_DIR = Path(tmp) / "cache"
+        cols = ["Category", "Keywords", "Description"]
+        timings = []
+        for label in ("cold (parse + fit)", "disk cache", "in-process"):
+            if label == "disk cache":
+                core._indexes.clear()
+            start = time.perf_counter()
+            core._search_csv(filepath, cols, cols, "term00001 term00042", 3)
+            timings.append((label, time.perf_counter() - start))
+
+        size = sum(p.stat().st_size for p in core.CACHE_DIR.glob("*.pickle"))
+        print(f"{n_docs} rows, cache file {size / 1e6:.1f} MB")
+        for label, elapsed in timings:
+            print(f"  {label:20s} {1000 * elapsed:9.1f} ms")
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: 1000 * samples[min(len(samples) - 1, int(q * len(samples)))]
+    return f"p50 {pick(0.5):7.3f} ms  p99 {pick(0.99):7.3f} ms"
+
+
+def _cli(args, env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "search.py", *args], env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def bench_server(n_queries, cli_runs=10):
+    """Per-query latency over a persistent socket connection, and CLI wall time with/without the server"""
+    rnd = random.Random(11)
+    words = ["dark", "glass", "minimal", "saas", "dashboard", "form", "mobile", "chart", "font", "elegant",
+             "animation", "accessibility", "pricing", "hero", "fintech", "luxury", "playful", "grid"]
+    domains = list(CSV_CONFIG)
+    queries = [(" ".join(rnd.sample(words, rnd.randint(1, 3))), rnd.choice(domains)) for _ in range(n_queries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "search.sock"
+        server = make_server(path)
+        server.service.warm()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        with SearchClient(path) as client:
+            for label in ("cold LRU", "LRU hits"):
+                samples = []
+                for query, domain in queries:
+                    start = time.perf_counter()
+                    client.request({"query": query, "domain": domain})
+                    samples.append(time.perf_counter() - start)
+                print(f"  socket, {label:10s} {_percentiles(samples)}")
+
+        env = {**os.environ, "UIUX_SEARCH_SOCKET": str(path)}
+        args = ["dark glass dashboard", "--domain", "style"]
+        served = [_cli(args, env) for _ in range(cli_runs)]
+        local = [_cli(args + ["--no-server"], env) for _ in range(cli_runs)]
+        print(f"  CLI via server     {_percentiles(served)}")
+        print(f"  CLI in-process     {_percentiles(local)}")
+        server.shutdown()
+        server.server_close()
+
+
+def bench_many(n_docs, n_queries):
+    """search() in a loop vs search_many(), with and without NumPy"""
+    docs, vocab = synthetic_corpus(n_docs)
+    rnd = random.Random(5)
+    token_lists = [core.TOKENIZER(" ".join(rnd.choices(vocab[:5000], k=rnd.randint(1, 4)))) for _ in range(n_queries)]
+    bm25 = BM25()
+    bm25.fit(docs)
+
+    words = ["dark", "glass", "minimal", "saas", "dashboard", "form", "mobile", "chart", "font", "elegant"]
+    queries = [" ".join(rnd.sample(words, rnd.randint(1, 3))) for _ in range(n_queries)]
+    domains = list(CSV_CONFIG)
+
+    numpy = core._numpy()
+    variants = [("postings", None)] + ([("numpy matrix", numpy)] if numpy else [])
+    print(f"{n_queries} queries")
+    start = time.perf_counter()
+    for q in queries:
+        for d in domains:
+            search(q, d)
+    print(f"  shipped CSVs, search() loop {1000 * (time.perf_counter() - start):9.1f} ms")
+    start = time.perf_counter()
+    search_many(queries, domains=domains)
+    print(f"  shipped CSVs, search_many() {1000 * (time.perf_counter() - start):9.1f} ms")
+
+    # The synthetic index is large enough for the matrix path
+    for label, module in variants:
+        core._np = module
+        for run in ("first", "again"):
+            start = time.perf_counter()
+            bm25.score_many(token_lists, top_k=3)
+            print(f"  {n_docs} docs, score_many {label:12s} {run} {1000 * (time.perf_counter() - start):9.1f} ms")
+    core._np = numpy
+
+
+def legacy_tokenize(text):
+    """Previous BM25.tokenize"""
+    text = re.sub(r'[^\w\s]', ' ', str(text).lower())
+    return [w for w in text.split() if len(w) > 2]
+
+
+def bench_tokenize(repeat):
+    """Tokens/sec over every search field of the shipped CSVs"""
+    fields = []
+    for config in CSV_CONFIG.values():
+        for row in core._load_csv(DATA_DIR / config["file"]):
+            fields.extend(str(row.get(col, "")) for col in config["search_cols"])
+    n_tokens = repeat * sum(len(legacy_tokenize(f)) for f in fields)
+    print(f"{len(fields)} fields x {repeat}, {n_tokens} tokens")
+
+    variants = [
+        ("re.sub + split (previous)", legacy_tokenize),
+        ("precompiled, no cache", Tokenizer()._tokenize),
+        ("precompiled + memo", Tokenizer()),
+        ("+ stopwords + stemming", Tokenizer(stem=True, stopwords=True)._tokenize),
+        ("+ stopwords + stemming + memo", Tokenizer(stem=True, stopwords=True)),
+    ]
+    for label, tokenize in variants:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for field in fields:
+                tokenize(field)
+        elapsed = time.perf_counter() - start
+        print(f"  {label:30s} {n_tokens / elapsed / 1e6:6.2f} M tokens/s")
+
+
+# Candidate BM25F weights for `quality`; a domain's own "search_weights" in CSV_CONFIG
+# takes precedence. Copy a row into CSV_CONFIG only once it beats plain BM25 here
+CANDIDATE_WEIGHTS = {
+    "style": {"Style Category": 3.0, "Keywords": 2.0, "Best For": 1.0, "Type": 0.5},
+    "prompt": {"Style Category": 3.0, "AI Prompt Keywords (Copy-Paste Ready)": 1.0, "CSS/Technical Keywords": 1.0},
+    "color": {"Product Type": 3.0, "Keywords": 2.0, "Notes": 0.5},
+    "chart": {"Data Type": 3.0, "Keywords": 2.0, "Best Chart Type": 1.5, "Accessibility Notes": 0.5},
+    "landing": {"Pattern Name": 3.0, "Keywords": 2.0, "Conversion Optimization": 1.0, "Section Order": 0.5},
+    "product": {"Product Type": 3.0, "Keywords": 2.0, "Primary Style Recommendation": 1.0, "Key Considerations": 0.5},
+    "ux": {"Category": 2.0, "Issue": 3.0, "Description": 1.0, "Platform": 0.5},
+    "typography": {"Font Pairing Name": 3.0, "Category": 1.0, "Mood/Style Keywords": 2.0, "Best For": 1.5,
+                   "Heading Font": 1.0, "Body Font": 1.0},
+}
+
+
+def bench_quality(samples, seed=13):
+    """
+    Known-item precision: queries are 1-3 words sampled from one row, and that row should
+    come back in the top 3. "name/keywords" samples from the first two search columns
+    (what an agent types), "any field" from all of them. Plain BM25 over the joined
+    columns vs BM25F with the domain's search_weights (or CANDIDATE_WEIGHTS).
+    """
+    for scheme, n_cols in (("name/keywords", 2), ("any field", None)):
+        rnd = random.Random(seed)
+        print(f"{scheme} queries")
+        print(f"  {'domain':12s} {'queries':>7s}  {'BM25 hit@3':>10s}  {'BM25F hit@3':>11s}  {'BM25 MRR':>8s}  {'BM25F MRR':>9s}")
+        totals = defaultdict(float)
+        for domain, config in CSV_CONFIG.items():
+            weights = config.get("search_weights") or CANDIDATE_WEIGHTS.get(domain, {})
+            stats = _known_item(config, weights, n_cols, samples, rnd)
+            _print_quality(domain, stats)
+            for key, value in stats.items():
+                totals[key] += value
+        _print_quality("all", totals)
+
+
+def _known_item(config, weights, n_cols, samples, rnd):
+    cols = config["search_cols"]
+    rows = core._load_csv(DATA_DIR / config["file"])
+    plain = BM25()
+    plain.fit([" ".join(str(row.get(col, "")) for col in cols) for row in rows])
+    fielded = BM25F([weights.get(col, 1.0) for col in cols])
+    fielded.fit([[str(row.get(col, "")) for col in cols] for row in rows])
+
+    stats = defaultdict(float)
+    for doc_id, row in enumerate(rows):
+        words = sorted(set(core.TOKENIZER(" ".join(str(row.get(col, "")) for col in cols[:n_cols]))))
+        for _ in range(samples if words else 0):
+            query = " ".join(rnd.sample(words, min(len(words), rnd.randint(1, 3))))
+            stats["queries"] += 1
+            for name, bm25 in (("bm25", plain), ("bm25f", fielded)):
+                ranked = [idx for idx, _ in bm25.score(query, top_k=10)]
+                if doc_id in ranked:
+                    rank = ranked.index(doc_id) + 1
+                    stats[f"{name} hit@3"] += rank <= 3
+                    stats[f"{name} rr"] += 1 / rank
+    return stats
+
+
+def _print_quality(label, stats):
+    n = stats["queries"] or 1
+    print(f"  {label:12s} {int(stats['queries']):7d}  {stats['bm25 hit@3'] / n:10.3f}  {stats['bm25f hit@3'] / n:11.3f}"
+          f"  {stats['bm25 rr'] / n:8.3f}  {stats['bm25f rr'] / n:9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="UI Pro Max search benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p_bm25 = sub.add_parser("bm25", help="Query latency: postings vs full scan")
+    p_bm25.add_argument("--docs", type=int, default=100_000)
+    p_bm25.add_argument("--queries", type=int, default=200)
+    p_bm25.add_argument("--legacy-queries", type=int, default=10)
+
+    p_cache = sub.add_parser("cache", help="First search: fit vs on-disk index cache")
+    p_cache.add_argument("--docs", type=int, default=100_000)
+
+    p_server = sub.add_parser("server", help="Query latency through server.py")
+    p_server.add_argument("--queries", type=int, default=2000)
+
+    p_many = sub.add_parser("many", help="Batch search: search() loop vs search_many()")
+    p_many.add_argument("--docs", type=int, default=100_000)
+    p_many.add_argument("--queries", type=int, default=200)
+
+    p_tok = sub.add_parser("tokenize", help="Tokenizer throughput")
+    p_tok.add_argument("--repeat", type=int, default=20)
+
+    p_quality = sub.add_parser("quality", help="Known-item top-3 precision: BM25 vs BM25F")
+    p_quality.add_argument("--samples", type=int, default=3, help="Queries per row")
+
+    args = parser.parse_args()
+
+    if args.bench == "bm25":
+        bench_bm25(args.docs, args.queries, args.legacy_queries)
+    elif args.bench == "cache":
+        bench_cache(args.docs)
+    elif args.bench == "server":
+        bench_server(args.queries)
+    elif args.bench == "many":
+        bench_many(args.docs, args.queries)
+    elif args.bench == "tokenize":
+        bench_tokenize(args.repeat)
+    elif args.bench == "quality":
+        bench_quality(args.samples)
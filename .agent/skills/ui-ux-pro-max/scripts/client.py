@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+UI/UX Pro Max Client - talks to a running server.py over its Unix socket
+Kept free of core imports so a hand-off costs a connect and one JSON line.
+"""
+
+import getpass
+import json
+import os
+import socket
+import tempfile
+from pathlib import Path
+
+SOCKET_PATH = Path(os.environ.get("UIUX_SEARCH_SOCKET", Path(tempfile.gettempdir()) / f"uiux-pro-max-{getpass.getuser()}.sock"))
+CONNECT_TIMEOUT = 0.2
+READ_TIMEOUT = 10.0
+
+
+class SearchClient:
+    """Persistent JSON-lines connection: one request line in, one response line out"""
+
+    def __init__(self, path=SOCKET_PATH):
+        self.path = Path(path)
+        self.sock = None
+        self.reader = None
+
+    def connect(self):
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("Unix sockets are not available on this platform")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(str(self.path))
+            sock.settimeout(READ_TIMEOUT)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+        return self
+
+    def request(self, payload):
+        self.sock.sendall(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = self.reader = None
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def request(payload, path=SOCKET_PATH):
+    """One-shot request; None when no server is listening (caller searches locally)"""
+    try:
+        with SearchClient(path) as client:
+            return client.request(payload)
+    except (OSError, ValueError):
+        return None
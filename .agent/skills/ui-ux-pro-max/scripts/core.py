@@ -5,141 +5,426 @@ UI/UX Pro Max Core - BM25 search engine for UI/UX style guides
 """
 
 import csv
+import hashlib
+import os
+import pickle
 import re
+import tempfile
 from pathlib import Path
+import heapq
 from math import log
-from collections import defaultdict
+from collections import Counter, defaultdict
+from functools import lru_cache
+from itertools import chain
+
+# Domains and stacks live in config.py, which search.py imports without core
+from config import AVAILABLE_STACKS, CSV_CONFIG, DATA_DIR, MAX_RESULTS, STACK_CONFIG, _STACK_COLS
 
 # ============ CONFIGURATION ============
-DATA_DIR = Path(__file__).parent.parent / "data"
-MAX_RESULTS = 3
-
-CSV_CONFIG = {
-    "style": {
-        "file": "styles.csv",
-        "search_cols": ["Style Category", "Keywords", "Best For", "Type"],
-        "output_cols": ["Style Category", "Type", "Keywords", "Primary Colors", "Effects & Animation", "Best For", "Performance", "Accessibility", "Framework Compatibility", "Complexity"]
-    },
-    "prompt": {
-        "file": "prompts.csv",
-        "search_cols": ["Style Category", "AI Prompt Keywords (Copy-Paste Ready)", "CSS/Technical Keywords"],
-        "output_cols": ["Style Category", "AI Prompt Keywords (Copy-Paste Ready)", "CSS/Technical Keywords", "Implementation Checklist"]
-    },
-    "color": {
-        "file": "colors.csv",
-        "search_cols": ["Product Type", "Keywords", "Notes"],
-        "output_cols": ["Product Type", "Keywords", "Primary (Hex)", "Secondary (Hex)", "CTA (Hex)", "Background (Hex)", "Text (Hex)", "Border (Hex)", "Notes"]
-    },
-    "chart": {
-        "file": "charts.csv",
-        "search_cols": ["Data Type", "Keywords", "Best Chart Type", "Accessibility Notes"],
-        "output_cols": ["Data Type", "Keywords", "Best Chart Type", "Secondary Options", "Color Guidance", "Accessibility Notes", "Library Recommendation", "Interactive Level"]
-    },
-    "landing": {
-        "file": "landing.csv",
-        "search_cols": ["Pattern Name", "Keywords", "Conversion Optimization", "Section Order"],
-        "output_cols": ["Pattern Name", "Keywords", "Section Order", "Primary CTA Placement", "Color Strategy", "Conversion Optimization"]
-    },
-    "product": {
-        "file": "products.csv",
-        "search_cols": ["Product Type", "Keywords", "Primary Style Recommendation", "Key Considerations"],
-        "output_cols": ["Product Type", "Keywords", "Primary Style Recommendation", "Secondary Styles", "Landing Page Pattern", "Dashboard Style (if applicable)", "Color Palette Focus"]
-    },
-    "ux": {
-        "file": "ux-guidelines.csv",
-        "search_cols": ["Category", "Issue", "Description", "Platform"],
-        "output_cols": ["Category", "Issue", "Platform", "Description", "Do", "Don't", "Code Example Good", "Code Example Bad", "Severity"]
-    },
-    "typography": {
-        "file": "typography.csv",
-        "search_cols": ["Font Pairing Name", "Category", "Mood/Style Keywords", "Best For", "Heading Font", "Body Font"],
-        "output_cols": ["Font Pairing Name", "Category", "Heading Font", "Body Font", "Mood/Style Keywords", "Best For", "Google Fonts URL", "CSS Import", "Tailwind Config", "Notes"]
-    }
-}
-
-STACK_CONFIG = {
-    "html-tailwind": {"file": "stacks/html-tailwind.csv"},
-    "react": {"file": "stacks/react.csv"},
-    "nextjs": {"file": "stacks/nextjs.csv"},
-    "vue": {"file": "stacks/vue.csv"},
-    "nuxtjs": {"file": "stacks/nuxtjs.csv"},
-    "nuxt-ui": {"file": "stacks/nuxt-ui.csv"},
-    "svelte": {"file": "stacks/svelte.csv"},
-    "swiftui": {"file": "stacks/swiftui.csv"},
-    "react-native": {"file": "stacks/react-native.csv"},
-    "flutter": {"file": "stacks/flutter.csv"}
-}
-
-# Common columns for all stacks
-_STACK_COLS = {
-    "search_cols": ["Category", "Guideline", "Description", "Do", "Don't"],
-    "output_cols": ["Category", "Guideline", "Description", "Do", "Don't", "Code Good", "Code Bad", "Severity", "Docs URL"]
-}
-
-AVAILABLE_STACKS = list(STACK_CONFIG.keys())
+CACHE_DIR = Path(os.environ.get("UIUX_CACHE_DIR", DATA_DIR / ".cache"))
+CACHE_VERSION = 3  # bump when BM25 / tokenizer internals change
+# Opt-in tokenizer features; they change rankings, so both are part of the index cache key
+STEMMING = os.environ.get("UIUX_STEMMING", "") == "1"
+STOPWORDS = os.environ.get("UIUX_STOPWORDS", "") == "1"
+
+# score_many() uses the NumPy score matrix only for big batches over big indexes;
+# on the shipped CSVs (hundreds of rows) plain postings scoring is faster
+MATRIX_MIN_QUERIES = 8
+MATRIX_MIN_DOCS = 5000
+MATRIX_MAX_CELLS = 1 << 22  # queries x documents per block (32 MB of float64)
+
+_np = False
+
+
+def _numpy():
+    """NumPy if installed; imported lazily so single searches don't pay for it"""
+    global _np
+    if _np is False:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = None
+    return _np
+
+
+# ============ TOKENIZER ============
+_WORD_RE = re.compile(r"\w+")
+_CYRILLIC_RE = re.compile(r"[\u0400-\u04ff]")
+
+_STOPWORDS = frozenset("""
+the and for with that this from are was were been has have had not but all any can its into
+out our your you will would should could than then them they their there these those what
+when where which who why how use using via per also more most very just only over under
+для від при про без через між над під або але щоб також його цей які який яка яке
+вже ще їх вони воно вона він ніж має мати бути було буде теж дуже тому коли
+""".split())
+
+# Longest suffix first; a stem keeps at least STEM_MIN_LENGTH characters
+_EN_SUFFIXES = ("ational", "ization", "fulness", "iveness", "ations", "ation", "ments", "ment", "ness",
+                "ities", "ity", "ings", "ing", "ies", "ied", "ers", "er", "ed", "ly", "es", "s", "e")
+_UK_SUFFIXES = ("ування", "ювання", "ання", "ення", "ями", "ами", "ого", "ому", "ими", "ові", "еві",
+                "ів", "їв", "ах", "ях", "ам", "ям", "ом", "ем", "ою", "ею", "ий", "ій", "ої", "их", "им",
+                "а", "я", "о", "е", "и", "і", "у", "ю", "ь")
+STEM_MIN_LENGTH = 3
+
+
+@lru_cache(maxsize=1 << 16)
+def _stem(word):
+    """Light suffix stripping for English and Ukrainian; the alphabet picks the rules"""
+    suffixes = _UK_SUFFIXES if _CYRILLIC_RE.search(word) else _EN_SUFFIXES
+    for suffix in suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= STEM_MIN_LENGTH:
+            word = word[:-len(suffix)]
+            if suffix in ("ies", "ied"):
+                word += "y"
+            elif suffix in ("ing", "ings", "ed") and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]  # running -> run
+            return word
+    return word
+
+
+class Tokenizer:
+    """
+    Lowercase, split on non-word characters, filter short words; optionally drop stopwords
+    and stem. Token tuples are memoised by text: field values repeat across rows and
+    agents repeat queries.
+    """
+
+    def __init__(self, stem=False, stopwords=False, min_length=3, cache_size=100_000):
+        self.stem = stem
+        self.stopwords = stopwords
+        self.min_length = min_length
+        self.cache_size = cache_size
+        self._cache = {}
+
+    @property
+    def config(self):
+        """Everything that changes the token stream (part of the index cache key)"""
+        return ("tokenizer", self.stem, self.stopwords, self.min_length)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_cache"] = {}
+        return state
+
+    def tokenize(self, text):
+        text = str(text)
+        tokens = self._cache.get(text)
+        if tokens is None:
+            tokens = self._tokenize(text)
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[text] = tokens
+        return tokens
+
+    __call__ = tokenize
+
+    def _tokenize(self, text):
+        min_length = self.min_length
+        words = [w for w in _WORD_RE.findall(text.lower()) if len(w) >= min_length]
+        if self.stopwords:
+            words = [w for w in words if w not in _STOPWORDS]
+        if self.stem:
+            words = [_stem(w) for w in words]
+        return tuple(words)
+
+
+TOKENIZER = Tokenizer(stem=STEMMING, stopwords=STOPWORDS)
 
 
 # ============ BM25 IMPLEMENTATION ============
 class BM25:
-    """BM25 ranking algorithm for text search"""
+    """BM25 ranking over an inverted index (term -> postings of (doc_id, tf))"""
 
-    def __init__(self, k1=1.5, b=0.75):
+    def __init__(self, k1=1.5, b=0.75, tokenizer=None):
         self.k1 = k1
         self.b = b
-        self.corpus = []
+        self.tokenizer = tokenizer or TOKENIZER
+        self.postings = {}
         self.doc_lengths = []
+        self.norms = []
         self.avgdl = 0
         self.idf = {}
-        self.doc_freqs = defaultdict(int)
         self.N = 0
+        self._term_weights = {}  # score_many() NumPy arrays, rebuilt on demand
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_term_weights"] = {}
+        return state
 
     def tokenize(self, text):
-        """Lowercase, split, remove punctuation, filter short words"""
-        text = re.sub(r'[^\w\s]', ' ', str(text).lower())
-        return [w for w in text.split() if len(w) > 2]
+        return self.tokenizer.tokenize(text)
 
     def fit(self, documents):
-        """Build BM25 index from documents"""
-        self.corpus = [self.tokenize(doc) for doc in documents]
-        self.N = len(self.corpus)
+        """Build postings lists, idf and per-document length norms"""
+        postings = {}
+        self.doc_lengths = []
+        self._term_weights = {}
+        for doc_id, doc in enumerate(documents):
+            tokens = self.tokenize(doc)
+            self.doc_lengths.append(len(tokens))
+            for word, tf in Counter(tokens).items():
+                postings.setdefault(word, []).append((doc_id, tf))
+
+        self.postings = postings
+        self.N = len(self.doc_lengths)
         if self.N == 0:
             return
-        self.doc_lengths = [len(doc) for doc in self.corpus]
         self.avgdl = sum(self.doc_lengths) / self.N
 
-        for doc in self.corpus:
-            seen = set()
-            for word in doc:
-                if word not in seen:
-                    self.doc_freqs[word] += 1
-                    seen.add(word)
-
-        for word, freq in self.doc_freqs.items():
-            self.idf[word] = log((self.N - freq + 0.5) / (freq + 0.5) + 1)
-
-    def score(self, query):
-        """Score all documents against query"""
-        query_tokens = self.tokenize(query)
-        scores = []
-
-        for idx, doc in enumerate(self.corpus):
-            score = 0
-            doc_len = self.doc_lengths[idx]
-            term_freqs = defaultdict(int)
-            for word in doc:
-                term_freqs[word] += 1
+        # k1 * (1 - b + b * dl / avgdl) only depends on the document
+        self.norms = [self.k1 * (1 - self.b + self.b * dl / self.avgdl) for dl in self.doc_lengths]
+        self._fit_idf()
+
+    def _fit_idf(self):
+        self.idf = {word: log((self.N - len(docs) + 0.5) / (len(docs) + 0.5) + 1) for word, docs in self.postings.items()}
+
+    def score(self, query, top_k=None):
+        """Score documents containing at least one query term, best first"""
+        return self.score_tokens(self.tokenize(query), top_k)
+
+    def score_tokens(self, tokens, top_k=None):
+        """score() for an already tokenised query"""
+        scores = defaultdict(float)
+        k1_plus_1 = self.k1 + 1
+        norms = self.norms
+
+        for token in tokens:
+            docs = self.postings.get(token)
+            if not docs:
+                continue
+            idf = self.idf[token]
+            for doc_id, tf in docs:
+                scores[doc_id] += idf * tf * k1_plus_1 / (tf + norms[doc_id])
+
+        # Ties keep document order, as a stable sort over all documents would
+        key = lambda item: (item[1], -item[0])
+        if top_k is not None:
+            return heapq.nlargest(top_k, scores.items(), key=key)
+        return sorted(scores.items(), key=key, reverse=True)
+
+    def max_score(self, tokens):
+        """
+        Upper bound of score_tokens(tokens): every term saturated (tf -> inf) in a short document.
+        Terms the index has never seen count with the idf of a document frequency of 0,
+        so an index that covers fewer of the query terms normalises lower.
+        """
+        unseen = log((self.N + 0.5) / 0.5 + 1)
+        return (self.k1 + 1) * sum(self.idf.get(token, unseen) for token in tokens)
+
+    def score_many(self, token_lists, top_k=None):
+        """
+        score_tokens() for many queries. With NumPy, each block of queries is scored into a
+        dense (queries x documents) matrix, one vectorised update per query term; otherwise
+        each query walks the postings.
+        """
+        np = _numpy()
+        if np is None or len(token_lists) < MATRIX_MIN_QUERIES or self.N < MATRIX_MIN_DOCS:
+            return [self.score_tokens(tokens, top_k) for tokens in token_lists]
+
+        k1_plus_1 = self.k1 + 1
+        norms = np.asarray(self.norms)
+        block = max(1, MATRIX_MAX_CELLS // self.N)
+        weights = self._term_weights
+        results = []
+
+        for start in range(0, len(token_lists), block):
+            chunk = token_lists[start:start + block]
+            scores = np.zeros((len(chunk), self.N))
+            for row, tokens in enumerate(chunk):
+                # Same term order and arithmetic as score_tokens(), so scores match bit for bit
+                for token in tokens:
+                    if token not in self.postings:
+                        continue
+                    if token not in weights:
+                        docs = self.postings[token]
+                        # float64: BM25F postings hold weighted pseudo-frequencies
+                        postings = np.fromiter(chain.from_iterable(docs), dtype=np.float64, count=2 * len(docs))
+                        ids, tf = postings[0::2].astype(np.int64), postings[1::2]
+                        weights[token] = ids, self.idf[token] * tf * k1_plus_1 / (tf + norms[ids])
+                    ids, contribution = weights[token]
+                    scores[row, ids] += contribution
+
+            for row in scores:
+                hits = np.flatnonzero(row > 0)
+                values = row[hits]
+                if top_k is not None and len(hits) > top_k:
+                    keep = values >= np.partition(values, -top_k)[-top_k]
+                    hits, values = hits[keep], values[keep]
+                # Best first, ties in document order
+                order = np.lexsort((hits, -values))
+                if top_k is not None:
+                    order = order[:top_k]
+                results.append([(int(hits[i]), float(values[i])) for i in order])
+        return results
+
+
+class BM25F(BM25):
+    """
+    BM25F over separate fields: each field has its own weight and length normalisation.
+    Fitting folds both into one pseudo term frequency per (term, document), so postings,
+    score_tokens() and score_many() are shared with BM25 and a query costs the same.
+    """
+
+    def __init__(self, weights, k1=1.5, b=0.75, tokenizer=None):
+        super().__init__(k1, b, tokenizer)
+        self.weights = list(weights)
+        self.field_avgdl = []
 
-            for token in query_tokens:
-                if token in self.idf:
-                    tf = term_freqs[token]
-                    idf = self.idf[token]
-                    numerator = tf * (self.k1 + 1)
-                    denominator = tf + self.k1 * (1 - self.b + self.b * doc_len / self.avgdl)
-                    score += idf * numerator / denominator
-
-            scores.append((idx, score))
+    def fit(self, documents):
+        """documents: per row, the field texts in the order of self.weights"""
+        self._term_weights = {}
+        rows = [[self.tokenize(text) for text in fields] for fields in documents]
+        self.N = len(rows)
+        self.doc_lengths = [sum(len(tokens) for tokens in fields) for fields in rows]
+        self.postings = {}
+        if self.N == 0:
+            return
+        self.avgdl = sum(self.doc_lengths) / self.N
+        self.field_avgdl = [sum(len(fields[f]) for fields in rows) / self.N for f in range(len(self.weights))]
+
+        postings = self.postings
+        for doc_id, fields in enumerate(rows):
+            tf = defaultdict(float)
+            for weight, avgdl, tokens in zip(self.weights, self.field_avgdl, fields):
+                if not tokens or weight <= 0:
+                    continue
+                scale = weight / (1 - self.b + self.b * len(tokens) / avgdl)
+                for word, count in Counter(tokens).items():
+                    tf[word] += count * scale
+            for word, value in tf.items():
+                postings.setdefault(word, []).append((doc_id, value))
+
+        # Length is already normalised per field: score_tokens() saturates with plain k1
+        self.norms = [self.k1] * self.N
+        self._fit_idf()
+
+
+# ============ INDEX CACHE ============
+class SearchIndex:
+    """Fitted BM25 plus the output columns of every row, as stored on disk"""
+
+    def __init__(self, bm25, rows, mtime_ns, size, digest):
+        self.bm25 = bm25
+        self.rows = rows
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.digest = digest
+
+
+_indexes = {}
+
+
+def _file_digest(filepath):
+    return hashlib.sha256(filepath.read_bytes()).hexdigest()
+
+
+def _cache_path(filepath, search_cols, output_cols, search_weights=None):
+    """<stem>-<source hash>-<config hash>.pickle: one source prefix, so older configs can be pruned"""
+    source = str(filepath.resolve())
+    weights = sorted((search_weights or {}).items())
+    config = repr((CACHE_VERSION, TOKENIZER.config, source, search_cols, output_cols, weights))
+    source_hash = hashlib.sha1(source.encode("utf-8")).hexdigest()[:8]
+    return CACHE_DIR / f"{filepath.stem}-{source_hash}-{hashlib.sha1(config.encode('utf-8')).hexdigest()[:12]}.pickle"
+
+
+def _is_private(path):
+    """Owned by this user and not writable by group/others (POSIX); pickles elsewhere are never loaded"""
+    if not hasattr(os, "getuid"):
+        return True
+    st = path.stat()
+    return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+
+def _read_cache(path):
+    """Unpickling runs code, so only files in a private CACHE_DIR (see UIUX_CACHE_DIR) are trusted"""
+    try:
+        if not (_is_private(path.parent) and _is_private(path)):
+            return None
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+
+
+def _write_cache(path, index):
+    """
+    Best effort: a read-only checkout (or a shared CACHE_DIR) just falls back to fitting
+    in memory. Entries for the same source under an older config are removed.
+    """
+    try:
+        CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if not _is_private(CACHE_DIR):
+            return
+        ignore = CACHE_DIR / ".gitignore"
+        if not ignore.exists():
+            ignore.write_text("*\n", encoding="utf-8")
+        fd, tmp = tempfile.mkstemp(prefix=f".{path.stem}.", suffix=".tmp", dir=CACHE_DIR)
+        try:
+            with open(fd, "wb") as f:
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        prefix = path.stem.rsplit("-", 1)[0]
+        legacy = prefix.rsplit("-", 1)[0] + "-" + "?" * 12  # <stem>-<config hash> before the source prefix
+        for stale in chain(CACHE_DIR.glob(f"{prefix}-*.pickle"), CACHE_DIR.glob(f"{legacy}.pickle")):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+def _build_index(filepath, search_cols, output_cols, stat, digest, search_weights=None):
+    data = _load_csv(filepath)
 
-        return sorted(scores, key=lambda x: x[1], reverse=True)
+    if search_weights:
+        # One text per search column, scored as weighted BM25F fields
+        bm25 = BM25F([search_weights.get(col, 1.0) for col in search_cols])
+        bm25.fit([[str(row.get(col, "")) for col in search_cols] for row in data])
+    else:
+        # Build documents from search columns
+        documents = [" ".join(str(row.get(col, "")) for col in search_cols) for row in data]
+        bm25 = BM25()
+        bm25.fit(documents)
+
+    rows = [{col: row.get(col, "") for col in output_cols if col in row} for row in data]
+    return SearchIndex(bm25, rows, stat.st_mtime_ns, stat.st_size, digest)
+
+
+def load_index(filepath, search_cols, output_cols, search_weights=None):
+    """
+    Fitted index for a CSV: from memory, else from the on-disk cache, else built and cached.
+    A cache entry is valid while mtime and size match; if only mtime changed,
+    the content hash decides whether it can be reused.
+    search_weights: per-column BM25F weights (None: plain BM25 over the joined columns)
+    """
+    key = (str(filepath), tuple(search_cols), tuple(output_cols), tuple(sorted((search_weights or {}).items())))
+    stat = filepath.stat()
+
+    index = _indexes.get(key)
+    if index is not None and (index.mtime_ns, index.size) == (stat.st_mtime_ns, stat.st_size):
+        return index
+
+    path = _cache_path(filepath, list(search_cols), list(output_cols), search_weights)
+    index = _read_cache(path)
+    if index is not None and (index.mtime_ns, index.size) != (stat.st_mtime_ns, stat.st_size):
+        digest = _file_digest(filepath)
+        if index.size == stat.st_size and index.digest == digest:
+            index.mtime_ns = stat.st_mtime_ns
+            _write_cache(path, index)
+        else:
+            index = _build_index(filepath, search_cols, output_cols, stat, digest, search_weights)
+            _write_cache(path, index)
+    elif index is None:
+        index = _build_index(filepath, search_cols, output_cols, stat, _file_digest(filepath), search_weights)
+        _write_cache(path, index)
+
+    _indexes[key] = index
+    return index
 
 
 # ============ SEARCH FUNCTIONS ============
@@ -149,29 +434,16 @@ def _load_csv(filepath):
         return list(csv.DictReader(f))
 
 
-def _search_csv(filepath, search_cols, output_cols, query, max_results):
+def _search_csv(filepath, search_cols, output_cols, query, max_results, search_weights=None):
     """Core search function using BM25"""
     if not filepath.exists():
         return []
 
-    data = _load_csv(filepath)
-
-    # Build documents from search columns
-    documents = [" ".join(str(row.get(col, "")) for col in search_cols) for row in data]
-
-    # BM25 search
-    bm25 = BM25()
-    bm25.fit(documents)
-    ranked = bm25.score(query)
+    index = load_index(filepath, search_cols, output_cols, search_weights)
+    ranked = index.bm25.score(query, top_k=max_results)
 
     # Get top results with score > 0
-    results = []
-    for idx, score in ranked[:max_results]:
-        if score > 0:
-            row = data[idx]
-            results.append({col: row.get(col, "") for col in output_cols if col in row})
-
-    return results
+    return [dict(index.rows[idx]) for idx, score in ranked if score > 0]
 
 
 def detect_domain(query):
@@ -194,8 +466,53 @@ def detect_domain(query):
     return best if scores[best] > 0 else "style"
 
 
+def _sources(domains=None, stacks=None):
+    """(source tag, file, search_cols, output_cols, search_weights) for every domain and stack to federate over"""
+    sources = []
+    for domain in CSV_CONFIG if domains is None else domains:
+        config = CSV_CONFIG[domain]
+        sources.append((domain, config["file"], config["search_cols"], config["output_cols"], config.get("search_weights")))
+    for stack in STACK_CONFIG if stacks is None else stacks:
+        sources.append((f"stack:{stack}", STACK_CONFIG[stack]["file"], _STACK_COLS["search_cols"], _STACK_COLS["output_cols"],
+                        _STACK_COLS.get("search_weights")))
+    return [source for source in sources if (DATA_DIR / source[1]).exists()]
+
+
+def search_all(query, max_results=MAX_RESULTS, domains=None, stacks=None):
+    """
+    Federated search: score the query against every domain and stack index and merge
+    the hits into one list. Each score is divided by that index's BM25.max_score(),
+    so indexes of different size and vocabulary rank on the same 0..1 scale.
+    domains / stacks: subsets to search (None: all of them)
+    """
+    sources = _sources(domains, stacks)
+    tokens = TOKENIZER.tokenize(query)
+    hits = []
+    for order, (tag, file, search_cols, output_cols, search_weights) in enumerate(sources):
+        index = load_index(DATA_DIR / file, search_cols, output_cols, search_weights)
+        ceiling = index.bm25.max_score(tokens)
+        for idx, score in index.bm25.score_tokens(tokens, top_k=max_results):
+            if score > 0:
+                hits.append((score / ceiling, order, idx, tag, file, index))
+
+    # Best first; ties keep source order, then document order
+    hits.sort(key=lambda hit: (-hit[0], hit[1], hit[2]))
+    results = [{"source": tag, "file": file, "score": round(score, 4), "result": dict(index.rows[idx])}
+               for score, _, idx, tag, file, index in hits[:max_results]]
+
+    return {
+        "domain": "all",
+        "query": query,
+        "sources": [source[0] for source in sources],
+        "count": len(results),
+        "results": results
+    }
+
+
 def search(query, domain=None, max_results=MAX_RESULTS):
-    """Main search function with auto-domain detection"""
+    """Main search function with auto-domain detection ("all": federated search_all())"""
+    if domain == "all":
+        return search_all(query, max_results)
     if domain is None:
         domain = detect_domain(query)
 
@@ -205,7 +522,7 @@ def search(query, domain=None, max_results=MAX_RESULTS):
     if not filepath.exists():
         return {"error": f"File not found: {filepath}", "domain": domain}
 
-    results = _search_csv(filepath, config["search_cols"], config["output_cols"], query, max_results)
+    results = _search_csv(filepath, config["search_cols"], config["output_cols"], query, max_results, config.get("search_weights"))
 
     return {
         "domain": domain,
@@ -216,6 +533,57 @@ def search(query, domain=None, max_results=MAX_RESULTS):
     }
 
 
+def search_many(queries, domains=None, stacks=None, max_results=MAX_RESULTS):
+    """
+    Run many queries at once: each query is tokenised once and queries are grouped
+    per index, so every index is loaded once and scored in a single pass.
+    domains: searched for every query (None: auto-detect per query, like search())
+    stacks: stacks searched for every query
+    Returns one list per query: search() results for its domains, then search_stack() results.
+    """
+    queries = list(queries)
+    token_lists = [TOKENIZER.tokenize(query) for query in queries]
+
+    targets = []
+    for query in queries:
+        names = [("domain", d) for d in (domains if domains is not None else [detect_domain(query)])]
+        targets.append(names + [("stack", s) for s in stacks or []])
+
+    groups = defaultdict(list)
+    for qi, names in enumerate(targets):
+        for slot, target in enumerate(names):
+            groups[target].append((qi, slot))
+
+    out = [[None] * len(names) for names in targets]
+    for (kind, name), members in groups.items():
+        if kind == "domain":
+            config = CSV_CONFIG.get(name, CSV_CONFIG["style"])
+            search_cols, output_cols, search_weights = config["search_cols"], config["output_cols"], config.get("search_weights")
+            header = {"domain": name}
+            error = {"error": f"File not found: {DATA_DIR / config['file']}", "domain": name}
+        elif name in STACK_CONFIG:
+            config = STACK_CONFIG[name]
+            search_cols, output_cols, search_weights = _STACK_COLS["search_cols"], _STACK_COLS["output_cols"], _STACK_COLS.get("search_weights")
+            header = {"domain": "stack", "stack": name}
+            error = {"error": f"Stack file not found: {DATA_DIR / config['file']}", "stack": name}
+        else:
+            config = None
+            error = {"error": f"Unknown stack: {name}. Available: {', '.join(AVAILABLE_STACKS)}"}
+
+        filepath = DATA_DIR / config["file"] if config else None
+        if filepath is None or not filepath.exists():
+            for qi, slot in members:
+                out[qi][slot] = dict(error)
+            continue
+
+        index = load_index(filepath, search_cols, output_cols, search_weights)
+        ranked = index.bm25.score_many([token_lists[qi] for qi, _ in members], top_k=max_results)
+        for (qi, slot), hits in zip(members, ranked):
+            results = [dict(index.rows[idx]) for idx, score in hits if score > 0]
+            out[qi][slot] = {**header, "query": queries[qi], "file": config["file"], "count": len(results), "results": results}
+    return out
+
+
 def search_stack(query, stack, max_results=MAX_RESULTS):
     """Search stack-specific guidelines"""
     if stack not in STACK_CONFIG:
@@ -226,7 +594,8 @@ def search_stack(query, stack, max_results=MAX_RESULTS):
     if not filepath.exists():
         return {"error": f"Stack file not found: {filepath}", "stack": stack}
 
-    results = _search_csv(filepath, _STACK_COLS["search_cols"], _STACK_COLS["output_cols"], query, max_results)
+    results = _search_csv(filepath, _STACK_COLS["search_cols"], _STACK_COLS["output_cols"], query, max_results,
+                          _STACK_COLS.get("search_weights"))
 
     return {
         "domain": "stack",
@@ -3,13 +3,22 @@
 """
 UI/UX Pro Max Search - BM25 search engine for UI/UX style guides
 Usage: python search.py "<query>" [--domain <domain>] [--stack <stack>] [--max-results 3]
+       python search.py --batch <queries.txt | -> [--domain <domain>] [--stack <stack>]
 
-Domains: style, prompt, color, chart, landing, product, ux, typography
+Queries go to server.py when it is running (warm indexes), else are searched in-process.
+Without --domain/--stack the domain is auto-detected from the query; --domain all searches
+every domain and stack at once (federated, top results overall).
+UIUX_STEMMING=1 / UIUX_STOPWORDS=1 enable English/Ukrainian stemming and stopword removal.
+
+Domains: style, prompt, color, chart, landing, product, ux, typography, all
 Stacks: html-tailwind, react, nextjs
 """
 
 import argparse
-from core import CSV_CONFIG, AVAILABLE_STACKS, MAX_RESULTS, search, search_stack
+import sys
+# core (BM25, index cache) is imported only when the query is searched in-process
+from config import CSV_CONFIG, AVAILABLE_STACKS, MAX_RESULTS
+import client
 
 
 def format_output(result):
@@ -18,6 +27,15 @@ def format_output(result):
         return f"Error: {result['error']}"
 
     output = []
+    if result.get("domain") == "all":
+        output.append(f"## UI Pro Max Search Results")
+        output.append(f"**Domain:** all | **Query:** {result['query']}")
+        output.append(f"**Sources:** {len(result['sources'])} domains/stacks | **Found:** {result['count']} results\n")
+        for i, hit in enumerate(result['results'], 1):
+            output.append(f"### Result {i} ({hit['source']}, score {hit['score']})")
+            output.extend(_format_row(hit['result']))
+        return "\n".join(output)
+
     if result.get("stack"):
         output.append(f"## UI Pro Max Stack Guidelines")
         output.append(f"**Stack:** {result['stack']} | **Query:** {result['query']}")
@@ -28,31 +46,68 @@ def format_output(result):
 
     for i, row in enumerate(result['results'], 1):
         output.append(f"### Result {i}")
-        for key, value in row.items():
-            value_str = str(value)
-            if len(value_str) > 300:
-                value_str = value_str[:300] + "..."
-            output.append(f"- **{key}:** {value_str}")
-        output.append("")
+        output.extend(_format_row(row))
 
     return "\n".join(output)
 
 
+def _format_row(row):
+    lines = []
+    for key, value in row.items():
+        value_str = str(value)
+        if len(value_str) > 300:
+            value_str = value_str[:300] + "..."
+        lines.append(f"- **{key}:** {value_str}")
+    lines.append("")
+    return lines
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="UI Pro Max Search")
-    parser.add_argument("query", help="Search query")
-    parser.add_argument("--domain", "-d", choices=list(CSV_CONFIG.keys()), help="Search domain")
+    parser.add_argument("query", nargs="?", help="Search query")
+    parser.add_argument("--domain", "-d", choices=list(CSV_CONFIG.keys()) + ["all"], help="Search domain (default: auto-detect; all: federated)")
     parser.add_argument("--stack", "-s", choices=AVAILABLE_STACKS, help="Stack-specific search (html-tailwind, react, nextjs)")
     parser.add_argument("--max-results", "-n", type=int, default=MAX_RESULTS, help="Max results (default: 3)")
     parser.add_argument("--json", action="store_true", help="Output as JSON")
+    parser.add_argument("--no-server", action="store_true", help="Search in-process even if server.py is running")
+    parser.add_argument("--batch", metavar="FILE", help="Run every line of FILE as a query ('-' for stdin)")
 
     args = parser.parse_args()
+    if (args.query is None) == (args.batch is None):
+        parser.error("give either a query or --batch FILE")
 
-    # Stack search takes priority
-    if args.stack:
-        result = search_stack(args.query, args.stack, args.max_results)
-    else:
-        result = search(args.query, args.domain, args.max_results)
+    if args.batch:
+        from core import search_all, search_many
+        f = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+        with f:
+            queries = [line.strip() for line in f if line.strip()]
+        # Stack search takes priority, as for a single query
+        if args.stack:
+            results = [batch[0] for batch in search_many(queries, domains=[], stacks=[args.stack], max_results=args.max_results)]
+        elif args.domain == "all":
+            results = [search_all(query, args.max_results) for query in queries]
+        else:
+            domains = [args.domain] if args.domain else None
+            results = [batch[0] for batch in search_many(queries, domains=domains, max_results=args.max_results)]
+
+        if args.json:
+            import json
+            print(json.dumps(results, indent=2, ensure_ascii=False))
+        else:
+            print("\n".join(format_output(result) for result in results))
+        sys.exit(0)
+
+    result = None
+    if not args.no_server:
+        result = client.request({"query": args.query, "domain": args.domain, "stack": args.stack, "max_results": args.max_results})
+
+    # No server: search in-process; stack search takes priority
+    if result is None:
+        from core import search, search_stack
+        if args.stack:
+            result = search_stack(args.query, args.stack, args.max_results)
+        else:
+            result = search(args.query, args.domain, args.max_results)
 
     if args.json:
         import json
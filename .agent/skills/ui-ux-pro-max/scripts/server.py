@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+UI/UX Pro Max Search Server - keeps every domain and stack index warm in memory
+Usage: python server.py [--socket <path>] [--cache-size 1024]
+       python server.py --stdio
+
+Protocol: one JSON object per line in, one per line out.
+    {"query": "glass dark", "domain": "style", "max_results": 3}
+    {"query": "forms", "stack": "react"}
+    {"cmd": "ping" | "stats" | "reload" | "shutdown"}
+Responses are exactly what search() / search_stack() return.
+search.py hands queries off to the socket automatically while the server runs.
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+
+import core
+from core import CSV_CONFIG, STACK_CONFIG, DATA_DIR, MAX_RESULTS, _STACK_COLS, detect_domain, load_index, search, search_stack
+from client import SOCKET_PATH
+
+CACHE_SIZE = 1024
+
+
+def source_files(query, domain=None, stack=None):
+    """CSV files a search() / search_stack() call reads, routed the same way"""
+    if stack:
+        return [STACK_CONFIG[stack]["file"]] if stack in STACK_CONFIG else []
+    if domain == "all":
+        return [config["file"] for config in chain(CSV_CONFIG.values(), STACK_CONFIG.values())]
+    return [CSV_CONFIG.get(domain or detect_domain(query), CSV_CONFIG["style"])["file"]]
+
+
+def data_signature(files):
+    """(mtime_ns, size) per file: changes whenever load_index() would refit"""
+    signature = []
+    for file in files:
+        try:
+            stat = (DATA_DIR / file).stat()
+        except OSError:
+            signature.append(None)
+        else:
+            signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class SearchService:
+    """Warm indexes plus an LRU of recent results, keyed by the mtime and size of the CSVs they came from"""
+
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.started = time.time()
+
+    def warm(self):
+        """Load (or build) every index up front so the first query is as fast as the rest"""
+        start = time.perf_counter()
+        for config in CSV_CONFIG.values():
+            filepath = DATA_DIR / config["file"]
+            if filepath.exists():
+                load_index(filepath, config["search_cols"], config["output_cols"], config.get("search_weights"))
+        for config in STACK_CONFIG.values():
+            filepath = DATA_DIR / config["file"]
+            if filepath.exists():
+                load_index(filepath, _STACK_COLS["search_cols"], _STACK_COLS["output_cols"], _STACK_COLS.get("search_weights"))
+        return time.perf_counter() - start
+
+    def search(self, query, domain=None, stack=None, max_results=MAX_RESULTS):
+        # An edited CSV changes the key, so its stale results are never served and age out
+        key = (query, domain, stack, max_results, data_signature(source_files(query, domain, stack)))
+        with self.lock:
+            result = self.cache.get(key)
+            if result is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        # Stack search takes priority, as in search.py
+        result = search_stack(query, stack, max_results) if stack else search(query, domain, max_results)
+
+        with self.lock:
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return result
+
+    def stats(self):
+        with self.lock:
+            return {
+                "indexes": len(core._indexes),
+                "cached_results": len(self.cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "uptime": round(time.time() - self.started, 1),
+            }
+
+    def reload(self):
+        """Drop results and in-memory indexes; the on-disk cache revalidates against the CSVs"""
+        with self.lock:
+            self.cache.clear()
+            core._indexes.clear()
+        return self.warm()
+
+    def handle(self, request):
+        """One decoded request -> response dict"""
+        if not isinstance(request, dict):
+            return {"error": "Request must be a JSON object"}
+        cmd = request.get("cmd")
+        if cmd in ("ping", "shutdown"):
+            return {"ok": True}
+        if cmd == "stats":
+            return self.stats()
+        if cmd == "reload":
+            return {"ok": True, "seconds": round(self.reload(), 3)}
+        if cmd is not None:
+            return {"error": f"Unknown command: {cmd}"}
+
+        query = request.get("query")
+        if not isinstance(query, str) or not query:
+            return {"error": "Missing query"}
+        max_results = request.get("max_results", MAX_RESULTS)
+        if not isinstance(max_results, int):
+            return {"error": "max_results must be an integer"}
+        return self.search(query, request.get("domain"), request.get("stack"), max_results)
+
+    def handle_line(self, line):
+        """Raw request line -> (response line, shutdown requested)"""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            request, response = None, {"error": f"Invalid JSON: {e}"}
+        else:
+            response = self.handle(request)
+        shutdown = isinstance(request, dict) and request.get("cmd") == "shutdown"
+        return json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n", shutdown
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response, shutdown = self.server.service.handle_line(line)
+            self.wfile.write(response)
+            self.wfile.flush()
+            if shutdown:
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+class SearchServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _socket_in_use(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def make_server(path=SOCKET_PATH, service=None):
+    """Bind the socket; the caller runs serve_forever()"""
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("Unix sockets are not available on this platform, use --stdio")
+    if os.path.exists(path):
+        if _socket_in_use(path):
+            raise OSError(f"A server is already listening on {path}")
+        os.unlink(path)  # stale socket from a server that did not shut down cleanly
+
+    server = SearchServer(str(path), _Handler)
+    server.service = service or SearchService()
+    return server
+
+
+def serve_stdio(service):
+    out = sys.stdout.buffer
+    for line in sys.stdin.buffer:
+        if not line.strip():
+            continue
+        response, shutdown = service.handle_line(line)
+        out.write(response)
+        out.flush()
+        if shutdown:
+            break
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="UI Pro Max Search Server")
+    parser.add_argument("--socket", default=str(SOCKET_PATH), help=f"Unix socket path (default: {SOCKET_PATH})")
+    parser.add_argument("--stdio", action="store_true", help="Serve JSON lines on stdin/stdout instead of a socket")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help=f"Recent results kept (default: {CACHE_SIZE})")
+    args = parser.parse_args()
+
+    service = SearchService(args.cache_size)
+    elapsed = service.warm()
+
+    if args.stdio:
+        serve_stdio(service)
+        sys.exit(0)
+
+    try:
+        server = make_server(args.socket, service)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"UI Pro Max search server: {len(core._indexes)} indexes warm in {elapsed:.2f}s, listening on {args.socket}", file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
@@ -0,0 +1,523 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Микробенчмарки скриптов импорта.
+
+Использование:
+    python scripts/benchmarks.py format [--rows 1000000]
+    python scripts/benchmarks.py loader [--rows 20000] [--latency-ms 20] [--workers 1 4 8]
+    python scripts/benchmarks.py wire [--rows 10000]
+    python scripts/benchmarks.py link [--weekly 200000] [--years 4]
+    python scripts/benchmarks.py fuzzy [--rows 50000] [--departments 8]
+    python scripts/benchmarks.py write [--weekly 200000]
+    python scripts/benchmarks.py rollup [--rows 1000000]
+    python scripts/benchmarks.py suite [--sizes 10k 100k 1m] [--latency-ms 5] [--save-baseline]
+"""
+import sys
+sys.stdout.reconfigure(encoding='utf-8')
+import argparse
+import contextlib
+import csv
+import gzip
+import io
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import requests
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from excel_to_csv import COLUMNS, build_row_formatter, format_value
+from fuzzy_match import NgramIndex, ngrams
+import jsonio
+from jsonio import atomic_open, write_split
+import link_weekly_to_quarterly as linking
+import rollup_hours
+from stub_postgrest import start_stub
+import supabase_loader
+from supabase_loader import BulkLoader, batch_body, encode_row
+from synthetic_data import parse_size, synthetic_rows
+
+LEGACY_BATCH_SIZE = 500  # фиксированный батч исходных скриптов
+
+
+def _legacy_format(rows):
+    """Исходный путь: format_value по каждой ячейке с проверками имени колонки"""
+    out = None
+    for row in rows:
+        out = []
+        for i, col_name in enumerate(COLUMNS):
+            val = row[i] if i < len(row) else None
+            out.append(format_value(val, col_name))
+    return out
+
+
+def _table_format(rows):
+    format_row = build_row_formatter()
+    out = None
+    for row in rows:
+        out = format_row(row)
+    return out
+
+
+def bench_format(n_rows):
+    print(f'Генерация {n_rows} строк...')
+    rows = synthetic_rows(n_rows)
+
+    # Проверка эквивалентности на срезе
+    format_row = build_row_formatter()
+    for row in rows[:10000]:
+        legacy = [format_value(row[i], col) for i, col in enumerate(COLUMNS)]
+        assert format_row(row) == legacy, row
+
+    for name, fn in (('format_value', _legacy_format), ('formatter table', _table_format)):
+        start = time.perf_counter()
+        fn(rows)
+        elapsed = time.perf_counter() - start
+        print(f'  {name:16s} {elapsed:7.2f} s  {n_rows / elapsed:12,.0f} rows/s')
+
+
+def synthetic_tasks(n, seed=42):
+    """Строки в формате weekly_tasks.json"""
+    rnd = random.Random(seed)
+    plan_ids = [str(uuid.UUID(int=rnd.getrandbits(128))) for _ in range(max(1, n // 8))]
+    return [{
+        'weekly_tasks_id': str(uuid.UUID(int=rnd.getrandbits(128))),
+        'weekly_plan_id': rnd.choice(plan_ids),
+        'user_id': str(uuid.UUID(int=rnd.getrandbits(128))),
+        'spent_hours': round(rnd.random() * 8, 2),
+        'description': f'Аналіз документа та підготовка висновку №{i}',
+        'completed_at': f'2025-{rnd.randrange(1, 13):02d}-{rnd.randrange(1, 29):02d}',
+    } for i in range(n)]
+
+
+def _serial_post(base_url, rows):
+    """Исходный путь: requests.post на каждый батч, без Session"""
+    headers = {'apikey': 'bench', 'Authorization': 'Bearer bench', 'Content-Type': 'application/json',
+               'Prefer': 'return=minimal'}
+    for i in range(0, len(rows), LEGACY_BATCH_SIZE):
+        requests.post(f'{base_url}/rest/v1/bench', headers=headers, json=rows[i:i + LEGACY_BATCH_SIZE])
+
+
+def bench_loader(n_rows, latency_ms, workers_list):
+    rows = synthetic_tasks(n_rows)
+    server, base_url = start_stub(latency_ms=latency_ms)
+    print(f'{n_rows} строк, задержка заглушки {latency_ms} мс')
+
+    runs = [('serial requests.post', lambda: _serial_post(base_url, rows))]
+    for workers in workers_list:
+        def run(workers=workers):
+            with BulkLoader(base_url, 'bench', workers=workers) as loader, contextlib.redirect_stdout(io.StringIO()):
+                loader.import_rows('bench', rows)
+        runs.append((f'BulkLoader x{workers}', run))
+
+    for name, fn in runs:
+        server.store.clear('bench')
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        assert server.store.count('bench') == n_rows
+        print(f'  {name:22s} {elapsed:7.2f} s  {n_rows / elapsed:10,.0f} rows/s')
+
+    server.shutdown()
+
+
+def bench_wire(n_rows):
+    """Байты в сети и CPU кодирования: requests json= против компактного UTF-8 и gzip"""
+    rows = synthetic_tasks(n_rows)
+    batches = [rows[i:i + LEGACY_BATCH_SIZE] for i in range(0, n_rows, LEGACY_BATCH_SIZE)]
+    orjson_module = supabase_loader.orjson
+
+    def legacy():
+        # так кодирует requests.post(json=...)
+        return [json.dumps(b).encode('utf-8') for b in batches]
+
+    def compact(use_orjson, compress):
+        def encode():
+            supabase_loader.orjson = orjson_module if use_orjson else None
+            bodies = [batch_body([encode_row(r) for r in b]) for b in batches]
+            return [gzip.compress(b, supabase_loader.GZIP_LEVEL) for b in bodies] if compress else bodies
+        return encode
+
+    variants = [('requests json=', legacy, None)]
+    variants.append(('json compact utf-8', compact(False, False), (False, False)))
+    variants.append(('json compact + gzip', compact(False, True), (False, True)))
+    if orjson_module is not None:
+        variants.append(('orjson', compact(True, False), (True, False)))
+        variants.append(('orjson + gzip', compact(True, True), (True, True)))
+
+    server, base_url = start_stub()
+    print(f'{n_rows} строк, батчи по {LEGACY_BATCH_SIZE}')
+    print(f'  {"вариант":22s} {"в сети":>10s} {"CPU/10K строк":>14s}')
+    for name, encode, loader_opts in variants:
+        start = time.process_time()
+        bodies = encode()
+        cpu = time.process_time() - start
+
+        # Байты в сети - по счётчику заглушки
+        server.store.clear('bench')
+        server.store.bytes_received = 0
+        if loader_opts is None:
+            _serial_post(base_url, rows)
+        else:
+            use_orjson, compress = loader_opts
+            supabase_loader.orjson = orjson_module if use_orjson else None
+            with BulkLoader(base_url, 'bench', gzip=compress) as loader, contextlib.redirect_stdout(io.StringIO()):
+                loader.import_rows('bench', rows)
+        assert server.store.count('bench') == n_rows
+        assert sum(len(b) for b in bodies) > 0
+        print(f'  {name:22s} {server.store.bytes_received / 1e6:8.2f} МБ {1000 * cpu * 10_000 / n_rows:11.0f} мс')
+
+    supabase_loader.orjson = orjson_module
+    server.shutdown()
+
+
+def synthetic_plans(n_weekly, years, seed=42):
+    """Квартальные, недельные (weekly_plans_full), месячные планы и задачи за несколько лет"""
+    rnd = random.Random(seed)
+    new_id = lambda: str(uuid.UUID(int=rnd.getrandbits(128)))
+    first_year = 2025 - years + 1
+    processes = [new_id() for _ in range(60)]
+    # Как в QuarterlyPlan: года нет, план квартала подходит недельным планам любого года
+    quarterly = [{'quarterly_id': new_id(), 'process_id': p, 'quarter': q, 'expected_result': f'Результат {p[:4]} Q{q}'}
+                 for p in processes for q in range(1, 5) if rnd.random() < 0.85]
+    weekly = []
+    for i in range(n_weekly):
+        date = datetime(first_year, 1, 1) + timedelta(days=rnd.randrange(365 * years))
+        weekly.append({'weekly_id': new_id(), 'weekly_date': date.strftime('%Y-%m-%d'),
+                       'expected_result': f'Задача {i}', 'quarterly_id': None,
+                       '_process_id': rnd.choice(processes) if rnd.random() < 0.95 else None,
+                       '_process_excel': 'Процес управління'})
+    monthly = [{'monthly_plan_id': new_id(), 'year': rnd.randrange(first_year, 2026), 'month': rnd.randrange(1, 13),
+                '_process_id': rnd.choice(processes), 'quarterly_id': None, 'description': 'Місячний план'}
+               for _ in range(n_weekly // 10)]
+    tasks = [{'weekly_tasks_id': new_id(), 'weekly_plan_id': rnd.choice(weekly)['weekly_id'],
+              'spent_hours': round(rnd.random() * 8, 2)} for _ in range(n_weekly * 2)]
+    return quarterly, weekly, monthly, tasks
+
+
+def _legacy_link(quarterly, weekly):
+    """Исходный цикл: get_quarter со split по строке, затем второй проход за примерами"""
+    def get_quarter(date_str):
+        if not date_str:
+            return None
+        month = int(date_str.split('-')[1])
+        return 1 if month <= 3 else 2 if month <= 6 else 3 if month <= 9 else 4
+
+    index = {}
+    for qp in quarterly:
+        index.setdefault((qp['process_id'], qp['quarter']), qp['quarterly_id'])
+    for wp in weekly:
+        process_id = wp.get('_process_id')
+        if process_id and (process_id, get_quarter(wp.get('weekly_date'))) in index:
+            wp['quarterly_id'] = index[(process_id, get_quarter(wp.get('weekly_date')))]
+    examples = [wp for wp in weekly if not wp.get('quarterly_id') and wp.get('_process_id')][:10]
+    return examples
+
+
+def _columnar_link(quarterly, weekly, monthly, tasks):
+    index = linking.build_quarterly_index(quarterly)
+    report = linking.LinkageReport()
+    columns = linking.weekly_key_columns(weekly)
+    weekly_ids = linking.link_keys(index, *columns)
+    report.add_plans('weekly_plans', weekly, *columns, weekly_ids, linking._describe_weekly)
+    columns = linking.monthly_key_columns(monthly)
+    monthly_ids = linking.link_keys(index, *columns)
+    report.add_plans('monthly_plans', monthly, *columns, monthly_ids, linking._describe_monthly)
+    report.add_tasks(tasks, {wp['weekly_id']: qid for wp, qid in zip(weekly, weekly_ids) if qid})
+    return report
+
+
+def bench_link(n_weekly, years):
+    quarterly, weekly, monthly, tasks = synthetic_plans(n_weekly, years)
+    print(f'{years} г.: {len(quarterly)} квартальных, {len(weekly)} недельных, {len(monthly)} месячных, {len(tasks)} задач')
+
+    start = time.perf_counter()
+    _legacy_link(quarterly, [dict(wp) for wp in weekly])
+    print(f'  построчно (исходный), только недельные  {time.perf_counter() - start:6.3f} s')
+
+    start = time.perf_counter()
+    index = linking.build_quarterly_index(quarterly)
+    linking.link_keys(index, *linking.weekly_key_columns(weekly))
+    print(f'  колоночно, только недельные             {time.perf_counter() - start:6.3f} s')
+
+    start = time.perf_counter()
+    report = _columnar_link(quarterly, weekly, monthly, tasks)
+    print(f'  колоночно: недельные + месячные + задачи {time.perf_counter() - start:6.3f} s')
+    for entity, stats in report.entities.items():
+        print(f'    {entity:14s} {stats}')
+
+
+def bench_write(n_weekly):
+    _, weekly, _, _ = synthetic_plans(n_weekly, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        full_path, clean_path = os.path.join(tmp, 'weekly_plans_full.json'), os.path.join(tmp, 'weekly_plans.json')
+        print(f'{len(weekly)} недельных планов: weekly_plans_full + weekly_plans')
+
+        start = time.perf_counter()
+        for path, rows in ((full_path, weekly),
+                           (clean_path, [{k: v for k, v in wp.items() if not k.startswith('_')} for wp in weekly])):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(rows, f, ensure_ascii=False, indent=2)
+        size = os.path.getsize(full_path) + os.path.getsize(clean_path)
+        print(f'  indent=2, копия списка (исходный)  {time.perf_counter() - start:6.3f} s  {size / 1e6:7.1f} MB')
+
+        orjson_module = jsonio.orjson
+        for label, ndjson, ext, use_orjson in (('компактный массив, один проход', False, 'json', False),
+                                               ('NDJSON, один проход', True, 'ndjson', False),
+                                               ('компактный массив + orjson', False, 'json', True)):
+            if use_orjson and orjson_module is None:
+                continue
+            jsonio.orjson = orjson_module if use_orjson else None
+            full_path, clean_path = (os.path.splitext(p)[0] + f'.{ext}' for p in (full_path, clean_path))
+            start = time.perf_counter()
+            write_split(full_path, clean_path, weekly, ndjson)
+            size = os.path.getsize(full_path) + os.path.getsize(clean_path)
+            print(f'  {label:32s} {time.perf_counter() - start:6.3f} s  {size / 1e6:7.1f} MB  (атомарно)')
+        jsonio.orjson = orjson_module
+
+
+def bench_rollup(n_rows):
+    """Кубы часов: колоночный pyarrow против словарей по csv на одном all_data.csv"""
+    print(f'Генерация {n_rows} строк...')
+    format_row = build_row_formatter()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'all_data.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(format_row(row) for row in synthetic_rows(n_rows))
+        print(f'  all_data.csv: {os.path.getsize(path) / 1e6:.1f} MB')
+
+        results = {}
+        for label, use_arrow in (('csv + словари', False), ('pyarrow group_by', True)):
+            if use_arrow and rollup_hours.pa is None:
+                print('  pyarrow не установлен - колоночный путь пропущен')
+                continue
+            start = time.perf_counter()
+            cubes, total, _ = rollup_hours.build_cubes([path], use_arrow)
+            elapsed = time.perf_counter() - start
+            results[label] = cubes
+            sizes = ', '.join(f'{grain} {len(rows)}' for grain, rows in cubes.items())
+            print(f'  {label:18s} {elapsed:7.2f} s  {total / elapsed:12,.0f} rows/s  ({sizes})')
+        if len(results) == 2:
+            first, second = results.values()
+            print(f'  Результаты совпадают: {first == second}')
+
+
+FUZZY_WORDS = ('управління', 'інцидентами', 'аудит', 'доступу', 'резервне', 'копіювання', 'моніторинг',
+               'вразливостей', 'навчання', 'персоналу', 'політика', 'безпеки', 'журналів', 'подій',
+               'сертифікатів', 'мережі', 'оновлення', 'систем', 'звіт', 'перевірка', 'ризиків', 'оцінка')
+
+
+def synthetic_fuzzy(n_rows, n_departments, years=2, seed=42):
+    """Квартальные планы с текстами из словаря и несвязанные строки - искажённые тексты этих планов"""
+    rnd = random.Random(seed)
+    new_id = lambda: str(uuid.UUID(int=rnd.getrandbits(128)))
+    departments = [new_id() for _ in range(n_departments)]
+    # Планы без года, как в QuarterlyPlan; год есть только у строк
+    quarterly = [{'quarterly_id': new_id(), 'department_id': d, 'quarter': q,
+                  'process_name': ' '.join(rnd.sample(FUZZY_WORDS, 3)),
+                  'expected_result': ' '.join(rnd.sample(FUZZY_WORDS, 4))}
+                 for d in departments for q in range(1, 5) for _ in range(15 * years)]
+    rows, truth = [], []
+    for _ in range(n_rows):
+        qp = rnd.choice(quarterly)
+        words = (qp['process_name'] + ' ' + qp['expected_result']).split()
+        words = [w[:-rnd.randrange(1, 3)] if rnd.random() < 0.3 else w for w in words if rnd.random() < 0.8]
+        rows.append((' '.join(words), rnd.randrange(2026 - years, 2026), qp['quarter'], qp['department_id']))
+        truth.append(qp['quarterly_id'])
+    return quarterly, rows, truth
+
+
+def _brute_fuzzy(quarterly, rows):
+    """Все пары строка x план одного квартала без индекса - эталон для сравнения"""
+    vectors = [ngrams(f'{qp["process_name"]} {qp["expected_result"]}') for qp in quarterly]
+    norms = [sum(v * v for v in vec.values()) ** 0.5 for vec in vectors]
+    result = []
+    for text, year, quarter, department in rows:
+        grams = ngrams(text)
+        norm = sum(v * v for v in grams.values()) ** 0.5 or 1.0
+        best, best_score = None, 0.0
+        for qp, vec, vec_norm in zip(quarterly, vectors, norms):
+            if qp.get('year') in (year, None) and qp['quarter'] == quarter:
+                score = sum(tf * vec[g] for g, tf in grams.items() if g in vec) / (norm * vec_norm)
+                if score > best_score:
+                    best, best_score = qp['quarterly_id'], score
+        result.append(best)
+    return result
+
+
+def bench_fuzzy(n_rows, n_departments):
+    quarterly, rows, truth = synthetic_fuzzy(n_rows, n_departments)
+    print(f'{len(quarterly)} квартальных планов, {len(rows)} несвязанных строк, {n_departments} отделов')
+
+    sample = min(len(rows), 2000)
+    start = time.perf_counter()
+    brute = _brute_fuzzy(quarterly, rows[:sample])
+    elapsed = time.perf_counter() - start
+    print(f'  перебор пар в квартале (tf, {sample} строк) {elapsed:6.3f} s  ~{elapsed * len(rows) / sample:7.1f} s на все'
+          f'  точность {sum(a == b for a, b in zip(brute, truth)) / sample:.1%}')
+
+    for label, with_department in (('блоки (год, квартал)', False), ('блоки (год, квартал, отдел)', True)):
+        start = time.perf_counter()
+        index = linking.build_fuzzy_index(quarterly)
+        built = time.perf_counter() - start
+        found = [index.best(text, year, quarter, department if with_department else None)
+                 for text, year, quarter, department in rows]
+        elapsed = time.perf_counter() - start
+        hits = sum(key == expected for (key, _), expected in zip(found, truth))
+        confident = sum(confidence >= linking.MIN_CONFIDENCE for _, confidence in found)
+        print(f'  TF-IDF индекс, {label:27s} {elapsed:6.3f} s (индекс {built:.3f} s)'
+              f'  точность {hits / len(rows):.1%}  >= {linking.MIN_CONFIDENCE}: {confident / len(rows):.1%}')
+
+
+SUITE_BASELINE = os.path.join(os.path.dirname(__file__), '..', 'data', 'import', 'reports', 'bench-baseline.json')
+SUITE_TOLERANCE = 0.25  # медленнее или тяжелее базовой линии на 25 % - регрессия
+
+
+def _suite_stages(tmp, url):
+    """Этапы пайплайна на синтетических данных: (имя, скрипт, аргументы, доп. env)"""
+    env = {'IMPORT_DIR': tmp, 'NEXT_PUBLIC_SUPABASE_URL': url, 'SUPABASE_SERVICE_ROLE_KEY': 'bench'}
+    return [
+        ('csv', 'excel_to_csv.py', [os.path.join(tmp, 'bdib_synthetic.xlsx'), '--output-dir', os.path.join(tmp, 'csv'),
+                                    '--jobs', '1', '--force'], env),
+        ('rollup', 'rollup_hours.py', ['--input', os.path.join(tmp, 'csv', 'bdib_synthetic', 'all_data.csv')], env),
+        ('link', 'link_weekly_to_quarterly.py', [], env),
+        ('import', 'import_to_supabase.py', [], env),
+        ('sync', 'update_weekly_plans.py', [], env),
+    ]
+
+
+def _run_reported(script, args, env, report_path):
+    """Запустить скрипт с --report; вернуть {'seconds', 'peak_rss_mb', 'rows'} из его отчёта"""
+    proc = subprocess.run([sys.executable, os.path.join(os.path.dirname(__file__), script), *args, '--report', report_path],
+                          env={**os.environ, **env, 'PYTHONIOENCODING': 'utf-8'}, capture_output=True, text=True,
+                          encoding='utf-8')
+    if proc.returncode != 0:
+        raise RuntimeError(f'{script}: код {proc.returncode}\n{proc.stdout[-2000:]}{proc.stderr[-2000:]}')
+    with open(report_path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    return {'seconds': report['seconds'], 'peak_rss_mb': report['peak_rss_mb'],
+            'rows': sum(st['rows'] for st in report['stages'])}
+
+
+def _compare(current, baseline, tolerance):
+    """Строка сравнения с базовой линией и признак регрессии"""
+    if not baseline:
+        return '', False
+    notes, regressed = [], False
+    for key, label in (('seconds', 'время'), ('peak_rss_mb', 'память')):
+        if current.get(key) is None or not baseline.get(key):
+            continue
+        change = current[key] / baseline[key] - 1
+        # Доли секунды шумят сильнее допуска - регрессией их не считаем
+        bad = change > tolerance and (key != 'seconds' or current[key] - baseline[key] > 0.2)
+        regressed |= bad
+        notes.append(f'{label} {change:+.0%}{" ❗" if bad else ""}')
+    return '  ' + ', '.join(notes), regressed
+
+
+def bench_suite(sizes, latency_ms, baseline_path, save_baseline, tolerance):
+    baseline = {}
+    if os.path.exists(baseline_path) and not save_baseline:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print(f'Базовая линия: {baseline_path if baseline else "нет"}; заглушка PostgREST, задержка {latency_ms} мс')
+
+    server, url = start_stub(latency_ms=latency_ms)
+    results, regressions = {}, []
+    try:
+        for size in sizes:
+            n_rows = parse_size(size)
+            results[size] = {}
+            print(f'\n{size} ({n_rows} строк):')
+            with tempfile.TemporaryDirectory() as tmp:
+                server.store = type(server.store)()  # чистые таблицы на каждый размер
+                stages = [('generate', 'synthetic_data.py', ['--rows', str(n_rows), '--output-dir', tmp], {})]
+                for name, script, args, env in stages + _suite_stages(tmp, url):
+                    current = _run_reported(script, args, env, os.path.join(tmp, f'{name}.report.json'))
+                    results[size][name] = current
+                    note, regressed = _compare(current, baseline.get(size, {}).get(name), tolerance)
+                    if regressed:
+                        regressions.append(f'{size}/{name}')
+                    print(f'  {name:9s} {current["seconds"]:8.2f} s  {current["peak_rss_mb"] or 0:7.1f} MB'
+                          f'  {current["rows"]:>9} строк{note}')
+    finally:
+        server.shutdown()
+
+    if save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with atomic_open(baseline_path) as f:
+            json.dump({'saved': datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0],
+                       'latency_ms': latency_ms, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f'\nБазовая линия сохранена: {baseline_path}')
+    elif regressions:
+        print(f'\nРегрессии (> {tolerance:.0%}): {", ".join(regressions)}')
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки скриптов импорта')
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    p_format = sub.add_parser('format', help='Форматирование строк excel_to_csv')
+    p_format.add_argument('--rows', type=int, default=1_000_000)
+
+    p_loader = sub.add_parser('loader', help='Загрузка батчей в заглушку PostgREST')
+    p_loader.add_argument('--rows', type=int, default=20_000)
+    p_loader.add_argument('--latency-ms', type=float, default=20)
+    p_loader.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+
+    p_wire = sub.add_parser('wire', help='Байты в сети и CPU сериализации батчей')
+    p_wire.add_argument('--rows', type=int, default=10_000)
+
+    p_link = sub.add_parser('link', help='Связывание планов с квартальными')
+    p_link.add_argument('--weekly', type=int, default=200_000)
+    p_link.add_argument('--years', type=int, default=4)
+
+    p_fuzzy = sub.add_parser('fuzzy', help='Нечёткие предложения квартальных планов')
+    p_fuzzy.add_argument('--rows', type=int, default=50_000)
+    p_fuzzy.add_argument('--departments', type=int, default=8)
+
+    p_write = sub.add_parser('write', help='Запись weekly_plans_full / weekly_plans')
+    p_write.add_argument('--weekly', type=int, default=200_000)
+
+    p_rollup = sub.add_parser('rollup', help='Кубы часов из all_data.csv')
+    p_rollup.add_argument('--rows', type=int, default=1_000_000)
+
+    p_suite = sub.add_parser('suite', help='Весь пайплайн на синтетических данных против базовой линии')
+    p_suite.add_argument('--sizes', nargs='+', default=['10k', '100k'], help='Размеры: 10k, 100k, 1m или число строк')
+    p_suite.add_argument('--latency-ms', type=float, default=5)
+    p_suite.add_argument('--baseline', default=SUITE_BASELINE, help='JSON базовой линии')
+    p_suite.add_argument('--save-baseline', action='store_true', help='Записать результаты как базовую линию')
+    p_suite.add_argument('--tolerance', type=float, default=SUITE_TOLERANCE, help='Допуск до регрессии (доля)')
+
+    args = parser.parse_args()
+
+    if args.bench == 'format':
+        bench_format(args.rows)
+    elif args.bench == 'loader':
+        bench_loader(args.rows, args.latency_ms, args.workers)
+    elif args.bench == 'wire':
+        bench_wire(args.rows)
+    elif args.bench == 'link':
+        bench_link(args.weekly, args.years)
+    elif args.bench == 'fuzzy':
+        bench_fuzzy(args.rows, args.departments)
+    elif args.bench == 'write':
+        bench_write(args.weekly)
+    elif args.bench == 'rollup':
+        bench_rollup(args.rows)
+    elif args.bench == 'suite':
+        bench_suite(args.sizes, args.latency_ms, args.baseline, args.save_baseline, args.tolerance)
+
+
+if __name__ == '__main__':
+    main()
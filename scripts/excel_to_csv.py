@@ -1,12 +1,40 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-"""Конвертация Excel в CSV для импорта"""
+"""
+Конвертация Excel в CSV для импорта.
+
+Использование:
+    python scripts/excel_to_csv.py
+        Активный лист EXCEL_PATH -> data/import/*.csv
+
+    python scripts/excel_to_csv.py data_sources/*.xlsx [--all-sheets] [--jobs N]
+        Несколько книг/листов параллельно (по процессу на книгу или лист).
+        Лист можно указать явно: "книга.xlsx::Лист".
+        Результат: data/import/<книга>/ или data/import/<книга>/<лист>/
+"""
 
 import openpyxl
+import argparse
 import csv
+import hashlib
+import json
 import os
 import sys
-from datetime import datetime
+import time
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from openpyxl.utils.exceptions import InvalidFileException
+
+import instrument
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet-вывод опционален
+    pa = None
+    pq = None
 
 sys.stdout.reconfigure(encoding='utf-8')
 
@@ -15,6 +43,11 @@ SCRIPT_DIR = os.path.dirname(__file__)
 EXCEL_PATH = os.path.join(SCRIPT_DIR, '..', 'bdib2025.xlsx')
 OUTPUT_DIR = os.path.join(SCRIPT_DIR, '..', 'data', 'import')
 
+ALL_DATA_FILE = 'all_data.csv'
+MANIFEST_FILE = '.manifest.json'  # хеши книги и CSV для инкрементальной регенерации
+PARQUET_DIR = 'parquet'           # типизированные колонки, один файл на отдел
+PARQUET_ROW_GROUP = 50_000
+
 # Колонки Excel
 COLUMNS = [
     'process',      # 0 - Процесс
@@ -32,6 +65,12 @@ COLUMNS = [
     'week',         # 12 - Неделя
 ]
 
+# Заголовки листа в том же порядке, что и COLUMNS
+EXCEL_HEADERS = [
+    'Процесс', 'Основна задача', 'Відділ', 'Сотрудник', 'План ч/г', 'Планова дата', 'Задача',
+    'Дата виконання', 'Документ', 'Примітка', 'предприятие', 'ФактК', 'Неделя',
+]
+
 
 def format_date(val):
     """Конвертировать дату в ISO формат"""
@@ -53,60 +92,589 @@ def format_value(val, col_name):
     return str(val).strip()
 
 
+def _format_text(val):
+    if val is None:
+        return ''
+    if type(val) is str:
+        return val.strip()
+    return str(val).strip()
+
+
+def _format_date(val):
+    if val is None:
+        return ''
+    if isinstance(val, datetime):
+        return f'{val.year:04d}-{val.month:02d}-{val.day:02d}'
+    return str(val)
+
+
+def _format_hours(val):
+    if val is None:
+        return ''
+    return str(float(val)) if val else '0'
+
+
+# Форматтер по типу колонки; всё, что не указано, — текст
+COLUMN_FORMATTERS = {
+    'plan_date': _format_date,
+    'fact_date': _format_date,
+    'plan_hours': _format_hours,
+    'fact_hours': _format_hours,
+}
+
+DEPT_INDEX = COLUMNS.index('department')
+
+
+def build_row_formatter(columns=COLUMNS):
+    """
+    Собрать форматтер строки: таблица индекс колонки -> функция строится один раз,
+    дальше каждая строка форматируется одним проходом zip без проверок имени колонки.
+    Результат совпадает с format_value для каждой ячейки.
+    """
+    formatters = tuple(COLUMN_FORMATTERS.get(col, _format_text) for col in columns)
+    width = len(formatters)
+    padding = (None,) * width
+
+    def format_row(row):
+        if len(row) < width:
+            row = tuple(row) + padding[len(row):]
+        return [f(v) for f, v in zip(formatters, row)]
+
+    return format_row
+
+
+def safe_filename(dept):
+    """Безопасное имя файла для отдела"""
+    return dept.replace(' ', '_').replace('/', '_')
+
+
+def unique_filename(stem, ext, taken):
+    """
+    stem + ext; если имя уже занято (другой отдел с тем же безопасным именем,
+    отдел "all_data") - stem_2 + ext, stem_3 + ext... Без учёта регистра, как в Windows.
+    """
+    taken = {name.lower() for name in taken}
+    filename, n = f'{stem}{ext}', 1
+    while filename.lower() in taken:
+        n += 1
+        filename = f'{stem}_{n}{ext}'
+    return filename
+
+
+def iter_csv_rows(ws, timings=None):
+    """Лениво читать строки листа и форматировать каждую ровно один раз; timings['parse_seconds'] - время openpyxl"""
+    format_row = build_row_formatter()
+    rows = ws.iter_rows(min_row=2, values_only=True)
+    if timings is not None:
+        rows = instrument.timed_iter(rows, timings, 'parse_seconds')
+    for row_number, row in enumerate(rows, start=2):
+        try:
+            csv_row = format_row(row)
+        except ValueError:
+            raise ValueError(_describe_bad_row(ws, row_number, row)) from None
+        yield csv_row[DEPT_INDEX] or 'unknown', csv_row, row
+
+
+def _describe_bad_row(ws, row_number, row):
+    """Какая ячейка не форматируется: лист с другой раскладкой колонок, чем bdib"""
+    for i, (col, val) in enumerate(zip(COLUMNS, row)):
+        try:
+            COLUMN_FORMATTERS.get(col, _format_text)(val)
+        except ValueError:
+            return (f'лист "{ws.title}", строка {row_number}, колонка {i + 1} "{EXCEL_HEADERS[i]}": '
+                    f'{val!r} не число - лист не в формате bdib')
+    return f'лист "{ws.title}", строка {row_number}: строка не в формате bdib'
+
+
+def _to_date(val):
+    if isinstance(val, datetime):
+        return val.date()
+    if isinstance(val, date):
+        return val
+    if isinstance(val, str):
+        try:
+            return date.fromisoformat(val.strip()[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def _to_float(val):
+    if val is None:
+        return None
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return None
+
+
+# Типизированные колонки для Parquet: даты и часы, остальное - строки
+PARQUET_CONVERTERS = {
+    'plan_date': _to_date,
+    'fact_date': _to_date,
+    'plan_hours': _to_float,
+    'fact_hours': _to_float,
+}
+
+
+def parquet_schema():
+    types = {_to_date: pa.date32(), _to_float: pa.float64()}
+    return pa.schema([
+        (col, types[PARQUET_CONVERTERS[col]] if col in PARQUET_CONVERTERS else pa.string())
+        for col in COLUMNS
+    ])
+
+
+class ParquetWriters:
+    """
+    Parquet по отделам (parquet/<отдел>.parquet) с настоящими date32/float64 колонками.
+    Строки копятся в буферах по колонкам и сбрасываются группами PARQUET_ROW_GROUP,
+    так что память ограничена размером группы, а не листа.
+    """
+
+    def __init__(self, output_dir):
+        self.dir = os.path.join(output_dir, PARQUET_DIR)
+        os.makedirs(self.dir, exist_ok=True)
+        self.schema = parquet_schema()
+        self.converters = [PARQUET_CONVERTERS.get(col) for col in COLUMNS]
+        self.buffers = {}
+        self.writers = {}
+        self.filenames = {}  # отдел -> имя файла, уникальное среди отделов
+
+    def _path(self, dept):
+        filename = self.filenames.get(dept)
+        if filename is None:
+            filename = self.filenames[dept] = unique_filename(safe_filename(dept), '.parquet', self.filenames.values())
+        return os.path.join(self.dir, filename)
+
+    def write(self, dept, csv_row, row):
+        columns = self.buffers.get(dept)
+        if columns is None:
+            columns = self.buffers[dept] = [[] for _ in COLUMNS]
+        width = len(row)
+        for i, conv in enumerate(self.converters):
+            if conv is None:
+                columns[i].append(csv_row[i] or None)
+            else:
+                columns[i].append(conv(row[i]) if i < width else None)
+        if len(columns[0]) >= PARQUET_ROW_GROUP:
+            self._flush(dept)
+
+    def _flush(self, dept):
+        columns = self.buffers[dept]
+        if not columns[0]:
+            return
+        table = pa.Table.from_arrays(
+            [pa.array(col, type=field.type) for col, field in zip(columns, self.schema)],
+            schema=self.schema,
+        )
+        writer = self.writers.get(dept)
+        if writer is None:
+            writer = self.writers[dept] = pq.ParquetWriter(self._path(dept) + '.tmp', self.schema)
+        writer.write_table(table)
+        self.buffers[dept] = [[] for _ in COLUMNS]
+
+    def finalize(self):
+        """Дописать буферы, атомарно заменить файлы; вернуть пути относительно каталога вывода"""
+        for dept in self.buffers:
+            self._flush(dept)
+        names = []
+        for dept, writer in self.writers.items():
+            writer.close()
+            os.replace(self._path(dept) + '.tmp', self._path(dept))
+            names.append(f'{PARQUET_DIR}/{self.filenames[dept]}')
+        return names
+
+    def discard(self):
+        for dept, writer in self.writers.items():
+            writer.close()
+            if os.path.exists(self._path(dept) + '.tmp'):
+                os.remove(self._path(dept) + '.tmp')
+
+
+class _HashedFile:
+    """Файл, который считает sha256 записанного содержимого"""
+
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.sha = hashlib.sha256()
+
+    def write(self, text):
+        self.sha.update(text.encode('utf-8'))
+        return self.file.write(text)
+
+    def close(self):
+        self.file.close()
+
+
+class DeptWriters:
+    """
+    CSV-писатели по отделам + общий файл; файлы отделов открываются по первой строке.
+    Пишем во временные файлы и на finalize() заменяем только те, чей хеш изменился.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.outputs = {}
+        self.writers = {}
+        self.counts = {}
+        self.paths = {}
+        self.total = 0
+
+        self.all_path = os.path.join(output_dir, ALL_DATA_FILE)
+        self.all_writer = self._open(ALL_DATA_FILE)
+
+    def _open(self, filename):
+        path = os.path.join(self.output_dir, filename)
+        out = _HashedFile(path + '.tmp')
+        writer = csv.writer(out)
+        writer.writerow(COLUMNS)
+        self.outputs[filename] = out
+        return writer
+
+    def _open_dept(self, dept):
+        # Файлы ключуются по имени: два отдела с одним безопасным именем не откроют один .tmp дважды
+        filename = unique_filename(safe_filename(dept), '.csv', self.outputs)
+        writer = self._open(filename)
+        self.writers[dept] = writer
+        self.counts[dept] = 0
+        self.paths[dept] = os.path.join(self.output_dir, filename)
+        return writer
+
+    def write(self, dept, csv_row):
+        writer = self.writers.get(dept) or self._open_dept(dept)
+        writer.writerow(csv_row)
+        self.all_writer.writerow(csv_row)
+        self.counts[dept] += 1
+        self.total += 1
+
+    def close(self):
+        for out in self.outputs.values():
+            out.close()
+
+    def discard(self):
+        for filename in self.outputs:
+            tmp = os.path.join(self.output_dir, filename + '.tmp')
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def finalize(self, previous_hashes):
+        """Заменить изменившиеся файлы; вернуть (хеши, записанные, без изменений)"""
+        hashes, written, unchanged = {}, [], []
+        for filename, out in self.outputs.items():
+            path = os.path.join(self.output_dir, filename)
+            digest = out.sha.hexdigest()
+            hashes[filename] = digest
+            if previous_hashes.get(filename) == digest and os.path.exists(path):
+                os.remove(path + '.tmp')
+                unchanged.append(filename)
+            else:
+                os.replace(path + '.tmp', path)
+                written.append(filename)
+        return hashes, written, unchanged
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close()
+        if exc_type is not None:
+            self.discard()
+
+
+def file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def header_mismatch(ws):
+    """Описание расхождения первой строки листа с EXCEL_HEADERS или None, если совпадает"""
+    header = next(ws.iter_rows(max_row=1, values_only=True), ())
+    normalized = [str(v).strip() if v is not None else '' for v in header[:len(EXCEL_HEADERS)]]
+    normalized += [''] * (len(EXCEL_HEADERS) - len(normalized))
+    diffs = [f'{i}: {got!r} вместо {want!r}' for i, (got, want) in enumerate(zip(normalized, EXCEL_HEADERS))
+             if got.lower() != want.lower()]
+    if not diffs:
+        return None
+    return f'заголовок не соответствует COLUMNS ({"; ".join(diffs[:3])}{"; ..." if len(diffs) > 3 else ""})'
+
+
+def convert_sheet(excel_path, sheet_name, output_dir, force=False, parquet=False, strict_headers=False):
+    """
+    Сконвертировать один лист (None - активный) в CSV по отделам + all_data.csv,
+    при parquet=True - ещё и в parquet/<отдел>.parquet.
+    Верхнеуровневая функция, чтобы её можно было отдать в ProcessPoolExecutor.
+
+    Колонки берутся по позиции. Заголовок, не совпавший с EXCEL_HEADERS, по
+    умолчанию только попадает в 'warning' результата; при strict_headers=True
+    лист отклоняется с ValueError.
+
+    Манифест в output_dir хранит хеш книги и каждого CSV: если книга не менялась,
+    лист не открывается вовсе; иначе перезаписываются только изменившиеся файлы.
+    """
+    start = time.perf_counter()
+    source_sha = file_sha256(excel_path)
+    manifest = {} if force else load_manifest(output_dir)
+
+    if (manifest.get('source_sha256') == source_sha
+            and manifest.get('sheet_arg') == sheet_name
+            and manifest.get('columns') == COLUMNS
+            and 'department_files' in manifest
+            and (not parquet or manifest.get('parquet'))
+            and all(os.path.exists(os.path.join(output_dir, name))
+                    for name in [*manifest.get('files', {}), *manifest.get('parquet', [])])):
+        return {
+            'input': excel_path,
+            'sheet': manifest['sheet'],
+            'output_dir': output_dir,
+            'rows': manifest['rows'],
+            'departments': manifest['departments'],
+            'paths': {dept: os.path.join(output_dir, filename)
+                      for dept, filename in manifest.get('department_files', {}).items()},
+            'all_path': os.path.join(output_dir, ALL_DATA_FILE),
+            'skipped': True,
+            'written': [],
+            'unchanged': list(manifest['files']),
+            'parquet': manifest.get('parquet', []),
+            'seconds': time.perf_counter() - start,
+        }
+
+    timings = {'hash_seconds': time.perf_counter() - start}
+    wb = openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
+    ws = wb[sheet_name] if sheet_name else wb.active
+    timings['open_seconds'] = time.perf_counter() - start - timings['hash_seconds']
+
+    warning = header_mismatch(ws)
+    if warning and strict_headers:
+        wb.close()
+        raise ValueError(f'{os.path.basename(excel_path)} / {ws.title}: {warning}')
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Один проход: строка сразу уходит в файл отдела, в общий файл и в Parquet
+    sink = ParquetWriters(output_dir) if parquet else None
+    try:
+        with DeptWriters(output_dir) as out:
+            for dept, csv_row, row in iter_csv_rows(ws, timings):
+                out.write(dept, csv_row)
+                if sink:
+                    sink.write(dept, csv_row, row)
+    except BaseException:
+        if sink:
+            sink.discard()
+        raise
+    finally:
+        wb.close()
+
+    hashes, written, unchanged = out.finalize(manifest.get('files', {}))
+    parquet_files = sink.finalize() if sink else []
+
+    # Файлы отделов, которых больше нет в книге, и устаревший Parquet
+    for filename in [*manifest.get('files', {}), *manifest.get('parquet', [])]:
+        if filename not in hashes and filename not in parquet_files and os.path.exists(os.path.join(output_dir, filename)):
+            os.remove(os.path.join(output_dir, filename))
+
+    save_manifest(output_dir, {
+        'source': os.path.basename(excel_path),
+        'source_sha256': source_sha,
+        'sheet_arg': sheet_name,
+        'sheet': ws.title,
+        'columns': COLUMNS,
+        'rows': out.total,
+        'departments': out.counts,
+        'department_files': {dept: os.path.basename(path) for dept, path in out.paths.items()},
+        'files': hashes,
+        'parquet': parquet_files,
+    })
+
+    return {
+        'input': excel_path,
+        'sheet': ws.title,
+        'output_dir': output_dir,
+        'rows': out.total,
+        'departments': out.counts,
+        'paths': out.paths,
+        'all_path': out.all_path,
+        'skipped': False,
+        'written': written,
+        'unchanged': unchanged,
+        'parquet': parquet_files,
+        'seconds': time.perf_counter() - start,
+        'timings': timings,
+        'warning': warning,
+    }
+
+
+def parse_input(spec):
+    """'книга.xlsx::Лист' -> (путь, лист); без '::' лист не задан"""
+    path, sep, sheet = spec.partition('::')
+    return path, (sheet if sep else None)
+
+
+def plan_jobs(inputs, all_sheets, output_dir, force=False, parquet=False, strict_headers=False):
+    """
+    Развернуть входы в список заданий (путь, лист, каталог вывода).
+    Порядок и каталоги зависят только от аргументов, поэтому вывод детерминирован.
+    У каждого задания свой каталог: совпавшие безопасные имена книг и листов
+    получают суффиксы _2, _3..., повтор того же листа той же книги отбрасывается.
+    """
+    jobs, planned = [], set()
+    stems = {}                     # книга -> каталог; одноимённые книги из разных папок - book, book_2...
+    sheet_dirs = defaultdict(set)  # каталог книги -> занятые каталоги листов ("A B" и "A_B")
+    for spec in inputs:
+        path, sheet = parse_input(spec)
+        book = os.path.normcase(os.path.abspath(path))
+        if book not in stems:
+            stems[book] = unique_filename(safe_filename(os.path.splitext(os.path.basename(path))[0]), '', stems.values())
+        stem = stems[book]
+        if sheet:
+            sheets = [sheet]
+        elif all_sheets:
+            try:
+                wb = openpyxl.load_workbook(path, read_only=True)
+            except (OSError, zipfile.BadZipFile, InvalidFileException):
+                # Не открывается - одно задание на книгу, его ошибка попадёт в сводку
+                jobs.append((path, None, os.path.join(output_dir, stem), force, parquet, strict_headers))
+                continue
+            sheets = wb.sheetnames
+            wb.close()
+        else:
+            if (book, None) not in planned:
+                planned.add((book, None))
+                jobs.append((path, None, os.path.join(output_dir, stem), force, parquet, strict_headers))
+            continue
+        for name in sheets:
+            if (book, name) in planned:
+                continue
+            planned.add((book, name))
+            sheet_dir = unique_filename(safe_filename(name), '', sheet_dirs[stem])
+            sheet_dirs[stem].add(sheet_dir)
+            jobs.append((path, name, os.path.join(output_dir, stem, sheet_dir), force, parquet, strict_headers))
+    return jobs
+
+
+def _run_job(excel_path, sheet_name, output_dir, force, parquet, strict_headers):
+    """Задание пула: ошибка листа не должна останавливать остальные"""
+    try:
+        return convert_sheet(excel_path, sheet_name, output_dir, force, parquet, strict_headers)
+    except (ValueError, KeyError, OSError, zipfile.BadZipFile, InvalidFileException) as e:
+        # Битая книга или не xlsx - такая же ошибка задания, как отсутствующий лист
+        return {'input': excel_path, 'sheet': sheet_name or '', 'rows': 0, 'seconds': 0.0,
+                'error': f'{type(e).__name__}: {e}'}
+
+
+def convert_many(jobs, workers):
+    """Запустить задания на пуле процессов; результаты в порядке заданий"""
+    if workers <= 1 or len(jobs) <= 1:
+        return [_run_job(*job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = [pool.submit(_run_job, *job) for job in jobs]
+        return [f.result() for f in futures]
+
+
+def record_results(results):
+    """Листы в отчёт instrument: разбор openpyxl отдельно от форматирования и записи"""
+    for r in results:
+        timings = r.get('timings', {})
+        outputs = [*r.get('paths', {}).values(), r.get('all_path')] if not r.get('skipped') else []
+        instrument.record(
+            f'convert:{os.path.basename(r["input"])}::{r["sheet"]}', r['seconds'], r['rows'],
+            sum(os.path.getsize(p) for p in outputs if p and os.path.exists(p)),
+            skipped=r.get('skipped', False), error=r.get('error'), warning=r.get('warning'),
+            **{k: round(v, 3) for k, v in timings.items()},
+            format_write_seconds=round(r['seconds'] - sum(timings.values()), 3) if timings else None)
+
+
+def print_summary(results, elapsed):
+    print(f'{"Вход":50s} {"Лист":24s} {"Строк":>8s} {"Время":>8s}  Файлы')
+    for r in results:
+        name = os.path.basename(r['input'])
+        if r.get('error'):
+            status = 'ошибка'
+        elif r['skipped']:
+            status = 'книга не изменилась'
+        else:
+            status = f'записано {len(r["written"])}, без изменений {len(r["unchanged"])}'
+        print(f'{name[:50]:50s} {r["sheet"][:24]:24s} {r["rows"]:8d} {r["seconds"]:7.2f}s  {status}')
+        if r.get('error'):
+            print(f'  ⚠️  {r["error"]}')
+        elif r.get('warning'):
+            print(f'  ⚠️  {r["warning"]} (--strict-headers, чтобы отклонять такие листы)')
+    total_rows = sum(r['rows'] for r in results)
+    print(f'\nИтого: {len(results)} листов, {total_rows} строк за {elapsed:.2f}s')
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Конвертация Excel в CSV для импорта')
+    parser.add_argument('inputs', nargs='*', help='Книги Excel (опционально "книга.xlsx::Лист")')
+    parser.add_argument('--all-sheets', action='store_true', help='Конвертировать все листы каждой книги')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help='Число процессов')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help='Каталог для CSV')
+    parser.add_argument('--force', action='store_true', help='Игнорировать манифест и перегенерировать всё')
+    parser.add_argument('--parquet', action='store_true', help='Дополнительно писать parquet/<отдел>.parquet')
+    parser.add_argument('--strict-headers', action='store_true',
+                        help='Отклонять листы, чей заголовок не совпадает с EXCEL_HEADERS (по умолчанию - предупреждение)')
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.parquet and pa is None:
+        parser.error('для --parquet нужен pyarrow: pip install pyarrow')
+
+    with instrument.session('excel_to_csv', args):
+        failed = run(args)
+    if failed:
+        sys.exit(1)
+
+
+def run(args):
+    """Число листов с ошибкой (0 - всё сконвертировано)"""
+    if args.inputs:
+        start = time.perf_counter()
+        jobs = plan_jobs(args.inputs, args.all_sheets, args.output_dir, args.force, args.parquet, args.strict_headers)
+        results = convert_many(jobs, args.jobs)
+        record_results(results)
+        print_summary(results, time.perf_counter() - start)
+        return sum(1 for r in results if r.get('error'))
+
     print(f'Loading: {EXCEL_PATH}')
-    wb = openpyxl.load_workbook(EXCEL_PATH, read_only=True, data_only=True)
-
-    ws = wb.active
-    rows = list(ws.iter_rows(min_row=2, values_only=True))
-    print(f'Total rows: {len(rows)}')
-
-    # Группируем по отделам
-    by_dept = {}
-    for row in rows:
-        dept = str(row[2]).strip() if row[2] else 'unknown'
-        if dept not in by_dept:
-            by_dept[dept] = []
-        by_dept[dept].append(row)
-
-    print(f'\nОтделы: {list(by_dept.keys())}')
-
-    # Создаем CSV для каждого отдела
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-    for dept, dept_rows in by_dept.items():
-        # Безопасное имя файла
-        safe_name = dept.replace(' ', '_').replace('/', '_')
-        csv_path = os.path.join(OUTPUT_DIR, f'{safe_name}.csv')
-
-        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(COLUMNS)
-
-            for row in dept_rows:
-                csv_row = []
-                for i, col_name in enumerate(COLUMNS):
-                    val = row[i] if i < len(row) else None
-                    csv_row.append(format_value(val, col_name))
-                writer.writerow(csv_row)
-
-        print(f'  {dept}: {len(dept_rows)} rows -> {csv_path}')
-
-    # Также создаем общий файл
-    all_csv = os.path.join(OUTPUT_DIR, 'all_data.csv')
-    with open(all_csv, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(COLUMNS)
-        for row in rows:
-            csv_row = []
-            for i, col_name in enumerate(COLUMNS):
-                val = row[i] if i < len(row) else None
-                csv_row.append(format_value(val, col_name))
-            writer.writerow(csv_row)
-    print(f'\nОбщий файл: {len(rows)} rows -> {all_csv}')
-
-    wb.close()
+    result = convert_sheet(EXCEL_PATH, None, args.output_dir, args.force, args.parquet, args.strict_headers)
+    record_results([result])
+    if result.get('warning'):
+        print(f'⚠️  {result["warning"]} (--strict-headers, чтобы отклонять такие листы)')
+
+    if result['skipped']:
+        print('Книга не изменилась с прошлого запуска, CSV актуальны (--force для перегенерации)')
+        return 0
+
+    print(f'Total rows: {result["rows"]}')
+    print(f'\nОтделы: {list(result["departments"].keys())}')
+    for dept, count in result['departments'].items():
+        mark = '' if os.path.basename(result['paths'][dept]) in result['written'] else ' (без изменений)'
+        print(f'  {dept}: {count} rows -> {result["paths"][dept]}{mark}')
+    print(f'\nОбщий файл: {result["rows"]} rows -> {result["all_path"]}')
+    for name in result['parquet']:
+        print(f'Parquet: {os.path.join(args.output_dir, name)}')
+
     print('\nГотово!')
+    return 0
 
 
 if __name__ == '__main__':
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Нечёткий поиск квартального плана для строк без точного ключа (process_id, квартал).
+
+Квартальные планы индексируются по символьным триграммам названия процесса,
+цели и ожидаемого результата (TF-IDF, косинусная близость). Индекс разбит на
+блоки (год, квартал, отдел): запрос сравнивается только с планами своего
+квартала, поэтому стоимость - постинги нескольких блоков, а не все пары
+"строка x план". Одинаковые тексты в одном блоке считаются один раз.
+"""
+import re
+from collections import Counter, defaultdict
+from math import log, sqrt
+
+NGRAM = 3
+MIN_CONFIDENCE = 0.35  # ниже - предложение не записывается
+ANY_DEPARTMENT = '*'
+
+_NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+def ngrams(text, n=NGRAM):
+    """Счётчик символьных n-грамм; слова дополняются пробелами, чтобы начало/конец слова весили больше"""
+    grams = Counter()
+    for word in _NON_WORD_RE.sub(' ', str(text or '').lower()).split():
+        padded = f' {word} '
+        grams.update(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+    return grams
+
+
+class NgramIndex:
+    """Блочный TF-IDF индекс по n-граммам: add() для всех планов, затем build() и best()"""
+
+    def __init__(self, n=NGRAM):
+        self.n = n
+        self.keys = []
+        self.grams = []
+        self.blocks = defaultdict(list)  # блок -> номера документов
+        self.postings = {}  # блок -> {n-грамма: [(док, вес)]}
+        self.idf = {}
+        self.unseen_idf = 0.0
+        self._cache = {}
+
+    def add(self, key, text, year, quarter, department=None):
+        """План попадает в блок своего отдела и в общий блок квартала"""
+        doc = len(self.keys)
+        self.keys.append(key)
+        self.grams.append(ngrams(text, self.n))
+        self.blocks[(year, quarter, department or ANY_DEPARTMENT)].append(doc)
+        if department:
+            self.blocks[(year, quarter, ANY_DEPARTMENT)].append(doc)
+
+    def build(self):
+        n_docs = len(self.keys)
+        df = Counter(g for grams in self.grams for g in grams)
+        self.idf = {g: log((n_docs + 1) / (count + 0.5)) for g, count in df.items()}
+        self.unseen_idf = log((n_docs + 1) / 0.5)
+
+        # Нормированные векторы документов: косинус = скалярное произведение
+        vectors = []
+        for grams in self.grams:
+            weights = {g: tf * self.idf[g] for g, tf in grams.items()}
+            norm = sqrt(sum(w * w for w in weights.values())) or 1.0
+            vectors.append({g: w / norm for g, w in weights.items()})
+
+        # Постинги хранят номер документа внутри блока: очки копятся в списке, а не в словаре
+        for block, docs in self.blocks.items():
+            postings = defaultdict(list)
+            for local, doc in enumerate(docs):
+                for g, w in vectors[doc].items():
+                    postings[g].append((local, w))
+            self.postings[block] = dict(postings)
+        self.grams = None
+        return self
+
+    def _blocks_for(self, year, quarter, department):
+        """Блоки своего года и планов без года; отдел - если по нему есть блок, иначе весь квартал"""
+        blocks = []
+        for y in ((year, None) if year is not None else (None,)):
+            block = (y, quarter, department or ANY_DEPARTMENT)
+            if block not in self.postings:
+                block = (y, quarter, ANY_DEPARTMENT)
+            if block in self.postings:
+                blocks.append(block)
+        return tuple(blocks)
+
+    def best(self, text, year, quarter, department=None):
+        """(ключ, уверенность 0..1) лучшего плана в блоках запроса; (None, 0.0) если кандидатов нет"""
+        blocks = self._blocks_for(year, quarter, department)
+        if not blocks:
+            return None, 0.0
+        cache_key = (blocks, text)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        grams = ngrams(text, self.n)
+        # N-граммы, которых нет ни в одном плане, не дают очков, но входят в норму с наибольшим idf
+        weights = {g: tf * self.idf.get(g, self.unseen_idf) for g, tf in grams.items()}
+        norm = sqrt(sum(w * w for w in weights.values()))
+        result = (None, 0.0)
+        best_doc, best_score = None, 0.0
+        if norm:
+            for block in blocks:
+                postings = self.postings[block]
+                docs = self.blocks[block]
+                scores = [0.0] * len(docs)
+                for g, w in weights.items():
+                    for local, doc_weight in postings.get(g, ()):
+                        scores[local] += w * doc_weight
+                score = max(scores)
+                # Ничья - в пользу плана, добавленного раньше
+                doc = docs[scores.index(score)]
+                if score > best_score or (score == best_score and best_doc is not None and doc < best_doc):
+                    best_doc, best_score = doc, score
+        if best_doc is not None:
+            result = (self.keys[best_doc], min(1.0, best_score / norm))
+        self._cache[cache_key] = result
+        return result
@@ -3,130 +3,143 @@
 """
 Импорт данных в Supabase.
 Порядок: quarterly_plans -> weekly_plans -> weekly_plan_assignees -> weekly_plan_companies -> weekly_tasks
+
+--staging: файлы сначала загружаются в SQLite (см. staging), до отправки
+проверяются повторы ключей и ссылки между файлами, а батчи читаются из
+базы постранично.
 """
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
-import json
+import argparse
 import os
-import requests
 from dotenv import load_dotenv
 
+import instrument
+import staging
+from supabase_loader import DEFAULT_GZIP, DEFAULT_WORKERS, BulkLoader
+
 # Загружаем .env.local
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env.local'))
 
 SUPABASE_URL = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 
-IMPORT_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'import')
-
-HEADERS = {
-    'apikey': SUPABASE_KEY,
-    'Authorization': f'Bearer {SUPABASE_KEY}',
-    'Content-Type': 'application/json',
-    'Prefer': 'return=minimal'
-}
+IMPORT_DIR = os.getenv('IMPORT_DIR') or os.path.join(os.path.dirname(__file__), '..', 'data', 'import')
 
-BATCH_SIZE = 500  # Размер батча для вставки
+# Порядок важен: внешние ключи
+TABLES = ['quarterly_plans', 'weekly_plans', 'weekly_plan_assignees', 'weekly_plan_companies', 'weekly_tasks']
 
 
-def import_table(table_name, json_file, id_field=None):
+def import_table(loader, table_name, json_file, id_field=None):
     """Импорт данных в таблицу"""
-    filepath = os.path.join(IMPORT_DIR, json_file)
-
-    if not os.path.exists(filepath):
-        print(f'  ⚠️  Файл не найден: {json_file}')
-        return 0
-
-    with open(filepath, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    total = len(data)
-    if total == 0:
-        print(f'  ⚠️  Пустой файл: {json_file}')
-        return 0
-
-    print(f'  📦 {table_name}: {total} записей...', end=' ', flush=True)
+    with instrument.stage(f'import:{table_name}', loader, table_name):
+        return loader.import_file(table_name, os.path.join(IMPORT_DIR, json_file))
+
+
+def import_staged(loader, store, table_name):
+    """Импорт таблицы из хранилища: строки постранично по порядку файла"""
+    with instrument.stage(f'import:{table_name}', loader, table_name):
+        if not store.has_table(table_name):
+            print(f'  ⚠️  Файл не найден: {table_name}.json')
+            return 0
+        return loader.import_rows(table_name, store.iter_rows(table_name), total=store.count(table_name))
+
+
+def stage_files(store):
+    """Загрузить файлы в хранилище и напечатать проблемы (ссылки - только в пределах файлов импорта)"""
+    print(f'🗄️  Хранилище {store.path}:')
+    with instrument.stage('stage') as st:
+        counts = staging.load_import_files(store, TABLES, IMPORT_DIR)
+        st.add(rows=sum(n or 0 for n in counts.values()))
+    for table, n in counts.items():
+        print(f'  {table}: {"нет файла" if n is None else n}')
+    for text, n in staging.validate(store, [t for t, n in counts.items() if n is not None]):
+        print(f'  ⚠️  {text}: {n}')
+    print()
 
-    # Импортируем батчами
-    imported = 0
-    errors = 0
 
-    for i in range(0, total, BATCH_SIZE):
-        batch = data[i:i + BATCH_SIZE]
+def check_existing(loader, table_name, count_only=True):
+    """Проверить существующие записи"""
+    return loader.count(table_name)
 
-        url = f'{SUPABASE_URL}/rest/v1/{table_name}'
-        response = requests.post(url, headers=HEADERS, json=batch)
 
-        if response.status_code in (200, 201):
-            imported += len(batch)
-            # Прогресс
-            pct = 100 * imported / total
-            print(f'\r  📦 {table_name}: {imported}/{total} ({pct:.0f}%)', end='', flush=True)
+def main():
+    parser = argparse.ArgumentParser(description='Импорт данных в Supabase')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_WORKERS,
+                        help=f'Батчей одновременно в полёте (по умолчанию {DEFAULT_WORKERS}, env IMPORT_WORKERS)')
+    parser.add_argument('--gzip', action='store_true', default=DEFAULT_GZIP,
+                        help='Сжимать тела запросов gzip (env IMPORT_GZIP=1)')
+    staging.add_argument(parser)
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    with instrument.session('import_to_supabase', args), \
+            BulkLoader(SUPABASE_URL, SUPABASE_KEY, workers=args.workers, gzip=args.gzip) as loader:
+        if args.staging:
+            with staging.StagingStore(args.staging) as store:
+                run(loader, store)
         else:
-            errors += len(batch)
-            print(f'\n  ❌ Ошибка: {response.status_code} - {response.text[:200]}')
+            run(loader)
+    if loader.failed_count():
+        sys.exit(1)
 
-    if errors == 0:
-        print(f'\r  ✅ {table_name}: {imported} записей импортировано')
-    else:
-        print(f'\r  ⚠️  {table_name}: {imported} OK, {errors} ошибок')
 
-    return imported
-
-
-def check_existing(table_name, count_only=True):
-    """Проверить существующие записи"""
-    url = f'{SUPABASE_URL}/rest/v1/{table_name}?select=count'
-    headers = {**HEADERS, 'Prefer': 'count=exact'}
-    response = requests.head(url, headers=headers)
-
-    if response.status_code == 200:
-        count = response.headers.get('content-range', '').split('/')[-1]
-        return int(count) if count.isdigit() else 0
-    return 0
-
-
-def main():
+def run(loader, store=None):
     print('='*60)
     print('ИМПОРТ ДАННЫХ В SUPABASE')
     print('='*60)
     print(f'URL: {SUPABASE_URL}')
     print()
 
+    if store is not None:
+        stage_files(store)
+
     # Проверяем текущее состояние
     print('📊 Текущее состояние БД:')
-    tables = ['quarterly_plans', 'weekly_plans', 'weekly_plan_assignees', 'weekly_plan_companies', 'weekly_tasks']
-    for table in tables:
-        count = check_existing(table)
-        print(f'  {table}: {count} записей')
+    with instrument.stage('count:before') as st:
+        for table in TABLES:
+            count = check_existing(loader, table)
+            st.add(rows=count)
+            print(f'  {table}: {count} записей')
     print()
 
     # Импорт
     print('📥 Импорт данных:')
 
-    # 1. Квартальные планы
-    import_table('quarterly_plans', 'quarterly_plans.json', 'quarterly_id')
+    if store is not None:
+        for table in TABLES:
+            import_staged(loader, store, table)
+    else:
+        # 1. Квартальные планы
+        import_table(loader, 'quarterly_plans', 'quarterly_plans.json', 'quarterly_id')
 
-    # 2. Недельные планы
-    import_table('weekly_plans', 'weekly_plans.json', 'weekly_id')
+        # 2. Недельные планы
+        import_table(loader, 'weekly_plans', 'weekly_plans.json', 'weekly_id')
 
-    # 3. Связи план-сотрудник
-    import_table('weekly_plan_assignees', 'weekly_plan_assignees.json')
+        # 3. Связи план-сотрудник
+        import_table(loader, 'weekly_plan_assignees', 'weekly_plan_assignees.json')
 
-    # 4. Связи план-компания
-    import_table('weekly_plan_companies', 'weekly_plan_companies.json')
+        # 4. Связи план-компания
+        import_table(loader, 'weekly_plan_companies', 'weekly_plan_companies.json')
 
-    # 5. Задачи
-    import_table('weekly_tasks', 'weekly_tasks.json', 'weekly_tasks_id')
+        # 5. Задачи
+        import_table(loader, 'weekly_tasks', 'weekly_tasks.json', 'weekly_tasks_id')
 
     print()
     print('📊 Состояние БД после импорта:')
-    for table in tables:
-        count = check_existing(table)
-        print(f'  {table}: {count} записей')
+    with instrument.stage('count:after') as st:
+        for table in TABLES:
+            count = check_existing(loader, table)
+            st.add(rows=count)
+            print(f'  {table}: {count} записей')
 
     print()
-    print('✅ Импорт завершён!')
+    failed = loader.failed_count()
+    if failed:
+        print(f'⚠️  Импорт завершён с ошибками: не записано {failed} строк '
+              f'({", ".join(f"{t}: {n}" for t, n in loader.failures.items())}), см. {loader.dead_letter_dir}')
+    else:
+        print('✅ Импорт завершён!')
 
 
 if __name__ == '__main__':
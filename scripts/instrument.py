@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Замеры этапов скриптов импорта: время, строки/с, байты, задержки HTTP, пиковая память.
+
+Скрипт оборачивает main в `with session(имя, args)`, а этапы - в
+`with stage(...)`; отчёт пишется и при исключении (с полем error). Без --report/--profile (и IMPORT_REPORT) stage()
+ничего не записывает, так что замеры можно оставлять в коде.
+
+Для этапов загрузки stage(..., loader=loader, table=...) берёт разницу
+BulkLoader.stats до и после: строки, запросы, байты JSON и в сети, время
+кодирования/gzip и гистограмму задержек батчей.
+
+Отчёт - JSON в data/import/reports/<скрипт>-<время>.json (или путь из
+--report). --profile пишет cProfile главного потока (.prof для pstats/snakeviz);
+батчи, отправляемые из пула потоков BulkLoader, в профиль не попадают - их
+время видно в latency этапа.
+"""
+import contextlib
+import cProfile
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: пиковую память не меряем
+    resource = None
+
+from jsonio import atomic_open
+
+REPORT_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'import', 'reports')
+REPORT_ENV = os.getenv('IMPORT_REPORT', '')  # '1' - отчёт в REPORT_DIR, иначе путь
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_LOADER_COUNTERS = ('rows', 'requests', 'raw_bytes', 'wire_bytes', 'encode_seconds', 'compress_seconds')
+
+
+def peak_rss_mb():
+    """
+    Пиковый RSS процесса в МБ; None, если не поддерживается.
+    В Linux - VmHWM: ru_maxrss переживает fork+exec, и дочерний скрипт
+    унаследовал бы пик родителя (например, бенчмарка, который его запустил).
+    """
+    try:
+        with open('/proc/self/status', 'rb') as f:
+            for line in f:
+                if line.startswith(b'VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # ru_maxrss - КБ в Linux, байты в macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def latency_summary(seconds):
+    """Гистограмма (мс, верхние границы корзин) и перцентили задержек"""
+    if not seconds:
+        return None
+    ms = sorted(1000 * s for s in seconds)
+    pick = lambda q: round(ms[min(len(ms) - 1, int(q * len(ms)))], 1)
+    histogram = {f'<={b}': 0 for b in LATENCY_BUCKETS_MS}
+    histogram[f'>{LATENCY_BUCKETS_MS[-1]}'] = 0
+    for value in ms:
+        bucket = next((f'<={b}' for b in LATENCY_BUCKETS_MS if value <= b), f'>{LATENCY_BUCKETS_MS[-1]}')
+        histogram[bucket] += 1
+    return {
+        'count': len(ms),
+        'mean_ms': round(sum(ms) / len(ms), 1),
+        'p50_ms': pick(0.5),
+        'p95_ms': pick(0.95),
+        'p99_ms': pick(0.99),
+        'max_ms': round(ms[-1], 1),
+        'histogram_ms': histogram,
+    }
+
+
+class Stage:
+    """Замер одного этапа; rows/bytes можно наращивать внутри with"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.extra = {}
+
+    def add(self, rows=0, bytes=0):
+        self.rows += rows
+        self.bytes += bytes
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'seconds': round(self.seconds, 3),
+            'cpu_seconds': round(self.cpu_seconds, 3) if self.cpu_seconds is not None else None,
+            'rows': self.rows,
+            'rows_per_second': round(self.rows / self.seconds) if self.seconds and self.rows else None,
+            'bytes': self.bytes,
+            **self.extra,
+        }
+
+
+class RunReport:
+    """Этапы одного запуска скрипта и итоговый JSON-отчёт"""
+
+    def __init__(self, name, path=None, profile_path=None, report=True):
+        self.name = name
+        self.path = path
+        self.report = report
+        self.profile_path = profile_path
+        self.stages = []
+        self.started = datetime.now()
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.profiler = None
+        self.error = None
+
+    @contextlib.contextmanager
+    def stage(self, name, loader=None, table=None):
+        st = Stage(name)
+        before = _loader_snapshot(loader, table or name) if loader else None
+        start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield st
+        finally:
+            st.seconds = time.perf_counter() - start
+            st.cpu_seconds = time.process_time() - cpu_start
+            if loader:
+                _loader_delta(st, loader, table or name, before)
+            st.extra['peak_rss_mb'] = peak_rss_mb()
+            self.stages.append(st)
+
+    def record(self, name, seconds, rows=0, bytes=0, **extra):
+        """Этап, замеренный в другом месте (например, в процессе пула); CPU не известно"""
+        st = Stage(name)
+        st.seconds, st.cpu_seconds, st.rows, st.bytes = seconds, None, rows, bytes
+        st.extra.update(extra)
+        self.stages.append(st)
+        return st
+
+    def as_dict(self):
+        return {
+            'script': self.name,
+            'started': self.started.isoformat(timespec='seconds'),
+            'seconds': round(time.perf_counter() - self.start, 3),
+            'cpu_seconds': round(time.process_time() - self.cpu_start, 3),
+            'peak_rss_mb': peak_rss_mb(),
+            'python': platform.python_version(),
+            'argv': sys.argv[1:],
+            'error': self.error,
+            'stages': [st.as_dict() for st in self.stages],
+        }
+
+    def write(self):
+        path = self.path
+        if path is None:
+            os.makedirs(REPORT_DIR, exist_ok=True)
+            path = os.path.join(REPORT_DIR, f'{self.name}-{self.started:%Y%m%d-%H%M%S}.json')
+        with atomic_open(path) as f:
+            json.dump(self.as_dict(), f, ensure_ascii=False, indent=2)
+        return path
+
+
+def _loader_snapshot(loader, table):
+    stats = loader.table_stats(table)
+    with loader.stats_lock:
+        return {**{k: stats[k] for k in _LOADER_COUNTERS}, 'batches': len(stats['batch_seconds'])}
+
+
+def _loader_delta(st, loader, table, before):
+    stats = loader.table_stats(table)
+    with loader.stats_lock:
+        delta = {k: stats[k] - before[k] for k in _LOADER_COUNTERS}
+        latencies = stats['batch_seconds'][before['batches']:]
+    st.add(rows=delta['rows'], bytes=delta['wire_bytes'])
+    st.extra.update({
+        'requests': delta['requests'],
+        'raw_bytes': delta['raw_bytes'],
+        'encode_seconds': round(delta['encode_seconds'], 3),
+        'compress_seconds': round(delta['compress_seconds'], 3),
+        'latency': latency_summary(latencies),
+    })
+
+
+def timed_iter(iterable, timings, key):
+    """Пропустить итератор насквозь, накапливая в timings[key] время внутри next() - например, разбор openpyxl"""
+    clock = time.perf_counter
+    timings.setdefault(key, 0.0)
+    it = iter(iterable)
+    while True:
+        start = clock()
+        try:
+            item = next(it)
+        except StopIteration:
+            timings[key] += clock() - start
+            return
+        timings[key] += clock() - start
+        yield item
+
+
+# Текущий запуск: stage() в коде скриптов без явной передачи отчёта
+_current = None
+
+
+def add_arguments(parser):
+    parser.add_argument('--report', nargs='?', const='', default=None, metavar='PATH',
+                        help='JSON-отчёт по этапам (по умолчанию data/import/reports/<скрипт>-<время>.json, env IMPORT_REPORT)')
+    parser.add_argument('--profile', metavar='PATH', help='Записать cProfile главного потока в PATH (.prof)')
+
+
+def begin(name, args=None):
+    """Начать запуск, если отчёт или профиль запрошены (аргументами add_arguments или IMPORT_REPORT)"""
+    global _current
+    report = getattr(args, 'report', None)
+    if report is None and REPORT_ENV:
+        report = '' if REPORT_ENV == '1' else REPORT_ENV
+    profile_path = getattr(args, 'profile', None)
+    if report is None and not profile_path:
+        return None
+    _current = RunReport(name, report or None, profile_path, report is not None)
+    if profile_path:
+        _current.profiler = cProfile.Profile()
+        _current.profiler.enable()
+    return _current
+
+
+def stage(name, loader=None, table=None):
+    """Замер этапа текущего запуска; без запуска - пустой Stage, который никуда не пишется"""
+    if _current is None:
+        return contextlib.nullcontext(Stage(name))
+    return _current.stage(name, loader, table)
+
+
+def record(name, seconds, rows=0, bytes=0, **extra):
+    if _current is not None:
+        _current.record(name, seconds, rows, bytes, **extra)
+
+
+def finish():
+    """Записать отчёт и профиль; вернуть путь отчёта (None, если запуска не было)"""
+    global _current
+    run, _current = _current, None
+    if run is None:
+        return None
+    if run.profiler:
+        run.profiler.disable()
+        run.profiler.dump_stats(run.profile_path)
+        print(f'\n⏱️  Профиль: {run.profile_path}')
+    if not run.report:
+        return None
+    path = run.write()
+    print(f'⏱️  Отчёт: {path}')
+    return path
+
+
+@contextlib.contextmanager
+def session(name, args=None):
+    """begin() ... finish(); исключение попадает в отчёт и пробрасывается дальше"""
+    run = begin(name, args)
+    try:
+        yield run
+    except BaseException as e:
+        if run is not None:
+            run.error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        finish()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Потоковое чтение/запись файлов импорта.
+
+Поддерживаются два формата:
+- JSON-массив (`[{...}, {...}]`) - читается инкрементально, без json.load всего файла;
+- NDJSON (`.ndjson` / `.jsonl`) - одна запись на строку.
+Память ограничена одной записью (плюс буфер чтения), а не размером файла.
+
+Запись атомарная: данные идут во временный файл рядом с целевым, который
+после fsync подменяется через os.replace. Прерванный запуск оставляет
+прежний файл (или никакого), но не обрезанный. JSON-массив пишется
+компактно, по записи на строку, - его так же потоково читает iter_json_rows.
+"""
+import contextlib
+import json
+import os
+import tempfile
+
+try:
+    import orjson
+except ImportError:  # orjson опционален, json тоже справляется
+    orjson = None
+
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+CHUNK_SIZE = 1 << 16
+
+# json.dumps с нестандартными параметрами создаёт энкодер на каждый вызов
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def encode_row(row):
+    """Компактный UTF-8 JSON одной записи"""
+    if orjson is not None:
+        return orjson.dumps(row)
+    return _JSON_ENCODER.encode(row).encode('utf-8')
+
+
+def is_ndjson(path):
+    return path.endswith(NDJSON_EXTENSIONS)
+
+
+def ndjson_path(path):
+    """weekly_plans.json -> weekly_plans.ndjson"""
+    return os.path.splitext(path)[0] + '.ndjson'
+
+
+def resolve_import_file(path):
+    """Из <имя>.json и <имя>.ndjson выбрать более свежий существующий; None, если нет ни одного"""
+    candidates = [p for p in (path, ndjson_path(path)) if os.path.exists(p)]
+    if not candidates:
+        return None
+    return max(candidates, key=os.path.getmtime)
+
+
+def _iter_ndjson(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _iter_json_array(f, chunk_size=CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    buf = f.read(chunk_size)
+    eof = not buf
+    pos = 0
+
+    def skip(chars):
+        nonlocal buf, pos, eof
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            buf, pos = f.read(chunk_size), 0
+            eof = not buf
+
+    skip(' \t\r\n﻿')
+    if pos >= len(buf) or buf[pos] != '[':
+        raise ValueError(f'{f.name}: ожидался JSON-массив')
+    pos += 1
+
+    while True:
+        skip(' \t\r\n,')
+        if pos >= len(buf):
+            raise ValueError(f'{f.name}: неожиданный конец файла')
+        if buf[pos] == ']':
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            end = None
+        # Элемент не поместился в буфер (или мог быть обрезан) - дочитываем
+        if end is None or (end == len(buf) and not eof):
+            if eof:
+                raise ValueError(f'{f.name}: битый JSON около позиции {pos}')
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        yield obj
+        pos = end
+        if pos > chunk_size:
+            buf, pos = buf[pos:], 0
+
+
+def iter_json_rows(path):
+    """Построчно отдать записи из JSON-массива или NDJSON"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if is_ndjson(path):
+            yield from _iter_ndjson(f)
+        else:
+            yield from _iter_json_array(f)
+
+
+def _file_mode(path):
+    """Права заменяемого файла; для нового - как у open() (mkstemp создаёт 0600)"""
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+@contextlib.contextmanager
+def atomic_open(path, binary=False):
+    """Файл для записи, который появляется под именем path только при успешном выходе из with"""
+    with atomic_open_all([path], binary) as (f,):
+        yield f
+
+
+@contextlib.contextmanager
+def atomic_open_all(paths, binary=False):
+    """
+    atomic_open для нескольких файлов сразу: все временные файлы дописываются и
+    сбрасываются на диск, и только потом подменяются - ни один путь не меняется,
+    пока хоть один файл не записан целиком.
+    """
+    files, tmp_paths = [], []
+    try:
+        for path in paths:
+            directory, name = os.path.split(os.path.abspath(path))
+            fd, tmp_path = tempfile.mkstemp(prefix=f'.{name}.', suffix='.tmp', dir=directory)
+            tmp_paths.append(tmp_path)
+            os.chmod(tmp_path, _file_mode(path))
+            files.append(open(fd, 'wb') if binary else open(fd, 'w', encoding='utf-8', newline='\n'))
+        yield files
+        for f in files:
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+        for tmp_path, path in zip(tmp_paths, paths):
+            os.replace(tmp_path, path)
+    except BaseException:
+        for f in files:
+            with contextlib.suppress(OSError):
+                f.close()
+        for tmp_path in tmp_paths:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+        raise
+
+
+class RowWriter:
+    """Потоковая запись записей в открытый двоичный файл: NDJSON или компактный JSON-массив"""
+
+    def __init__(self, f, ndjson):
+        self.f = f
+        self.ndjson = ndjson
+        self.count = 0
+
+    def write(self, row):
+        if self.ndjson:
+            self.f.write(encode_row(row))
+            self.f.write(b'\n')
+        else:
+            self.f.write(b',\n' if self.count else b'[\n')
+            self.f.write(encode_row(row))
+        self.count += 1
+
+    def close(self):
+        if not self.ndjson:
+            self.f.write(b'\n]\n' if self.count else b'[]\n')
+        return self.count
+
+
+def write_rows(path, rows, ndjson=None):
+    """Атомарно записать записи (формат по расширению, если ndjson не задан); вернуть количество"""
+    if ndjson is None:
+        ndjson = is_ndjson(path)
+    with atomic_open(path, binary=True) as f:
+        writer = RowWriter(f, ndjson)
+        for row in rows:
+            writer.write(row)
+        return writer.close()
+
+
+def write_ndjson(path, rows):
+    """Записать записи в NDJSON; вернуть количество"""
+    return write_rows(path, rows, ndjson=True)
+
+
+def write_split(full_path, clean_path, rows, ndjson=None, keep=lambda key: not key.startswith('_')):
+    """
+    Один проход по rows: полная запись в full_path, запись только с полями keep(key) - в clean_path.
+    Оба файла сначала записываются и сбрасываются на диск, затем подменяются подряд
+    (см. atomic_open_all).
+    """
+    if ndjson is None:
+        ndjson = is_ndjson(full_path)
+    with atomic_open_all([full_path, clean_path], binary=True) as (full_f, clean_f):
+        full, clean = RowWriter(full_f, ndjson), RowWriter(clean_f, ndjson)
+        for row in rows:
+            full.write(row)
+            clean.write({k: v for k, v in row.items() if keep(k)})
+        clean.close()
+        return full.close()
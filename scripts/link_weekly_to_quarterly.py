@@ -1,108 +1,543 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """
-Связывание недельных планов с квартальными через process_id.
+Связывание недельных (и месячных) планов с квартальными через process_id.
 
 Логика:
-1. Для каждого недельного плана определяем:
+1. Для каждого плана определяем:
    - process_id (через маппинг из Excel)
-   - quarter (из даты)
-2. Находим квартальный план с тем же process_id и quarter
-3. Обновляем quarterly_id в недельном плане
+   - год и квартал (из даты недельного плана / year+month месячного)
+2. Находим квартальный план с тем же process_id и кварталом
+   (и годом, если он есть у квартального плана)
+3. Обновляем quarterly_id в плане
+
+Связывание колоночное: из строк вынимаются колонки process_id/даты, квартал
+берётся таблицей по месяцу, ключи сопоставляются хеш-джойном по словарю -
+один проход на сущность. Задачи (weekly_tasks) привязываются к кварталу через
+weekly_plan_id и попадают только в отчёт.
+
+Побочный результат - linkage_report.json: итоги по сущностям, покрытие
+по кварталам, часы и задачи по квартальным планам, самые частые
+несовпавшие ключи и примеры несвязанных строк.
+
+Строкам, оставшимся без пары, fuzzy_match предлагает ближайший по тексту
+квартальный план того же квартала (и отдела, если он известен):
+_suggested_quarterly_id и _suggestion_confidence. quarterly_id они не
+меняют - это подсказка для ручной проверки; --no-fuzzy отключает поиск.
+
+Результаты пишутся компактно (запись на строку) и атомарно - через временный
+файл и rename, см. jsonio. С --ndjson - в weekly_plans_full.ndjson /
+weekly_plans.ndjson; и те, и другие потоково читают скрипты импорта.
+monthly_plans.json(.ndjson), если есть, обновляется на месте в том же формате.
+
+--staging: файлы сначала загружаются в SQLite (см. staging), ключи
+сопоставляются UPDATE с подзапросами по индексу (process_id, quarter, year),
+итоги отчёта - GROUP BY, а результаты пишутся постранично из базы. Результат
+и отчёт те же, но в памяти - страница строк, а не все планы.
 """
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
+import argparse
 import json
 import os
+import time
+from collections import Counter, defaultdict
+
+import instrument
+import staging
+from fuzzy_match import MIN_CONFIDENCE, NgramIndex
+from jsonio import atomic_open, iter_json_rows, resolve_import_file, write_rows, write_split
 
 SCRIPT_DIR = os.path.dirname(__file__)
-IMPORT_DIR = os.path.join(SCRIPT_DIR, '..', 'data', 'import')
+IMPORT_DIR = os.getenv('IMPORT_DIR') or os.path.join(SCRIPT_DIR, '..', 'data', 'import')
+REPORT_FILE = 'linkage_report.json'
+REPORT_EXAMPLES = 10  # примеров несвязанных строк на сущность
+REPORT_TOP_KEYS = 20  # самых частых несовпавших ключей (process_id, квартал)
+
+# 'YYYY-MM-DD'[5:7] -> квартал
+QUARTER_BY_MONTH = {f'{m:02d}': (m - 1) // 3 + 1 for m in range(1, 13)}
+
+LINKED, NOT_LINKED, NO_PROCESS = 'linked', 'not_linked', 'no_process'
+
+# Нижние границы корзин уверенности в отчёте
+CONFIDENCE_BUCKETS = (0.9, 0.7, 0.5, MIN_CONFIDENCE)
 
 
 def get_quarter(date_str):
     """Получить квартал из даты YYYY-MM-DD"""
     if not date_str:
         return None
-    month = int(date_str.split('-')[1])
-    if month <= 3: return 1
-    if month <= 6: return 2
-    if month <= 9: return 3
-    return 4
+    return QUARTER_BY_MONTH.get(date_str[5:7])
 
 
-def main():
-    # Загружаем квартальные планы
-    with open(os.path.join(IMPORT_DIR, 'quarterly_plans.json'), 'r', encoding='utf-8') as f:
-        quarterly_plans = json.load(f)
+def _year(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
-    # Создаём индекс: (process_id, quarter) -> quarterly_id
-    quarterly_index = {}
+
+def build_quarterly_index(quarterly_plans):
+    """
+    (process_id, year, quarter) -> quarterly_id; year = None у планов без года
+    (такой план подходит планам любого года). При дублях выигрывает первый.
+    """
+    index = {}
+    for qp in quarterly_plans:
+        year = _year(qp.get('year', qp.get('_year')))
+        index.setdefault((qp['process_id'], year, qp['quarter']), qp['quarterly_id'])
+    return index
+
+
+def link_keys(index, process_ids, years, quarters):
+    """Колонки ключей -> колонка quarterly_id (None - нет пары). План своего года важнее плана без года"""
+    get = index.get
+    return [(get((p, y, q)) or get((p, None, q))) if p else None
+            for p, y, q in zip(process_ids, years, quarters)]
+
+
+def build_fuzzy_index(quarterly_plans):
+    """Текстовый индекс квартальных планов: процесс + цель + ожидаемый результат"""
+    index = NgramIndex()
     for qp in quarterly_plans:
-        key = (qp['process_id'], qp['quarter'])
-        if key not in quarterly_index:
-            quarterly_index[key] = qp['quarterly_id']
+        text = ' '.join(filter(None, (qp.get('process_name') or qp.get('_process_name') or qp.get('_process_excel'),
+                                      qp.get('goal'), qp.get('expected_result'))))
+        index.add(qp['quarterly_id'], text, _year(qp.get('year', qp.get('_year'))), qp['quarter'],
+                  qp.get('department_id'))
+    return index.build()
+
+
+def suggest_keys(index, texts, years, quarters, departments, quarterly_ids):
+    """Для строк без quarterly_id: {номер строки: (quarterly_id, уверенность)} не ниже MIN_CONFIDENCE"""
+    suggestions = {}
+    for i, (text, year, quarter, department, qid) in enumerate(zip(texts, years, quarters, departments, quarterly_ids)):
+        if qid or not quarter or not text:
+            continue
+        key, confidence = index.best(text, year, quarter, department)
+        if key and confidence >= MIN_CONFIDENCE:
+            suggestions[i] = (key, confidence)
+    return suggestions
+
+
+SUGGESTION_FIELDS = ('_suggested_quarterly_id', '_suggestion_confidence')
+
+
+def _apply_suggestions(plans, suggestions):
+    """Предложения прошлого запуска убираются у всех строк, даже если новых нет"""
+    for plan in plans:
+        for field in SUGGESTION_FIELDS:
+            plan.pop(field, None)
+    for i, (key, confidence) in suggestions.items():
+        plans[i]['_suggested_quarterly_id'] = key
+        plans[i]['_suggestion_confidence'] = round(confidence, 3)
+
+
+def weekly_key_columns(plans):
+    dates = [wp.get('weekly_date') or '' for wp in plans]
+    return ([wp.get('_process_id') for wp in plans],
+            [int(d[:4]) if d[:4].isdigit() else None for d in dates],
+            [QUARTER_BY_MONTH.get(d[5:7]) for d in dates])
+
+
+def monthly_key_columns(plans):
+    months = [mp.get('month') for mp in plans]
+    return ([mp.get('_process_id') or mp.get('process_id') for mp in plans],
+            [_year(mp.get('year')) for mp in plans],
+            [(m - 1) // 3 + 1 if isinstance(m, int) and 1 <= m <= 12 else None for m in months])
+
+
+class LinkageReport:
+    """Накопитель итогов связывания для linkage_report.json"""
+
+    def __init__(self):
+        self.entities = {}
+        self.by_quarter = defaultdict(Counter)
+        self.by_quarterly = defaultdict(Counter)
+        self.unmatched = Counter()
+        self.examples = defaultdict(list)
+
+    def add_plans(self, entity, plans, process_ids, years, quarters, quarterly_ids, describe):
+        statuses = [NO_PROCESS if not p else LINKED if qid else NOT_LINKED
+                    for p, qid in zip(process_ids, quarterly_ids)]
+        counts = Counter(statuses)
+        self.entities[entity] = {'total': len(plans), **{s: counts[s] for s in (LINKED, NOT_LINKED, NO_PROCESS)}}
+
+        for (year, quarter, status), n in Counter(zip(years, quarters, statuses)).items():
+            self.by_quarter[f'{year or "?"}-Q{quarter or "?"}'][status] += n
+        for quarterly_id, n in Counter(filter(None, quarterly_ids)).items():
+            self.by_quarterly[quarterly_id][entity] += n
+        if counts[NOT_LINKED]:
+            unmatched = [i for i, status in enumerate(statuses) if status is NOT_LINKED]
+            self.unmatched.update((process_ids[i], years[i], quarters[i]) for i in unmatched)
+            self.examples[entity].extend(describe(plans[i], quarters[i]) for i in unmatched[:REPORT_EXAMPLES])
+        return counts
+
+    def add_suggestions(self, entity, suggestions):
+        buckets = Counter(next(f'>={b}' for b in CONFIDENCE_BUCKETS if confidence >= b)
+                          for _, confidence in suggestions.values())
+        self.entities[entity]['suggested'] = len(suggestions)
+        self.entities[entity]['suggestion_confidence'] = {f'>={b}': buckets[f'>={b}'] for b in CONFIDENCE_BUCKETS}
+
+    def add_tasks(self, tasks, quarterly_by_weekly):
+        get = quarterly_by_weekly.get
+        n_tasks = Counter()
+        hours = defaultdict(float)
+        for task in tasks:
+            quarterly_id = get(task.get('weekly_plan_id'))
+            if quarterly_id:
+                n_tasks[quarterly_id] += 1
+                hours[quarterly_id] += task.get('spent_hours') or 0
+        return self.add_task_totals(((qid, n, hours[qid]) for qid, n in n_tasks.items()), len(tasks))
+
+    def add_task_totals(self, totals, total):
+        """totals - (quarterly_id, задач, часов); total - всего задач"""
+        linked = 0
+        for quarterly_id, n, hours in totals:
+            stats = self.by_quarterly[quarterly_id]
+            stats['weekly_tasks'] += n
+            stats['spent_hours'] += hours
+            linked += n
+
+        counts = Counter({LINKED: linked, NOT_LINKED: total - linked})
+        self.entities['weekly_tasks'] = {'total': total, LINKED: linked, NOT_LINKED: total - linked}
+        return counts
+
+    def as_dict(self, seconds):
+        return {
+            'seconds': round(seconds, 3),
+            'entities': self.entities,
+            'by_quarter': {k: dict(v) for k, v in sorted(self.by_quarter.items())},
+            'by_quarterly_plan': {
+                qid: {**stats, 'spent_hours': round(stats['spent_hours'], 2)} if 'spent_hours' in stats else dict(stats)
+                for qid, stats in self.by_quarterly.items()
+            },
+            'top_unmatched_keys': [
+                {'process_id': p, 'year': y, 'quarter': q, 'rows': n}
+                for (p, y, q), n in self.unmatched.most_common(REPORT_TOP_KEYS)
+            ],
+            'unlinked_examples': dict(self.examples),
+        }
+
+
+def _describe_weekly(wp, quarter):
+    return f'Q{quarter} | {wp.get("_process_excel", "")[:40]} | {wp.get("expected_result", "")[:30]}'
+
+
+def _describe_monthly(mp, quarter):
+    return f'Q{quarter} | {mp.get("year")}-{mp.get("month")} | {(mp.get("description") or "")[:40]}'
+
+
+# ====== --staging: то же связывание в SQLite ======
+
+# Колонки таблиц хранилища; status и связанный квартальный план заполняет SQL
+STAGED_QUARTERLY = ('quarterly_id', 'process_id', 'year', 'quarter')
+STAGED_PLANS = ('weekly_id', 'process_id', 'year', 'quarter', 'department_id', 'quarterly_id')
+STAGED_DERIVED = ('linked_id', 'status', 'suggested_id', 'confidence')
+
+# Свой план года важнее плана без года; при дублях - первый в файле
+_LOOKUP = ('(SELECT quarterly_id FROM link_quarterly q WHERE q.process_id = {t}.process_id '
+           'AND q.quarter = {t}.quarter AND q.year {year} ORDER BY q.seq LIMIT 1)')
+
+
+def _staged_quarterly(qp):
+    return qp['quarterly_id'], qp['process_id'], _year(qp.get('year', qp.get('_year'))), qp['quarter']
+
+
+def _staged_weekly(wp):
+    d = wp.get('weekly_date') or ''
+    return (wp.get('weekly_id'), wp.get('_process_id') or None, int(d[:4]) if d[:4].isdigit() else None,
+            QUARTER_BY_MONTH.get(d[5:7]), wp.get('_department_id') or wp.get('department_id'), None)
+
+
+def _staged_monthly(mp):
+    m = mp.get('month')
+    return (None, mp.get('_process_id') or mp.get('process_id') or None, _year(mp.get('year')),
+            (m - 1) // 3 + 1 if isinstance(m, int) and 1 <= m <= 12 else None,
+            mp.get('department_id'), mp.get('quarterly_id') or None)
+
+
+def link_staged(store, table, keep_existing=False):
+    """UPDATE linked_id/status по индексу квартальных; keep_existing - уже связанные (месячные) не трогать"""
+    lookup = (f'COALESCE({_LOOKUP.format(t=table, year=f"= {table}.year")}, '
+              f'{_LOOKUP.format(t=table, year="IS NULL")})')
+    linked = f'CASE WHEN process_id IS NULL THEN NULL ELSE {lookup} END'
+    if keep_existing:
+        linked = f'COALESCE(quarterly_id, {linked})'
+    with store.transaction() as db:
+        db.execute(f'UPDATE {table} SET linked_id = {linked}')
+        db.execute(f"UPDATE {table} SET status = CASE WHEN process_id IS NULL THEN '{NO_PROCESS}' "
+                   f"WHEN linked_id IS NOT NULL THEN '{LINKED}' ELSE '{NOT_LINKED}' END")
+
+
+def report_staged(store, report, entity, table, describe):
+    """Итоги сущности в LinkageReport запросами GROUP BY; порядок - как у первого вхождения в файле"""
+    db = store.db
+    counts = Counter(dict(db.execute(f'SELECT status, COUNT(*) FROM {table} GROUP BY status')))
+    report.entities[entity] = {'total': sum(counts.values()), **{s: counts[s] for s in (LINKED, NOT_LINKED, NO_PROCESS)}}
+
+    for year, quarter, status, n in db.execute(
+            f'SELECT year, quarter, status, COUNT(*) FROM {table} GROUP BY year, quarter, status'):
+        report.by_quarter[f'{year or "?"}-Q{quarter or "?"}'][status] += n
+    for quarterly_id, n in db.execute(f'SELECT linked_id, COUNT(*) FROM {table} WHERE linked_id IS NOT NULL '
+                                      f'GROUP BY linked_id ORDER BY MIN(seq)'):
+        report.by_quarterly[quarterly_id][entity] += n
+    if counts[NOT_LINKED]:
+        for process_id, year, quarter, n in db.execute(
+                f'SELECT process_id, year, quarter, COUNT(*) FROM {table} WHERE status = ? '
+                f'GROUP BY process_id, year, quarter ORDER BY MIN(seq)', (NOT_LINKED,)):
+            report.unmatched[(process_id, year, quarter)] += n
+        report.examples[entity].extend(
+            describe(json.loads(body), quarter) for body, quarter in db.execute(
+                f'SELECT body, quarter FROM {table} WHERE status = ? ORDER BY seq LIMIT ?', (NOT_LINKED, REPORT_EXAMPLES)))
+    return counts
+
+
+def suggest_staged(store, index, table, text_of):
+    """Нечёткие предложения несвязанным строкам, постранично; {seq: (quarterly_id, уверенность)}"""
+    suggestions = {}
+    for page in store.pages(table, 'seq, body, year, quarter, department_id', 'linked_id IS NULL AND quarter IS NOT NULL'):
+        found = suggest_keys(index, [text_of(json.loads(body)) for _, body, *_ in page],
+                             [row[2] for row in page], [row[3] for row in page], [row[4] for row in page],
+                             [None] * len(page))
+        found = {page[i][0]: suggestion for i, suggestion in found.items()}
+        with store.transaction() as db:
+            db.executemany(f'UPDATE {table} SET suggested_id = ?, confidence = ? WHERE seq = ?',
+                           ((key, round(confidence, 3), seq) for seq, (key, confidence) in found.items()))
+        suggestions.update(found)
+    return suggestions
+
+
+def staged_rows(store, table):
+    """Записи с проставленными quarterly_id и предложениями - постранично из базы"""
+    for page in store.pages(table, 'body, linked_id, suggested_id, confidence'):
+        for body, linked_id, suggested_id, confidence in page:
+            row = json.loads(body)
+            for field in SUGGESTION_FIELDS:
+                row.pop(field, None)
+            if linked_id:
+                row['quarterly_id'] = linked_id
+            if suggested_id:
+                row['_suggested_quarterly_id'] = suggested_id
+                row['_suggestion_confidence'] = confidence
+            yield row
+
+
+def _input_path(name, required=False):
+    """Входной файл (.json или .ndjson); без обязательного связывать нечего - выход с кодом 1"""
+    path = resolve_import_file(os.path.join(IMPORT_DIR, name))
+    if path is None and required:
+        print(f'❌ Файл не найден: {os.path.join(IMPORT_DIR, name)} (или .ndjson)')
+        sys.exit(1)
+    return path
+
+
+def _weekly_text(wp):
+    return ' '.join(filter(None, (wp.get('_process_excel'), wp.get('expected_result'))))
+
+
+def run_staged(args, store):
+    def load(name, table, columns, values, required=False, **kwargs):
+        path = _input_path(name, required)
+        with instrument.stage(f'stage:{name}') as st:
+            count = store.load_rows(table, iter_json_rows(path) if path else iter(()), columns, values, **kwargs)
+            st.add(rows=count, bytes=os.path.getsize(path) if path else 0)
+        return path, count
+
+    _input_path('weekly_plans_full.json', required=True)
+    _, n_quarterly = load('quarterly_plans.json', 'link_quarterly', STAGED_QUARTERLY, _staged_quarterly, required=True,
+                          indexes=[('process_id', 'quarter', 'year', 'seq')])
+    n_keys = store.db.execute('SELECT COUNT(*) FROM (SELECT DISTINCT process_id, year, quarter FROM link_quarterly)').fetchone()[0]
+    print(f'Квартальных планов: {n_quarterly} (хранилище {store.path})')
+    print(f'Уникальных ключей (process_id, [год,] quarter): {n_keys}')
+
+    _, n_weekly = load('weekly_plans_full.json', 'link_weekly', STAGED_PLANS, _staged_weekly, required=True,
+                       derived=STAGED_DERIVED, indexes=[('weekly_id',)])
+    monthly_path, n_monthly = load('monthly_plans.json', 'link_monthly', STAGED_PLANS, _staged_monthly,
+                                   derived=STAGED_DERIVED)
+    _, n_tasks = load('weekly_tasks.json', 'link_tasks', ('weekly_plan_id', 'spent_hours'), None, body=False,
+                      indexes=[('weekly_plan_id',)])
+
+    print(f'Недельных планов: {n_weekly}')
+    if monthly_path:
+        print(f'Месячных планов: {n_monthly}')
+
+    start = time.perf_counter()
+    report = LinkageReport()
+
+    link_staged(store, 'link_weekly')
+    weekly = report_staged(store, report, 'weekly_plans', 'link_weekly', _describe_weekly)
+    fuzzy_index = None
+    if not args.no_fuzzy and n_quarterly and weekly[LINKED] < n_weekly:
+        fuzzy_index = build_fuzzy_index(iter_json_rows(resolve_import_file(os.path.join(IMPORT_DIR, 'quarterly_plans.json'))))
+        report.add_suggestions('weekly_plans', suggest_staged(store, fuzzy_index, 'link_weekly', _weekly_text))
+
+    if n_monthly:
+        link_staged(store, 'link_monthly', keep_existing=True)
+        monthly = report_staged(store, report, 'monthly_plans', 'link_monthly', _describe_monthly)
+        if not args.no_fuzzy and n_quarterly and monthly[LINKED] < n_monthly:
+            fuzzy_index = fuzzy_index or build_fuzzy_index(
+                iter_json_rows(resolve_import_file(os.path.join(IMPORT_DIR, 'quarterly_plans.json'))))
+            report.add_suggestions('monthly_plans',
+                                   suggest_staged(store, fuzzy_index, 'link_monthly', lambda mp: mp.get('description')))
+
+    # Задачи: квартал через weekly_plan_id; при повторе weekly_id - последний связанный план
+    report.add_task_totals(store.db.execute(
+        'SELECT w.linked_id, COUNT(*), SUM(COALESCE(t.spent_hours, 0)) FROM link_tasks t '
+        'JOIN (SELECT weekly_id, linked_id, MAX(seq) FROM link_weekly WHERE linked_id IS NOT NULL GROUP BY weekly_id) w '
+        'ON w.weekly_id = t.weekly_plan_id GROUP BY w.linked_id'), n_tasks)
+    elapsed = time.perf_counter() - start
+    instrument.record('link', elapsed, n_weekly + n_monthly + n_tasks)
+
+    print(f'\nРезультаты ({elapsed:.3f} с):')
+    print_summary(report, weekly)
+    written = write_outputs(args, report, elapsed, staged_rows(store, 'link_weekly'), n_weekly,
+                            monthly_path, staged_rows(store, 'link_monthly') if monthly_path else None)
+    print_written(report, weekly, written)
+
+
+def _load(name, required=False):
+    path = _input_path(name, required)
+    with instrument.stage(f'load:{name}') as st:
+        rows = list(iter_json_rows(path)) if path else []
+        st.add(rows=len(rows), bytes=os.path.getsize(path) if path else 0)
+    return path, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Связывание недельных планов с квартальными')
+    parser.add_argument('--ndjson', action='store_true', help='Писать результаты в NDJSON')
+    parser.add_argument('--no-report', action='store_true', help=f'Не писать {REPORT_FILE}')
+    parser.add_argument('--no-fuzzy', action='store_true', help='Не предлагать квартальные планы несвязанным строкам')
+    staging.add_argument(parser)
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    with instrument.session('link_weekly_to_quarterly', args):
+        if args.staging:
+            with staging.StagingStore(args.staging) as store:
+                run_staged(args, store)
+        else:
+            run(args)
+
+
+def run(args):
+
+    # Обе основные выгрузки обязательны; месячных планов и задач может не быть
+    _input_path('weekly_plans_full.json', required=True)
+
+    # Загружаем квартальные планы
+    _, quarterly_plans = _load('quarterly_plans.json', required=True)
+    quarterly_index = build_quarterly_index(quarterly_plans)
 
     print(f'Квартальных планов: {len(quarterly_plans)}')
-    print(f'Уникальных пар (process_id, quarter): {len(quarterly_index)}')
+    print(f'Уникальных ключей (process_id, [год,] quarter): {len(quarterly_index)}')
 
     # Загружаем полные недельные планы (с _process_id)
-    with open(os.path.join(IMPORT_DIR, 'weekly_plans_full.json'), 'r', encoding='utf-8') as f:
-        weekly_plans = json.load(f)
+    _, weekly_plans = _load('weekly_plans_full.json', required=True)
+    monthly_path, monthly_plans = _load('monthly_plans.json')
+    _, weekly_tasks = _load('weekly_tasks.json')
 
     print(f'Недельных планов: {len(weekly_plans)}')
+    if monthly_path:
+        print(f'Месячных планов: {len(monthly_plans)}')
 
-    # Обновляем quarterly_id
-    linked = 0
-    not_linked = 0
-    no_process = 0
+    start = time.perf_counter()
+    report = LinkageReport()
 
-    for wp in weekly_plans:
-        process_id = wp.get('_process_id')
-        week_date = wp.get('weekly_date')
-        quarter = get_quarter(week_date)
+    # Недельные планы: колонки ключей -> колонка quarterly_id
+    columns = weekly_key_columns(weekly_plans)
+    weekly_ids = link_keys(quarterly_index, *columns)
+    for wp, quarterly_id in zip(weekly_plans, weekly_ids):
+        if quarterly_id:
+            wp['quarterly_id'] = quarterly_id
+    weekly = report.add_plans('weekly_plans', weekly_plans, *columns, weekly_ids, _describe_weekly)
 
-        if not process_id:
-            no_process += 1
-            continue
+    # Индекс строится, только если есть что предлагать
+    fuzzy_index, suggestions = None, {}
+    if not args.no_fuzzy and quarterly_plans and not all(weekly_ids):
+        fuzzy_index = build_fuzzy_index(quarterly_plans)
+    if fuzzy_index:
+        suggestions = suggest_keys(
+            fuzzy_index, [_weekly_text(wp) for wp in weekly_plans],
+            *columns[1:], [wp.get('_department_id') or wp.get('department_id') for wp in weekly_plans], weekly_ids)
+        report.add_suggestions('weekly_plans', suggestions)
+    _apply_suggestions(weekly_plans, suggestions)
 
-        key = (process_id, quarter)
-        if key in quarterly_index:
-            wp['quarterly_id'] = quarterly_index[key]
-            linked += 1
-        else:
-            not_linked += 1
+    # Месячные планы: уже связанные не трогаем
+    if monthly_plans:
+        columns = monthly_key_columns(monthly_plans)
+        monthly_ids = [mp.get('quarterly_id') or qid for mp, qid in zip(monthly_plans, link_keys(quarterly_index, *columns))]
+        for mp, quarterly_id in zip(monthly_plans, monthly_ids):
+            if quarterly_id:
+                mp['quarterly_id'] = quarterly_id
+        report.add_plans('monthly_plans', monthly_plans, *columns, monthly_ids, _describe_monthly)
+        suggestions = {}
+        if not args.no_fuzzy and quarterly_plans and not all(monthly_ids):
+            fuzzy_index = fuzzy_index or build_fuzzy_index(quarterly_plans)
+            suggestions = suggest_keys(
+                fuzzy_index, [mp.get('description') for mp in monthly_plans],
+                *columns[1:], [mp.get('department_id') for mp in monthly_plans], monthly_ids)
+            report.add_suggestions('monthly_plans', suggestions)
+        _apply_suggestions(monthly_plans, suggestions)
+
+    # Задачи: квартал через weekly_plan_id
+    quarterly_by_weekly = {wp.get('weekly_id'): qid for wp, qid in zip(weekly_plans, weekly_ids) if qid}
+    report.add_tasks(weekly_tasks, quarterly_by_weekly)
+    elapsed = time.perf_counter() - start
+    instrument.record('link', elapsed, len(weekly_plans) + len(monthly_plans) + len(weekly_tasks))
+
+    print(f'\nРезультаты ({elapsed:.3f} с):')
+    print_summary(report, weekly)
+    written = write_outputs(args, report, elapsed, weekly_plans, len(weekly_plans),
+                            monthly_path, monthly_plans if monthly_path else None)
+    print_written(report, weekly, written)
+
+
+def print_summary(report, weekly):
+    print(f'  Связано с квартальным: {weekly[LINKED]}')
+    print(f'  Не связано (нет подходящего квартального): {weekly[NOT_LINKED]}')
+    print(f'  Без process_id: {weekly[NO_PROCESS]}')
+    if 'suggested' in report.entities['weekly_plans']:
+        print(f'  Предложен квартальный (нечётко, >= {MIN_CONFIDENCE}): {report.entities["weekly_plans"]["suggested"]}')
+    for entity in ('monthly_plans', 'weekly_tasks'):
+        if entity in report.entities and report.entities[entity]['total']:
+            stats = report.entities[entity]
+            print(f'  {entity}: связано {stats[LINKED]} из {stats["total"]}')
+
+
+def write_outputs(args, report, elapsed, weekly_rows, n_weekly, monthly_path, monthly_rows):
+    """Записать планы и отчёт; строки - список или поток. Вернуть записанные пути"""
+    ext = 'ndjson' if args.ndjson else 'json'
 
-    print(f'\nРезультаты:')
-    print(f'  Связано с квартальным: {linked}')
-    print(f'  Не связано (нет подходящего квартального): {not_linked}')
-    print(f'  Без process_id: {no_process}')
+    # Полные и чистые (без служебных полей) данные - за один проход, атомарно
+    full_path = os.path.join(IMPORT_DIR, f'weekly_plans_full.{ext}')
+    clean_path = os.path.join(IMPORT_DIR, f'weekly_plans.{ext}')
+    with instrument.stage('write:weekly_plans') as st:
+        write_split(full_path, clean_path, weekly_rows, args.ndjson)
+        st.add(rows=n_weekly, bytes=os.path.getsize(full_path) + os.path.getsize(clean_path))
 
-    # Сохраняем полные данные
-    with open(os.path.join(IMPORT_DIR, 'weekly_plans_full.json'), 'w', encoding='utf-8') as f:
-        json.dump(weekly_plans, f, ensure_ascii=False, indent=2)
+    written = [full_path, clean_path]
+    if monthly_path:
+        write_rows(monthly_path, monthly_rows)
+        written.append(monthly_path)
+    if not args.no_report:
+        report_path = os.path.join(IMPORT_DIR, REPORT_FILE)
+        with atomic_open(report_path) as f:
+            json.dump(report.as_dict(elapsed), f, ensure_ascii=False, indent=2)
+        written.append(report_path)
+    return written
 
-    # Сохраняем чистые данные (без служебных полей)
-    clean_plans = [{k: v for k, v in wp.items() if not k.startswith('_')} for wp in weekly_plans]
-    with open(os.path.join(IMPORT_DIR, 'weekly_plans.json'), 'w', encoding='utf-8') as f:
-        json.dump(clean_plans, f, ensure_ascii=False, indent=2)
 
+def print_written(report, weekly, written):
     print(f'\nФайлы обновлены:')
-    print(f'  weekly_plans_full.json')
-    print(f'  weekly_plans.json')
-
-    # Показать примеры несвязанных
-    if not_linked > 0:
-        print(f'\nПримеры несвязанных (первые 10):')
-        count = 0
-        for wp in weekly_plans:
-            if not wp.get('quarterly_id') and wp.get('_process_id'):
-                process_id = wp.get('_process_id')
-                quarter = get_quarter(wp.get('weekly_date'))
-                print(f'  Q{quarter} | {wp.get("_process_excel", "")[:40]} | {wp.get("expected_result", "")[:30]}')
-                count += 1
-                if count >= 10:
-                    break
+    for path in written:
+        print(f'  {os.path.basename(path)}')
 
+    # Примеры несвязанных собраны во время связывания - второго прохода нет
+    if weekly[NOT_LINKED] > 0:
+        print(f'\nПримеры несвязанных (первые {REPORT_EXAMPLES}):')
+        for line in report.examples['weekly_plans']:
+            print(f'  {line}')
 
 if __name__ == '__main__':
     main()
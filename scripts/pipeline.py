@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Единая точка запуска импорта: excel_to_csv -> кубы часов и связывание -> загрузка в Supabase.
+
+Каждый этап объявляет входы и выходы (пути относительно корня репозитория,
+допускаются шаблоны glob). Зависимости выводятся из них: этап ждёт те этапы,
+чьи выходы он читает. Независимые этапы (CSV из Excel и связывание планов)
+идут параллельно, кубы часов ждут CSV.
+
+Отпечаток этапа - sha256 его команды и содержимого всех входов (включая сам
+скрипт). Если отпечаток совпадает с записанным после прошлого успешного
+запуска и выходы на месте, этап пропускается. Успешный запуск - код выхода 0:
+скрипты этапов возвращают 1, если хоть один лист, строка или удаление не
+прошли, и такой этап не получает отпечатка. Хеш файла пересчитывается,
+только когда изменились его размер или mtime. Состояние - data/import/.pipeline.json.
+
+weekly_plans_full.json строится вне репозитория (выгрузка недельных планов
+с _process_id) и здесь считается исходным файлом.
+
+Использование:
+    python scripts/pipeline.py                      # csv + rollup + link
+    python scripts/pipeline.py --upload import      # + import_to_supabase.py
+    python scripts/pipeline.py --upload update      # + update_weekly_plans.py
+    python scripts/pipeline.py link --force         # только указанные этапы, без пропуска
+    python scripts/pipeline.py --dry-run            # что будет запущено
+    python scripts/pipeline.py --staging            # связывание и загрузка через SQLite (см. staging.py)
+"""
+import sys
+sys.stdout.reconfigure(encoding='utf-8')
+import argparse
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from fnmatch import fnmatch
+
+from jsonio import atomic_open
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+STATE_FILE = os.path.join(ROOT_DIR, 'data', 'import', '.pipeline.json')
+STATE_VERSION = 1
+
+IMPORT_TABLES = ('quarterly_plans', 'weekly_plans', 'weekly_plan_assignees', 'weekly_plan_companies', 'weekly_tasks')
+
+RAN, SKIPPED, FAILED, BLOCKED = 'ran', 'skipped', 'failed', 'blocked'
+
+
+class Stage:
+    """Этап: скрипт из scripts/ с аргументами, входы и выходы относительно корня"""
+
+    def __init__(self, name, script, inputs, outputs=(), args=(), sources=()):
+        self.name = name
+        self.script = script
+        self.args = list(args)
+        # Код этапа - тоже вход: правка скрипта перезапускает этап
+        self.inputs = [f'scripts/{script}', *(f'scripts/{s}' for s in sources), *inputs]
+        self.outputs = list(outputs)
+
+    @property
+    def command(self):
+        return [sys.executable, os.path.join(SCRIPT_DIR, self.script), *self.args]
+
+    def rewrites(self, pattern):
+        """Совпадает ли шаблон с выходом этого же этапа (вход, который этап перезаписывает)"""
+        return any(fnmatch(pattern, o) or fnmatch(o, pattern) for o in self.outputs)
+
+    def depends_on(self, other):
+        """Читает ли этап выходы other (свои выходы-входы, как weekly_plans_full, не в счёт)"""
+        return other is not self and any(fnmatch(i, o) or fnmatch(o, i) for i in self.inputs for o in other.outputs)
+
+
+def _import_files(tables):
+    return [f'data/import/{t}.*json' for t in tables]
+
+
+def build_stages(upload=None, parquet=False, excel=(), staging=False):
+    """
+    excel - книги для excel_to_csv.py (по умолчанию его EXCEL_PATH, bdib2025.xlsx в корне);
+    staging - связывание и загрузка с --staging.
+    """
+    excel = [os.path.relpath(os.path.abspath(path), ROOT_DIR) for path in excel]
+    staged = ['--staging'] if staging else []
+    stages = [
+        Stage('csv', 'excel_to_csv.py', excel or ['bdib2025.xlsx'], ['data/import/**/all_data.csv'],
+              args=[*excel, *(['--parquet'] if parquet else [])], sources=['instrument.py', 'jsonio.py']),
+        Stage('rollup', 'rollup_hours.py', ['data/import/**/all_data.csv', 'data/import/**/parquet/*.parquet'],
+              ['data/import/rollups/hours_*.json'], sources=['excel_to_csv.py', 'instrument.py', 'jsonio.py']),
+        Stage('link', 'link_weekly_to_quarterly.py',
+              _import_files(('quarterly_plans', 'weekly_plans_full', 'monthly_plans', 'weekly_tasks')),
+              ['data/import/weekly_plans.json', 'data/import/weekly_plans_full.json', 'data/import/monthly_plans.*json',
+               'data/import/linkage_report.json'],
+              args=staged, sources=['fuzzy_match.py', 'instrument.py', 'jsonio.py', 'staging.py']),
+    ]
+    if upload == 'import':
+        stages.append(Stage('import', 'import_to_supabase.py', [*_import_files(IMPORT_TABLES), '.env.local'],
+                            args=staged, sources=['supabase_loader.py', 'instrument.py', 'jsonio.py', 'staging.py']))
+    elif upload == 'update':
+        stages.append(Stage('update', 'update_weekly_plans.py', [*_import_files(IMPORT_TABLES[1:]), '.env.local'],
+                            args=staged, sources=['supabase_loader.py', 'instrument.py', 'jsonio.py', 'staging.py']))
+    return stages
+
+
+class Fingerprints:
+    """sha256 файлов с кешем по (размер, mtime) и отпечатки этапов из прошлого запуска"""
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self.files = {}
+        self.stages = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') == STATE_VERSION:
+                self.files = state['files']
+                self.stages = state['stages']
+
+    def file_sha(self, rel_path):
+        path = os.path.join(ROOT_DIR, rel_path)
+        st = os.stat(path)
+        cached = self.files.get(rel_path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        self.files[rel_path] = [st.st_size, st.st_mtime_ns, sha.hexdigest()]
+        return sha.hexdigest()
+
+    def snapshot(self, stage, patterns=None):
+        """{шаблон входа: [(путь, sha256), ...]} для patterns (по умолчанию - всех входов)"""
+        return {
+            pattern: [(rel_path, self.file_sha(rel_path))
+                      for rel_path in sorted(glob.glob(pattern, root_dir=ROOT_DIR, recursive=True))]
+            for pattern in (stage.inputs if patterns is None else patterns)
+        }
+
+    def stage(self, stage, snapshot=None):
+        """Отпечаток аргументов и входов; отсутствующий вход тоже часть отпечатка"""
+        if snapshot is None:
+            snapshot = self.snapshot(stage)
+        sha = hashlib.sha256(json.dumps([stage.script, stage.args]).encode('utf-8'))
+        for pattern in stage.inputs:
+            matches = snapshot[pattern]
+            sha.update(f'{pattern}\0{len(matches)}\0'.encode('utf-8'))
+            for rel_path, file_sha in matches:
+                sha.update(f'{rel_path}\0{file_sha}\0'.encode('utf-8'))
+        return sha.hexdigest()
+
+    def after_run(self, stage, snapshot):
+        """
+        Отпечаток по снимку входов до запуска; заново хешируются только входы, которые
+        этап сам перезаписывает (link - weekly_plans_full). Правка остальных входов во
+        время запуска не попадает в отпечаток, и следующий запуск её увидит.
+        """
+        own = [i for i in stage.inputs if stage.rewrites(i)]
+        return self.stage(stage, {**snapshot, **self.snapshot(stage, own)})
+
+    def is_fresh(self, stage):
+        if self.stages.get(stage.name) != self.stage(stage):
+            return False
+        # Выход, который этап только перезаписывает (monthly_plans у link), может и отсутствовать
+        return all(glob.glob(pattern, root_dir=ROOT_DIR, recursive=True) for pattern in stage.outputs
+                   if not any(fnmatch(i, pattern) or fnmatch(pattern, i) for i in stage.inputs))
+
+    def save(self):
+        with atomic_open(self.path) as f:
+            json.dump({'version': STATE_VERSION, 'files': self.files, 'stages': self.stages}, f, indent=2)
+
+
+def _run(stage):
+    start = time.perf_counter()
+    proc = subprocess.run(stage.command, cwd=ROOT_DIR, capture_output=True, text=True, encoding='utf-8',
+                          env={**os.environ, 'PYTHONIOENCODING': 'utf-8'})
+    return proc, time.perf_counter() - start
+
+
+def run_pipeline(stages, fingerprints, force=(), jobs=None, dry_run=False, log=print):
+    """
+    Запустить этапы в порядке зависимостей, независимые - параллельно.
+    force - имена этапов, которые запускаются без проверки отпечатка. Возвращает {этап: статус}.
+    """
+    deps = {s.name: {o.name for o in stages if s.depends_on(o)} for s in stages}
+    by_name = {s.name: s for s in stages}
+    status = {}
+    snapshots = {}
+    pending = [s.name for s in stages]
+
+    with ThreadPoolExecutor(max_workers=jobs or len(stages)) as pool:
+        running = {}
+        while pending or running:
+            for name in list(pending):
+                failed = [d for d in deps[name] if status.get(d) in (FAILED, BLOCKED)]
+                if failed:
+                    status[name] = BLOCKED
+                    pending.remove(name)
+                    log(f'  ⏭️  {name}: не запущен, упал этап {", ".join(failed)}')
+                elif all(d in status for d in deps[name]):
+                    pending.remove(name)
+                    stage = by_name[name]
+                    command = ' '.join([stage.script, *stage.args])
+                    # Отпечаток считается, когда зависимости уже отработали: если они
+                    # перезаписали файлы без изменений, этап всё равно пропускается
+                    if dry_run and any(status[d] == RAN for d in deps[name]):
+                        status[name] = RAN
+                        log(f'  ▶ {name}: будет запущен, если изменятся выходы {", ".join(deps[name])} ({command})')
+                    elif name not in force and fingerprints.is_fresh(stage):
+                        status[name] = SKIPPED
+                        log(f'  ✓ {name}: входы не менялись, пропуск')
+                    elif dry_run:
+                        status[name] = RAN
+                        log(f'  ▶ {name}: будет запущен ({command})')
+                    else:
+                        log(f'  ▶ {name}: {command}')
+                        snapshots[name] = fingerprints.snapshot(stage)
+                        running[pool.submit(_run, stage)] = name
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                proc, elapsed = future.result()
+                output = (proc.stdout + proc.stderr).rstrip()
+                if proc.returncode == 0:
+                    status[name] = RAN
+                    fingerprints.stages[name] = fingerprints.after_run(by_name[name], snapshots[name])
+                    fingerprints.save()
+                    log(f'  ✅ {name}: {elapsed:.2f} s')
+                else:
+                    status[name] = FAILED
+                    fingerprints.stages.pop(name, None)
+                    log(f'  ❌ {name}: код {proc.returncode}, {elapsed:.2f} s')
+                if output:
+                    log('\n'.join(f'     │ {line}' for line in output.splitlines()))
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Импорт данных: этапы с пропуском неизменившихся')
+    parser.add_argument('stages', nargs='*', help='Запустить только эти этапы (по умолчанию все)')
+    parser.add_argument('--upload', choices=['import', 'update'],
+                        help='Добавить загрузку в Supabase: import_to_supabase.py или update_weekly_plans.py')
+    parser.add_argument('--excel', nargs='+', default=[], help='Книги для excel_to_csv.py (по умолчанию bdib2025.xlsx)')
+    parser.add_argument('--parquet', action='store_true', help='excel_to_csv.py --parquet')
+    parser.add_argument('--staging', action='store_true',
+                        help='Связывание и загрузка через SQLite-хранилище (data/import/staging.sqlite)')
+    parser.add_argument('--force', action='store_true', help='Запустить выбранные этапы, даже если входы не менялись')
+    parser.add_argument('--jobs', '-j', type=int, help='Этапов одновременно (по умолчанию - сколько готово)')
+    parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет запущено')
+    args = parser.parse_args()
+
+    stages = build_stages(args.upload, args.parquet, args.excel, args.staging)
+    names = [s.name for s in stages]
+    unknown = [name for name in args.stages if name not in names]
+    if unknown:
+        parser.error(f'неизвестные этапы: {", ".join(unknown)} (есть: {", ".join(names)})')
+    if args.stages:
+        stages = [s for s in stages if s.name in args.stages]
+
+    fingerprints = Fingerprints()
+    start = time.perf_counter()
+    print(f'Этапы: {" -> ".join(s.name for s in stages)}')
+    status = run_pipeline(stages, fingerprints, {s.name for s in stages} if args.force else (),
+                          args.jobs, args.dry_run)
+    if not args.dry_run:
+        fingerprints.save()
+
+    counts = {st: sum(1 for v in status.values() if v == st) for st in (RAN, SKIPPED, FAILED, BLOCKED)}
+    print(f'\nГотово за {time.perf_counter() - start:.2f} s: запущено {counts[RAN]}, пропущено {counts[SKIPPED]}'
+          + (f', упало {counts[FAILED]}, не запущено {counts[BLOCKED]}' if counts[FAILED] else ''))
+    sys.exit(1 if counts[FAILED] else 0)
+
+
+if __name__ == '__main__':
+    main()
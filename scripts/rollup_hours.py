@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Предагрегированные часы: plan_hours и fact_hours по сотруднику x предприятию x
+процессу x периоду (неделя / месяц / квартал) из all_data.csv или Parquet.
+
+Отчётам не нужно грузить десятки тысяч строк ради суммы часов - достаточно
+нескольких сотен строк куба. Файл читается один раз, кубы всех периодов
+считаются из одной таблицы.
+
+Распределение плана: в листе bdib задача повторяется строкой на каждое
+предприятие, plan_hours в этих строках - план всей задачи, а fact_hours уже
+разложен по предприятиям. Поэтому план задачи делится между её строками
+пропорционально факту (поровну, если факта нет) - суммы куба аддитивны по
+любому измерению и сходятся с планом по задачам. Задача - (employee, process,
+main_task, task, plan_date).
+
+Период берётся по plan_date (как колонка week); строки без plan_date
+пропускаются и считаются в сводке.
+
+С pyarrow - колоночные group_by/join (Parquet читается только нужными
+колонками); без него - тот же расчёт словарями по csv.
+
+Использование:
+    python scripts/rollup_hours.py [--input all_data.csv|каталог parquet ...] [--ndjson] [--python]
+Результат: data/import/rollups/hours_{week,month,quarter}.json
+"""
+import sys
+sys.stdout.reconfigure(encoding='utf-8')
+import argparse
+import csv
+import glob
+import os
+import time
+from collections import defaultdict
+from datetime import date
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.dataset as ds
+except ImportError:  # колоночный путь опционален
+    pa = None
+
+import instrument
+from excel_to_csv import ALL_DATA_FILE, PARQUET_DIR
+from jsonio import write_rows
+
+SCRIPT_DIR = os.path.dirname(__file__)
+IMPORT_DIR = os.getenv('IMPORT_DIR') or os.path.join(SCRIPT_DIR, '..', 'data', 'import')
+OUTPUT_DIR = os.path.join(IMPORT_DIR, 'rollups')
+
+DIMENSIONS = ['department', 'employee', 'company', 'process']
+TASK_KEY = ['employee', 'process', 'main_task', 'task', 'plan_date']
+GRAINS = ('week', 'month', 'quarter')
+COLUMNS_NEEDED = sorted({*DIMENSIONS, *TASK_KEY, 'plan_hours', 'fact_hours'})
+HOURS_DIGITS = 4
+
+
+def default_inputs(import_dir=IMPORT_DIR):
+    """
+    Выходы excel_to_csv: data/import и подкаталоги книг с all_data.csv.
+    Если рядом есть parquet/ (excel_to_csv --parquet) и pyarrow - берётся он.
+    """
+    inputs = []
+    for directory in [import_dir, *sorted(glob.glob(os.path.join(import_dir, '*', '')))]:
+        if not os.path.exists(os.path.join(directory, ALL_DATA_FILE)):
+            continue
+        parquet_dir = os.path.join(directory, PARQUET_DIR)
+        if pa is not None and glob.glob(os.path.join(parquet_dir, '*.parquet')):
+            inputs.append(os.path.normpath(parquet_dir))
+        else:
+            inputs.append(os.path.normpath(os.path.join(directory, ALL_DATA_FILE)))
+    return inputs
+
+
+def _is_parquet(path):
+    return os.path.isdir(path) or path.endswith('.parquet')
+
+
+def period_labels(day):
+    """date -> {'week': '2025-W02', 'month': '2025-01', 'quarter': '2025-Q1'} (неделя ISO)"""
+    iso_year, iso_week, _ = day.isocalendar()
+    return {
+        'week': f'{iso_year}-W{iso_week:02d}',
+        'month': f'{day.year}-{day.month:02d}',
+        'quarter': f'{day.year}-Q{(day.month - 1) // 3 + 1}',
+    }
+
+
+def _round_hours(rows):
+    """Часы куба до HOURS_DIGITS знаков - одной функцией для обоих путей"""
+    for row in rows:
+        row['plan_hours'] = round(row['plan_hours'], HOURS_DIGITS)
+        row['fact_hours'] = round(row['fact_hours'], HOURS_DIGITS)
+    return rows
+
+
+# ====== pyarrow ======
+
+def _read_table(path):
+    if _is_parquet(path):
+        return ds.dataset(path, format='parquet').to_table(columns=COLUMNS_NEEDED)
+    types = {'plan_date': pa.date32(), 'fact_date': pa.date32(), 'plan_hours': pa.float64(), 'fact_hours': pa.float64()}
+    return pacsv.read_csv(path, convert_options=pacsv.ConvertOptions(
+        include_columns=COLUMNS_NEEDED, column_types={c: t for c, t in types.items() if c in COLUMNS_NEEDED},
+        strings_can_be_null=True))
+
+
+def _cubes_arrow(table):
+    total_rows = table.num_rows
+    table = table.filter(pc.is_valid(table['plan_date']))
+    # Пустые ключи не совпадают в join - заменяем на ''
+    for name in {*DIMENSIONS, *TASK_KEY} - {'plan_date'}:
+        table = table.set_column(table.schema.get_field_index(name), name, pc.fill_null(table[name], ''))
+    table = table.set_column(table.schema.get_field_index('fact_hours'), 'fact_hours', pc.fill_null(table['fact_hours'], 0.0))
+    table = table.set_column(table.schema.get_field_index('plan_hours'), 'plan_hours', pc.fill_null(table['plan_hours'], 0.0))
+
+    tasks = table.group_by(TASK_KEY).aggregate([('fact_hours', 'sum'), ('fact_hours', 'count')])
+    table = table.join(tasks, TASK_KEY)
+    share = pc.if_else(pc.greater(table['fact_hours_sum'], 0),
+                       pc.divide(table['fact_hours'], table['fact_hours_sum']),
+                       pc.divide(1.0, pc.cast(table['fact_hours_count'], pa.float64())))
+    table = table.append_column('plan_alloc', pc.multiply(table['plan_hours'], share))
+
+    day = table['plan_date']
+    as_str = lambda arr, width: pc.utf8_lpad(pc.cast(arr, pa.string()), width, '0')
+    periods = {
+        'week': pc.binary_join_element_wise(as_str(pc.iso_year(day), 4), as_str(pc.iso_week(day), 2), '-W'),
+        'month': pc.binary_join_element_wise(as_str(pc.year(day), 4), as_str(pc.month(day), 2), '-'),
+        'quarter': pc.binary_join_element_wise(as_str(pc.year(day), 4), pc.cast(pc.quarter(day), pa.string()), '-Q'),
+    }
+
+    cubes = {}
+    for grain in GRAINS:
+        cube = (table.select([*DIMENSIONS, 'plan_alloc', 'fact_hours'])
+                .append_column('period', periods[grain])
+                .group_by([*DIMENSIONS, 'period'])
+                .aggregate([('plan_alloc', 'sum'), ('fact_hours', 'sum'), ('fact_hours', 'count')])
+                .sort_by([('period', 'ascending'), *((d, 'ascending') for d in DIMENSIONS)]))
+        # Имена колонок - до to_pylist; округление - то же, что в csv-пути (pc.round оставляет 0.9750000000000001)
+        cubes[grain] = _round_hours(pa.table({
+            **{d: cube[d] for d in DIMENSIONS}, 'period': cube['period'],
+            'plan_hours': cube['plan_alloc_sum'], 'fact_hours': cube['fact_hours_sum'], 'rows': cube['fact_hours_count'],
+        }).to_pylist())
+    return cubes, total_rows, total_rows - table.num_rows
+
+
+# ====== csv ======
+
+def _float(value):
+    try:
+        return float(value) if value else 0.0
+    except ValueError:
+        return 0.0
+
+
+def _cubes_python(paths):
+    rows, skipped = [], 0
+    task_fact = defaultdict(float)
+    task_rows = defaultdict(int)
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                if not row['plan_date']:
+                    skipped += 1
+                    continue
+                key = tuple(row[k] for k in TASK_KEY)
+                fact = _float(row['fact_hours'])
+                task_fact[key] += fact
+                task_rows[key] += 1
+                rows.append((key, tuple(row[d] for d in DIMENSIONS), row['plan_date'], _float(row['plan_hours']), fact))
+
+    labels = {}
+    cubes = {grain: defaultdict(lambda: [0.0, 0.0, 0]) for grain in GRAINS}
+    for key, dims, plan_date, plan, fact in rows:
+        total = task_fact[key]
+        plan_alloc = plan * (fact / total if total > 0 else 1 / task_rows[key])
+        periods = labels.get(plan_date)
+        if periods is None:
+            periods = labels[plan_date] = period_labels(date.fromisoformat(plan_date))
+        for grain in GRAINS:
+            cell = cubes[grain][(periods[grain], *dims)]
+            cell[0] += plan_alloc
+            cell[1] += fact
+            cell[2] += 1
+
+    return {
+        grain: _round_hours([
+            {**dict(zip(DIMENSIONS, dims)), 'period': period, 'plan_hours': plan, 'fact_hours': fact, 'rows': n}
+            for (period, *dims), (plan, fact, n) in sorted(cube.items())
+        ])
+        for grain, cube in cubes.items()
+    }, len(rows) + skipped, skipped
+
+
+def build_cubes(paths, use_arrow=True):
+    """{grain: [строки куба]}, всего строк, пропущено без plan_date; paths - all_data.csv и/или каталоги Parquet"""
+    if use_arrow and pa is not None:
+        tables = [_read_table(path) for path in paths]
+        return _cubes_arrow(pa.concat_tables(tables, promote_options='permissive') if len(tables) > 1 else tables[0])
+    parquet = [path for path in paths if _is_parquet(path)]
+    if parquet:
+        raise ValueError(f'{parquet[0]}: для Parquet нужен pyarrow (pip install pyarrow), или укажите all_data.csv')
+    return _cubes_python(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Кубы часов по сотруднику x предприятию x процессу x периоду')
+    parser.add_argument('--input', nargs='+', default=None,
+                        help='all_data.csv и/или каталоги Parquet (по умолчанию - выходы excel_to_csv в data/import)')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help='Каталог для hours_<период>.json')
+    parser.add_argument('--ndjson', action='store_true', help='Писать NDJSON')
+    parser.add_argument('--python', action='store_true', help='Без pyarrow, даже если он установлен')
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    paths = args.input or default_inputs()
+    missing = [path for path in paths if not os.path.exists(path)]
+    if not paths or missing:
+        parser.error(f'нет входных файлов {", ".join(missing)}: сначала python scripts/excel_to_csv.py')
+
+    with instrument.session('rollup_hours', args):
+        start = time.perf_counter()
+        with instrument.stage('aggregate') as st:
+            cubes, total, skipped = build_cubes(paths, not args.python)
+            st.add(rows=total)
+        elapsed = time.perf_counter() - start
+
+        print(f'{", ".join(os.path.relpath(p) for p in paths)}: {total} строк -> кубы за {elapsed:.2f} s'
+              f' ({"pyarrow" if pa is not None and not args.python else "csv"})')
+        if skipped:
+            print(f'  ⚠️  без plan_date, пропущено: {skipped}')
+
+        os.makedirs(args.output_dir, exist_ok=True)
+        ext = 'ndjson' if args.ndjson else 'json'
+        with instrument.stage('write') as st:
+            for grain, rows in cubes.items():
+                out = os.path.join(args.output_dir, f'hours_{grain}.{ext}')
+                st.add(rows=write_rows(out, rows, args.ndjson), bytes=os.path.getsize(out))
+                plan = sum(r['plan_hours'] for r in rows)
+                fact = sum(r['fact_hours'] for r in rows)
+                print(f'  {os.path.basename(out)}: {len(rows)} строк, план {plan:,.1f} ч, факт {fact:,.1f} ч')
+
+
+if __name__ == '__main__':
+    main()
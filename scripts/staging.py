@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Промежуточное хранилище импорта в SQLite (--staging у скриптов импорта).
+
+Файлы импорта загружаются в data/import/staging.sqlite потоком: iter_json_rows
+или csv.reader прямо в executemany, одной транзакцией, индексы строятся после
+загрузки. Запись хранится как JSON (body), а колонки для связывания, проверок
+и дельты вынимаются в отдельные столбцы с индексами. Дальше связывание,
+проверка ссылок и дельта с БД - SQL, а строки для батчей читаются страницами
+по seq (keyset), так что в памяти держится страница, а не файл.
+
+Хранилище - кеш: каждый запуск перезагружает свои таблицы из файлов, файлы
+остаются источником. Журнал WAL: читатели не ждут писателя, а запись
+страницами не блокирует параллельный этап пайплайна на том же файле.
+
+Использование:
+    python scripts/staging.py [--db PATH] [--csv all_data.csv ...]
+        Загрузить файлы импорта (и CSV) и напечатать проверки; дальше - sqlite3 PATH
+"""
+import sys
+sys.stdout.reconfigure(encoding='utf-8')
+import argparse
+import contextlib
+import csv
+import glob
+import json
+import os
+import sqlite3
+import time
+
+from jsonio import encode_row, iter_json_rows, resolve_import_file
+
+SCRIPT_DIR = os.path.dirname(__file__)
+IMPORT_DIR = os.getenv('IMPORT_DIR') or os.path.join(SCRIPT_DIR, '..', 'data', 'import')
+STAGING_PATH = os.path.join(IMPORT_DIR, 'staging.sqlite')
+PAGE_SIZE = 5000
+BUSY_TIMEOUT = 30  # секунд ждать блокировку другого процесса
+
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',  # с WAL - fsync на чекпойнте, а не на каждой транзакции
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -65536',  # 64 МБ
+)
+
+# Таблицы import_to_supabase: столбцы для индексов и проверок
+IMPORT_SCHEMA = {
+    'quarterly_plans': ('quarterly_id', 'process_id'),
+    'weekly_plans': ('weekly_id', 'quarterly_id'),
+    'weekly_plan_assignees': ('weekly_plan_id', 'user_id'),
+    'weekly_plan_companies': ('weekly_id', 'company_id'),
+    'weekly_tasks': ('weekly_tasks_id', 'weekly_plan_id'),
+}
+PRIMARY_KEYS = {'quarterly_plans': 'quarterly_id', 'weekly_plans': 'weekly_id', 'weekly_tasks': 'weekly_tasks_id'}
+# (таблица, столбец) -> (таблица, столбец), на который он ссылается
+REFERENCES = [
+    ('weekly_plans', 'quarterly_id', 'quarterly_plans', 'quarterly_id'),
+    ('weekly_plan_assignees', 'weekly_plan_id', 'weekly_plans', 'weekly_id'),
+    ('weekly_plan_companies', 'weekly_id', 'weekly_plans', 'weekly_id'),
+    ('weekly_tasks', 'weekly_plan_id', 'weekly_plans', 'weekly_id'),
+]
+SHEET_TABLE = 'sheet'
+SHEET_REQUIRED = ('process', 'employee', 'plan_date')
+
+
+def encode_key(values):
+    """Ключ (кортеж) -> текст для индекса; одинаковые значения дают одинаковый текст"""
+    return encode_row(list(values)).decode('utf-8')
+
+
+def decode_key(text):
+    return tuple(json.loads(text))
+
+
+class StagingStore:
+    """Соединение с хранилищем: загрузка таблиц, постраничное чтение, проверки и дельта"""
+
+    def __init__(self, path=STAGING_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Транзакции - явно через transaction(), без неявного BEGIN модуля sqlite3
+        self.db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        for pragma in PRAGMAS:
+            self.db.execute(pragma)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.db
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        self.db.execute('COMMIT')
+
+    def load_rows(self, table, rows, columns=(), values=None, key=None, hash_row=None, derived=(),
+                  indexes=(), body=True):
+        """
+        Заменить таблицу записями rows (итератор, читается один раз). Столбцы:
+        seq - порядок в файле; columns - значения values(запись) (по умолчанию
+        одноимённые поля); key - ключ записи (кортеж), hash_row - её хеш для дельты;
+        derived - пустые столбцы, которые заполнит SQL; body - сама запись в JSON.
+        indexes - кортежи столбцов. Вернуть число записей.
+        """
+        columns = list(columns)
+        if values is None:
+            values = lambda row: tuple(row.get(c) for c in columns)
+        stored = [*columns, *(['key'] if key else []), *(['hash'] if hash_row else []), *(['body'] if body else [])]
+
+        def records():
+            for row in rows:
+                record = values(row)
+                if key:
+                    record = (*record, encode_key(key(row)))
+                if hash_row:
+                    record = (*record, hash_row(row))
+                yield (*record, encode_row(row)) if body else record
+
+        with self.transaction() as db:
+            db.execute(f'DROP TABLE IF EXISTS {table}')
+            db.execute(f'CREATE TABLE {table} (seq INTEGER PRIMARY KEY, {", ".join([*stored, *derived])})')
+            db.executemany(f'INSERT INTO {table} ({", ".join(stored)}) VALUES ({", ".join("?" * len(stored))})',
+                           records())
+            # Индексы после загрузки: один проход сортировки вместо вставки в B-дерево на каждую строку
+            for cols in [*indexes, *([('key', 'hash') if hash_row else ('key',)] if key else [])]:
+                db.execute(f'CREATE INDEX {table}_{"_".join(cols)} ON {table} ({", ".join(cols)})')
+        return self.count(table)
+
+    def load_csv(self, table, paths):
+        """Заменить таблицу строками CSV (колонки - из заголовка первого файла); вернуть число строк"""
+        header = None
+        with self.transaction() as db:
+            db.execute(f'DROP TABLE IF EXISTS {table}')
+            for path in paths:
+                with open(path, 'r', encoding='utf-8', newline='') as f:
+                    reader = csv.reader(f)
+                    file_header = next(reader, None)
+                    if file_header is None:
+                        continue
+                    if header is None:
+                        header = file_header
+                        db.execute(f'CREATE TABLE {table} (seq INTEGER PRIMARY KEY, {", ".join(header)})')
+                    elif file_header != header:
+                        raise ValueError(f'{path}: заголовок не совпадает с {paths[0]}')
+                    # Пустая ячейка CSV -> NULL, как None в JSON
+                    db.executemany(f'INSERT INTO {table} ({", ".join(header)}) VALUES ({", ".join("?" * len(header))})',
+                                   ([v if v != '' else None for v in row] for row in reader))
+        return self.count(table) if header else 0
+
+    def count(self, table, where='1', params=()):
+        return self.db.execute(f'SELECT COUNT(*) FROM {table} WHERE {where}', params).fetchone()[0]
+
+    def pages(self, table, select='body', where='1', params=(), page_size=PAGE_SIZE):
+        """
+        Страницы (списки кортежей select) по возрастанию seq. Каждая страница -
+        отдельный запрос от последнего seq: между страницами можно писать в ту же
+        таблицу, а память ограничена страницей.
+        """
+        last = 0
+        while True:
+            page = self.db.execute(
+                f'SELECT seq, {select} FROM {table} WHERE seq > ? AND ({where}) ORDER BY seq LIMIT ?',
+                (last, *params, page_size)).fetchall()
+            if page:
+                yield [row[1:] for row in page]
+            if len(page) < page_size:
+                return
+            last = page[-1][0]
+
+    def iter_rows(self, table, where='1', params=(), page_size=PAGE_SIZE):
+        """Записи таблицы (dict) по порядку файла, постранично"""
+        for page in self.pages(table, 'body', where, params, page_size):
+            for (body,) in page:
+                yield json.loads(body)
+
+    # ====== проверки ======
+
+    def duplicates(self, table, column):
+        """Сколько лишних строк с повторяющимся непустым column"""
+        return self.db.execute(
+            f'SELECT COALESCE(SUM(n - 1), 0) FROM (SELECT COUNT(*) AS n FROM {table} '
+            f'WHERE {column} IS NOT NULL GROUP BY {column} HAVING n > 1)').fetchone()[0]
+
+    def orphans(self, table, column, parent, parent_column):
+        """Строки, чей непустой column не найден в parent.parent_column"""
+        return self.count(table, f'{column} IS NOT NULL AND NOT EXISTS '
+                                 f'(SELECT 1 FROM {parent} p WHERE p.{parent_column} = {table}.{column})')
+
+    def drop(self, table):
+        self.db.execute(f'DROP TABLE IF EXISTS {table}')
+
+    def has_table(self, table):
+        return self.db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+    # ====== дельта ======
+
+    def delta_counts(self, local, remote):
+        """(вставки, изменения, удаления) - число различных ключей"""
+        db = self.db
+        inserts = db.execute(f'SELECT COUNT(DISTINCT key) FROM {local} l WHERE NOT EXISTS '
+                             f'(SELECT 1 FROM {remote} r WHERE r.key = l.key)').fetchone()[0]
+        updates = db.execute(f'SELECT COUNT(DISTINCT key) FROM {local} l WHERE EXISTS '
+                             f'(SELECT 1 FROM {remote} r WHERE r.key = l.key) AND {_changed("l", remote)}').fetchone()[0]
+        deletes = db.execute(f'SELECT COUNT(DISTINCT key) FROM {remote} r WHERE NOT EXISTS '
+                             f'(SELECT 1 FROM {local} l WHERE l.key = r.key)').fetchone()[0]
+        return inserts, updates, deletes
+
+    def changed_rows(self, local, remote, page_size=PAGE_SIZE):
+        """Записи local, которых нет в remote с тем же ключом и хешем (вставки и изменения), постранично"""
+        return self.iter_rows(local, _changed(local, remote), page_size=page_size)
+
+    def changed_count(self, local, remote):
+        return self.count(local, _changed(local, remote))
+
+    def deleted_keys(self, local, remote):
+        """Ключи remote, которых нет в local"""
+        for (key,) in self.db.execute(f'SELECT DISTINCT key FROM {remote} r WHERE NOT EXISTS '
+                                      f'(SELECT 1 FROM {local} l WHERE l.key = r.key) ORDER BY key'):
+            yield decode_key(key)
+
+
+def _changed(local, remote):
+    """Условие "нет строки remote с тем же ключом и хешем"; local - имя или псевдоним локальной таблицы"""
+    return f'NOT EXISTS (SELECT 1 FROM {remote} r WHERE r.key = {local}.key AND r.hash = {local}.hash)'
+
+
+def load_import_files(store, tables=IMPORT_SCHEMA, import_dir=IMPORT_DIR):
+    """Файлы импорта -> таблицы хранилища с индексами по IMPORT_SCHEMA; {таблица: строк} (None - нет файла)"""
+    counts = {}
+    for table in tables:
+        path = resolve_import_file(os.path.join(import_dir, f'{table}.json'))
+        columns = IMPORT_SCHEMA[table]
+        if path is None:
+            store.drop(table)  # таблица прошлого запуска не должна уйти в импорт
+            counts[table] = None
+            continue
+        counts[table] = store.load_rows(table, iter_json_rows(path), columns, indexes=[(c,) for c in columns])
+    return counts
+
+
+def validate(store, tables=IMPORT_SCHEMA):
+    """Проблемы загруженных таблиц: [(описание, строк)] только с ненулевыми количествами"""
+    problems = []
+    for table, column in PRIMARY_KEYS.items():
+        if table in tables and store.has_table(table):
+            problems.append((f'{table}: повторяющийся {column}', store.duplicates(table, column)))
+    for table, column, parent, parent_column in REFERENCES:
+        if table in tables and parent in tables and store.has_table(table) and store.has_table(parent):
+            problems.append((f'{table}.{column}: нет в {parent}', store.orphans(table, column, parent, parent_column)))
+    if store.has_table(SHEET_TABLE):
+        for column in SHEET_REQUIRED:
+            problems.append((f'{SHEET_TABLE}: пустой {column}', store.count(SHEET_TABLE, f'{column} IS NULL')))
+    return [(text, n) for text, n in problems if n]
+
+
+def add_argument(parser):
+    parser.add_argument('--staging', nargs='?', const=STAGING_PATH, default=None, metavar='PATH',
+                        help=f'Промежуточное хранилище SQLite (по умолчанию {os.path.relpath(STAGING_PATH)})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Загрузить файлы импорта в SQLite и проверить ссылки')
+    parser.add_argument('--db', default=STAGING_PATH, help='Файл SQLite')
+    parser.add_argument('--csv', nargs='*', default=None,
+                        help='CSV листа (по умолчанию все all_data.csv в data/import)')
+    args = parser.parse_args()
+
+    csv_paths = args.csv if args.csv is not None else sorted(
+        glob.glob(os.path.join(IMPORT_DIR, '**', 'all_data.csv'), recursive=True))
+    start = time.perf_counter()
+    with StagingStore(args.db) as store:
+        counts = load_import_files(store)
+        if csv_paths:
+            counts[SHEET_TABLE] = store.load_csv(SHEET_TABLE, csv_paths)
+        print(f'{args.db}: загружено за {time.perf_counter() - start:.2f} s')
+        for table, n in counts.items():
+            print(f'  {table}: {"нет файла" if n is None else n}')
+
+        problems = validate(store, [t for t, n in counts.items() if n is not None])
+        print()
+        if not problems:
+            print('✅ Проверки пройдены')
+        for text, n in problems:
+            print(f'  ⚠️  {text}: {n}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Локальная заглушка PostgREST для проверки и бенчмарков загрузчиков импорта.
+
+Хранит строки в памяти, поддерживает вставку батчей (POST, в том числе upsert
+через on_conflict + Prefer: resolution=merge-duplicates), подсчёт (HEAD с
+Prefer: count=exact), выборку (GET ?select=&order=&limit=&offset=) и удаление
+(DELETE) с фильтрами eq/neq/in и or=(and(...)). Тела с Content-Encoding: gzip
+распаковываются; bytes_received считает байты в сети. Задержка ответа имитирует сеть.
+Сбои: 413 для тел больше --max-body-bytes, случайные 503 с вероятностью
+--error-rate и 400 (код Postgres 22P02) для батча, где есть строка с ключом "_reject".
+
+Использование:
+    python scripts/stub_postgrest.py [--port 54321] [--latency-ms 20] [--max-body-bytes N] [--error-rate 0.05]
+    NEXT_PUBLIC_SUPABASE_URL=http://127.0.0.1:54321 python scripts/import_to_supabase.py
+"""
+import sys
+sys.stdout.reconfigure(encoding='utf-8')
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+def _split_top(text, sep=','):
+    """Разбить по разделителю вне скобок и кавычек"""
+    parts, depth, quoted, cur = [], 0, False, ''
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == '(':
+            depth += 1
+        elif not quoted and ch == ')':
+            depth -= 1
+        if ch == sep and depth == 0 and not quoted:
+            parts.append(cur)
+            cur = ''
+        else:
+            cur += ch
+    parts.append(cur)
+    return parts
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"')
+    return value
+
+
+def _matches(row, column, op, value):
+    actual = row.get(column)
+    actual = None if actual is None else str(actual)
+    if op == 'is':
+        return actual is None if value == 'null' else False
+    if op == 'eq':
+        return actual == _unquote(value)
+    if op == 'neq':
+        return actual != _unquote(value)
+    if op == 'in':
+        return actual in {_unquote(v) for v in _split_top(value[1:-1])}
+    raise ValueError(f'unsupported operator: {op}')
+
+
+def _condition(expr):
+    """'col.eq.val' или 'and(...)' / 'or(...)' -> предикат"""
+    for logic, combine in (('and(', all), ('or(', any)):
+        if expr.startswith(logic):
+            parts = [_condition(p) for p in _split_top(expr[len(logic):-1])]
+            return lambda row: combine(p(row) for p in parts)
+    column, op, value = expr.split('.', 2)
+    return lambda row: _matches(row, column, op, value)
+
+
+def parse_filters(query):
+    """Фильтры PostgREST из query string (кроме служебных параметров)"""
+    predicates = []
+    for name, value in parse_qsl(query, keep_blank_values=True):
+        if name in ('select', 'order', 'limit', 'offset', 'on_conflict', 'columns'):
+            continue
+        if name in ('or', 'and'):
+            predicates.append(_condition(f'{name}{value}'))
+        else:
+            op, _, arg = value.partition('.')
+            predicates.append(lambda row, c=name, o=op, a=arg: _matches(row, c, o, a))
+    return lambda row: all(p(row) for p in predicates)
+
+
+class StubStore:
+    """Таблицы в памяти + счётчики запросов"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tables = {}
+        self.requests = 0
+        self.bytes_received = 0
+
+    def insert(self, table, rows):
+        with self.lock:
+            self.tables.setdefault(table, []).extend(rows)
+
+    def upsert(self, table, rows, key_cols):
+        with self.lock:
+            data = self.tables.setdefault(table, [])
+            positions = {tuple(r.get(c) for c in key_cols): i for i, r in enumerate(data)}
+            for row in rows:
+                key = tuple(row.get(c) for c in key_cols)
+                if key in positions:
+                    data[positions[key]] = {**data[positions[key]], **row}
+                else:
+                    positions[key] = len(data)
+                    data.append(row)
+
+    def select(self, table, predicate):
+        with self.lock:
+            return [r for r in self.tables.get(table, []) if predicate(r)]
+
+    def delete(self, table, predicate):
+        with self.lock:
+            data = self.tables.get(table, [])
+            kept = [r for r in data if not predicate(r)]
+            self.tables[table] = kept
+            return len(data) - len(kept)
+
+    def count(self, table):
+        with self.lock:
+            return len(self.tables.get(table, []))
+
+    def clear(self, table):
+        with self.lock:
+            self.tables[table] = []
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, как у настоящего PostgREST
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def store(self):
+        return self.server.store
+
+    def _table(self):
+        path = urlsplit(self.path).path
+        prefix = '/rest/v1/'
+        return path[len(prefix):] if path.startswith(prefix) else None
+
+    def _reply(self, status, body=b'', headers=None):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        with self.store.lock:
+            self.store.requests += 1
+            self.store.bytes_received += length
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return body
+
+    def do_POST(self):
+        table = self._table()
+        body = self._read_body()
+        if self.server.max_body and len(body) > self.server.max_body:
+            return self._reply(413, b'{"message":"Payload Too Large"}')
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            return self._reply(503, b'{"message":"Service Unavailable"}')
+        try:
+            rows = json.loads(body)
+        except ValueError as e:
+            return self._reply(400, json.dumps({'message': str(e)}).encode())
+        rows = rows if isinstance(rows, list) else [rows]
+        if any('_reject' in row for row in rows):
+            # Отказ Postgres по строке (не PGRSTxxx) - загрузчик делит батч, чтобы её изолировать
+            return self._reply(400, b'{"code":"22P02","message":"invalid input syntax for row with _reject"}')
+        on_conflict = dict(parse_qsl(urlsplit(self.path).query)).get('on_conflict')
+        if on_conflict and 'merge-duplicates' in (self.headers.get('Prefer') or ''):
+            self.store.upsert(table, rows, on_conflict.split(','))
+        else:
+            self.store.insert(table, rows)
+        self._reply(201)
+
+    def do_HEAD(self):
+        table = self._table()
+        count = self.store.count(table)
+        self._reply(200, headers={'Content-Range': f'0-{max(count - 1, 0)}/{count}'})
+
+    def do_GET(self):
+        table = self._table()
+        params = dict(parse_qsl(urlsplit(self.path).query))
+        rows = self.store.select(table, parse_filters(urlsplit(self.path).query))
+        if params.get('order'):
+            order = [c.split('.')[0] for c in params['order'].split(',')]
+            rows.sort(key=lambda r: tuple(str(r.get(c)) for c in order))
+        offset = int(params.get('offset', 0))
+        limit = int(params['limit']) if 'limit' in params else len(rows)
+        page = rows[offset:offset + limit]
+        select = params.get('select', '*')
+        if select == 'count':
+            page = [{'count': len(rows)}]
+        elif select != '*':
+            columns = select.split(',')
+            page = [{c: r.get(c) for c in columns} for r in page]
+        end = offset + len(page) - 1
+        self._reply(200, json.dumps(page, ensure_ascii=False).encode('utf-8'),
+                    {'Content-Type': 'application/json', 'Content-Range': f'{offset}-{end}/{len(rows)}'})
+
+    def do_DELETE(self):
+        self.store.delete(self._table(), parse_filters(urlsplit(self.path).query))
+        self._reply(204)
+
+
+def start_stub(port=0, latency_ms=0, max_body=0, error_rate=0.0):
+    """Запустить заглушку в фоновом потоке; вернуть (server, base_url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.store = StubStore()
+    server.latency = latency_ms / 1000
+    server.max_body = max_body
+    server.error_rate = error_rate
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Локальная заглушка PostgREST')
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Задержка каждого ответа')
+    parser.add_argument('--max-body-bytes', type=int, default=0, help='413 для тел больше N байт')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля случайных 503')
+    args = parser.parse_args()
+
+    server, url = start_stub(args.port, args.latency_ms, args.max_body_bytes, args.error_rate)
+    print(f'Stub PostgREST: {url}/rest/v1/ (Ctrl+C для остановки)')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Общий загрузчик батчей в Supabase (PostgREST) для скриптов импорта.
+
+Одна requests.Session с пулом соединений (без TCP/TLS-рукопожатия на каждый батч)
+и до `workers` батчей одновременно в полёте. Таблицы грузятся строго по очереди:
+import_table возвращается только когда все батчи таблицы завершены, поэтому
+порядок внешних ключей, заданный вызывающим скриптом, сохраняется.
+
+Размер батча подбирается по байтам тела запроса и наблюдаемой задержке (BatchSizer).
+Батч, получивший 413/5xx или отказ по отдельной строке, делится пополам и
+переотправляется с экспоненциальной задержкой; строки, которые не удалось
+вставить и поодиночке, пишутся в data/import/dead_letter/<таблица>.json.
+409 (нарушение уникальности 23505 или внешнего ключа 23503) и прочие 400 - тоже
+отказ по строке и тоже делятся. Не делятся только 401/403/404: ключ или таблица
+одинаково отвергают любую часть батча, и он целиком уходит в dead letter.
+
+Файлы читаются потоково (JSON-массив или NDJSON, см. jsonio), поэтому память
+ограничена батчами в полёте, а не размером файла.
+
+Строки кодируются компактно и в UTF-8 (orjson, если установлен), тело батча
+можно сжимать gzip (--gzip / IMPORT_GZIP=1). По каждой таблице печатается
+сводка: запросы, байты до/после сжатия, время кодирования и время на батч.
+"""
+import gzip
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from jsonio import iter_json_rows, resolve_import_file
+
+try:
+    import orjson
+except ImportError:  # orjson опционален, json тоже справляется
+    orjson = None
+
+DEFAULT_WORKERS = int(os.getenv('IMPORT_WORKERS', '4'))
+DEFAULT_GZIP = os.getenv('IMPORT_GZIP', '') in ('1', 'true', 'yes')
+GZIP_LEVEL = 5
+DEAD_LETTER_DIR = os.path.join(os.getenv('IMPORT_DIR') or os.path.join(os.path.dirname(__file__), '..', 'data', 'import'), 'dead_letter')
+
+# Адаптивный размер батча
+INITIAL_BATCH_BYTES = 256 * 1024
+MIN_BATCH_BYTES = 16 * 1024
+MAX_BATCH_BYTES = 4 * 1024 * 1024
+MAX_BATCH_ROWS = 5000
+TARGET_LATENCY = 1.0  # секунд на батч
+
+# Повторы
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5  # секунд, удваивается с каждой попыткой
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+FATAL_STATUSES = {401, 403, 404}  # ключ/таблица: делить батч бессмысленно
+
+
+class BatchSizer:
+    """
+    Целевой размер батча в байтах: растёт, пока батчи укладываются в TARGET_LATENCY,
+    и уменьшается вдвое на медленных ответах и 413.
+    """
+
+    def __init__(self, initial=INITIAL_BATCH_BYTES):
+        self.target = initial
+        self.lock = threading.Lock()
+
+    def observe(self, latency, status):
+        with self.lock:
+            if status == 413 or latency > 2 * TARGET_LATENCY:
+                self.target = max(MIN_BATCH_BYTES, self.target // 2)
+            elif status in (200, 201) and latency < TARGET_LATENCY / 2:
+                self.target = min(MAX_BATCH_BYTES, int(self.target * 1.25))
+
+    def batches(self, encoded_rows):
+        """Нарезать поток закодированных строк на батчи по текущему target"""
+        batch, size = [], 2
+        for raw in encoded_rows:
+            if batch and (size + len(raw) + 1 > self.target or len(batch) >= MAX_BATCH_ROWS):
+                yield batch
+                batch, size = [], 2
+            batch.append(raw)
+            size += len(raw) + 1
+        if batch:
+            yield batch
+
+
+# json.dumps с нестандартными параметрами создаёт энкодер на каждый вызов
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def encode_row(row):
+    """Компактный UTF-8 JSON (без \\uXXXX для кириллицы и пробелов после разделителей)"""
+    if orjson is not None:
+        return orjson.dumps(row)
+    return _JSON_ENCODER.encode(row).encode('utf-8')
+
+
+def batch_body(batch):
+    return b'[' + b','.join(batch) + b']'
+
+
+class BulkLoader:
+    """Пул соединений + параллельная отправка батчей в одну таблицу"""
+
+    def __init__(self, base_url, key, workers=DEFAULT_WORKERS, dead_letter_dir=DEAD_LETTER_DIR, gzip=DEFAULT_GZIP):
+        self.base_url = base_url
+        self.workers = max(1, workers)
+        self.dead_letter_dir = dead_letter_dir
+        self.gzip = gzip
+        self.sizer = BatchSizer()
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+        self.failures = {}  # таблица -> строк, не записанных даже поодиночке (dead letter) или не удалённых
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'apikey': key,
+            'Authorization': f'Bearer {key}',
+            'Content-Type': 'application/json',
+            'Prefer': 'return=minimal'
+        })
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def table_url(self, table_name):
+        return f'{self.base_url}/rest/v1/{table_name}'
+
+    def table_stats(self, table_name):
+        with self.stats_lock:
+            return self.stats.setdefault(table_name, {
+                'rows': 0, 'requests': 0, 'raw_bytes': 0, 'wire_bytes': 0,
+                'encode_seconds': 0.0, 'compress_seconds': 0.0, 'batch_seconds': [],
+            })
+
+    def _send(self, table_name, batch, on_conflict=None):
+        """Один POST; сетевую ошибку возвращаем как статус 0"""
+        params, headers = None, {}
+        if on_conflict:
+            params = {'on_conflict': on_conflict}
+            headers['Prefer'] = 'resolution=merge-duplicates,return=minimal'
+
+        body = batch_body(batch)
+        raw_bytes = len(body)
+        compress_start = time.perf_counter()
+        if self.gzip:
+            body = gzip.compress(body, GZIP_LEVEL)
+            headers['Content-Encoding'] = 'gzip'
+        compress_seconds = time.perf_counter() - compress_start
+
+        start = time.perf_counter()
+        try:
+            response = self.session.post(self.table_url(table_name), data=body, params=params, headers=headers)
+            status, text = response.status_code, response.text
+        except requests.RequestException as e:
+            status, text = 0, str(e)
+        elapsed = time.perf_counter() - start
+        self.sizer.observe(elapsed, status)
+
+        stats = self.table_stats(table_name)
+        with self.stats_lock:
+            stats['requests'] += 1
+            stats['raw_bytes'] += raw_bytes
+            stats['wire_bytes'] += len(body)
+            stats['compress_seconds'] += compress_seconds
+            stats['batch_seconds'].append(elapsed)
+        return status, text
+
+    def _encode(self, table_name, rows):
+        """Кодировать строки по одной, учитывая время кодирования"""
+        stats = self.table_stats(table_name)
+        clock = time.perf_counter
+        for row in rows:
+            start = clock()
+            raw = encode_row(row)
+            stats['encode_seconds'] += clock() - start
+            stats['rows'] += 1
+            yield raw
+
+    def print_stats(self, table_name):
+        stats = self.table_stats(table_name)
+        if not stats['requests']:
+            return
+        per_10k = 10_000 / stats['rows'] if stats['rows'] else 0
+        encode_ms = 1000 * stats['encode_seconds'] * per_10k
+        compress_ms = 1000 * stats['compress_seconds'] * per_10k
+        batch_ms = [1000 * t for t in stats['batch_seconds']]
+        cpu = f'кодирование {encode_ms:.0f} мс' + (f', gzip {compress_ms:.0f} мс' if self.gzip else '')
+        print(f'     {stats["requests"]} запросов, '
+              f'{stats["raw_bytes"] / 1e6:.2f} МБ JSON -> {stats["wire_bytes"] / 1e6:.2f} МБ в сети, '
+              f'CPU на 10K строк: {cpu}, '
+              f'батч {sum(batch_ms) / len(batch_ms):.0f} мс в среднем / {max(batch_ms):.0f} мс макс.')
+
+    def post_batch(self, table_name, batch, on_conflict=None):
+        """
+        Отправить батч с повторами и делением.
+        Вернуть (вставлено, [(строка, статус, ответ), ...] не вставленных).
+        """
+        attempt = 0
+        while True:
+            status, text = self._send(table_name, batch, on_conflict)
+            if status in (200, 201):
+                return len(batch), []
+            transient = status == 0 or status in RETRY_STATUSES
+            if transient and attempt < MAX_RETRIES and (len(batch) == 1 or attempt == 0):
+                time.sleep(BACKOFF_BASE * (2 ** attempt) * (1 + random.random()))
+                attempt += 1
+                continue
+            break
+
+        if len(batch) == 1 or status in FATAL_STATUSES:
+            return 0, [(raw, status, text[:500]) for raw in batch]
+
+        # 413, стойкая 5xx или отказ по строке (400, 409): делим пополам, чтобы изолировать проблему
+        mid = len(batch) // 2
+        ok_left, failed_left = self.post_batch(table_name, batch[:mid], on_conflict)
+        ok_right, failed_right = self.post_batch(table_name, batch[mid:], on_conflict)
+        return ok_left + ok_right, failed_left + failed_right
+
+    def import_rows(self, table_name, rows, total=None, on_conflict=None):
+        """
+        Загрузить строки (список или итератор) адаптивными батчами,
+        держа в полёте не больше workers батчей.
+        on_conflict - колонки ключа для upsert (merge-duplicates) вместо вставки.
+        """
+        if total is None and hasattr(rows, '__len__'):
+            total = len(rows)
+        print(f'  📦 {table_name}: {total if total else "?"} записей...', end=' ', flush=True)
+
+        progress = {'imported': 0, 'failed': []}
+        batches = self.sizer.batches(self._encode(table_name, rows))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = set()
+            for batch in batches:
+                pending.add(pool.submit(self.post_batch, table_name, batch, on_conflict))
+                if len(pending) < self.workers:
+                    continue
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._account(table_name, future, total, progress)
+            for future in pending:
+                self._account(table_name, future, total, progress)
+
+        imported, failed = progress['imported'], progress['failed']
+        if failed:
+            self.failures[table_name] = self.failures.get(table_name, 0) + len(failed)
+        if not failed:
+            self.clear_dead_letter(table_name)
+            print(f'\r  ✅ {table_name}: {imported} записей импортировано')
+        else:
+            path = self.write_dead_letter(table_name, failed)
+            print(f'\r  ⚠️  {table_name}: {imported} OK, {len(failed)} ошибок -> {path}')
+        self.print_stats(table_name)
+
+        return imported
+
+    def _account(self, table_name, future, total, progress):
+        ok, failed = future.result()
+        progress['imported'] += ok
+        progress['failed'].extend(failed)
+        for _, status, text in failed:
+            print(f'\n  ❌ Ошибка: {status} - {text[:200]}')
+        # Прогресс
+        if total:
+            done = progress['imported'] + len(progress['failed'])
+            pct = 100 * done / total
+            print(f'\r  📦 {table_name}: {progress["imported"]}/{total} ({pct:.0f}%)', end='', flush=True)
+        else:
+            print(f'\r  📦 {table_name}: {progress["imported"]}', end='', flush=True)
+
+    def failed_count(self):
+        """Сколько строк за всё время работы загрузчика не удалось записать или удалить; 0 - всё применено"""
+        return sum(self.failures.values())
+
+    def clear_dead_letter(self, table_name):
+        path = os.path.join(self.dead_letter_dir, f'{table_name}.json')
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write_dead_letter(self, table_name, failed):
+        """Не вставленные строки с кодом и текстом ошибки"""
+        os.makedirs(self.dead_letter_dir, exist_ok=True)
+        path = os.path.join(self.dead_letter_dir, f'{table_name}.json')
+        records = [{'row': json.loads(raw), 'status': status, 'error': text} for raw, status, text in failed]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        return path
+
+    def import_file(self, table_name, filepath):
+        """Импорт файла в таблицу: <имя>.json или <имя>.ndjson, если он свежее"""
+        path = resolve_import_file(filepath)
+        if path is None:
+            print(f'  ⚠️  Файл не найден: {os.path.basename(filepath)}')
+            return 0
+
+        rows = iter_json_rows(path)
+        first = next(rows, None)
+        if first is None:
+            print(f'  ⚠️  Пустой файл: {os.path.basename(path)}')
+            return 0
+
+        return self.import_rows(table_name, itertools.chain([first], rows))
+
+    def count(self, table_name):
+        """Количество записей в таблице (HEAD + count=exact)"""
+        url = f'{self.table_url(table_name)}?select=count'
+        response = self.session.head(url, headers={'Prefer': 'count=exact'})
+
+        if response.status_code == 200:
+            count = response.headers.get('content-range', '').split('/')[-1]
+            return int(count) if count.isdigit() else 0
+        return 0
+
+    def fetch_rows(self, table_name, columns, order, page_size=1000):
+        """Постранично прочитать колонки таблицы (order нужен для стабильных страниц)"""
+        offset = 0
+        while True:
+            response = self.session.get(self.table_url(table_name), params={
+                'select': ','.join(columns),
+                'order': ','.join(order),
+                'limit': page_size,
+                'offset': offset,
+            })
+            response.raise_for_status()
+            page = response.json()
+            yield from page
+            if len(page) < page_size:
+                return
+            offset += page_size
+
+    def delete_keys(self, table_name, key_cols, keys, chunk_size=100):
+        """
+        Удалить строки по ключам чанками (in.(...) для простого ключа,
+        or=(and(...)) для составного). Вернуть число ключей в успешных запросах.
+        """
+        keys = list(keys)
+        deleted = 0
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            if len(key_cols) == 1:
+                params = {key_cols[0]: f'in.({",".join(_quote(k[0]) for k in chunk)})'}
+            else:
+                conditions = (
+                    'and(' + ','.join(_filter(col, val) for col, val in zip(key_cols, key)) + ')'
+                    for key in chunk
+                )
+                params = {'or': f'({",".join(conditions)})'}
+            response = self.session.delete(self.table_url(table_name), params=params)
+            if response.status_code in (200, 204):
+                deleted += len(chunk)
+            else:
+                self.failures[table_name] = self.failures.get(table_name, 0) + len(chunk)
+                print(f'\n  ❌ Ошибка удаления: {response.status_code} - {response.text[:200]}')
+        return deleted
+
+
+def _quote(value):
+    """Значение для фильтра PostgREST в двойных кавычках"""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _filter(column, value):
+    return f'{column}.is.null' if value is None else f'{column}.eq.{_quote(value)}'
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Синтетические данные в форме bdib для бенчмарков: книга Excel с колонками
+COLUMNS и JSON-файлы импорта (quarterly_plans, weekly_plans_full, связи, задачи).
+
+Распределения сняты с bdib2025 (25,918 строк): отделы ОКБ/СМУР/СВК как
+48/44/8 %, сотрудники и процессы внутри отдела - по Ципфу (самый частый
+процесс - ~40 % строк), 7 предприятий, на которые задача чаще всего
+раскладывается целиком (строка на предприятие, fact_hours делится поровну),
+план часов из типичного набора, сезонность по месяцам (пик в марте, провал
+в августе). Число сотрудников растёт со строками, чтобы на 1M строк недельных
+планов было больше, а не только задач в тех же планах.
+
+Использование:
+    python scripts/synthetic_data.py --rows 100k --output-dir /tmp/bdib-100k [--no-excel]
+"""
+import sys
+sys.stdout.reconfigure(encoding='utf-8')
+import argparse
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import openpyxl
+
+import instrument
+from excel_to_csv import EXCEL_HEADERS
+from jsonio import RowWriter, atomic_open, write_rows
+
+YEAR = 2025
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+DEPARTMENTS = {'ОКБ': 0.48, 'СМУР': 0.44, 'СВК': 0.08}
+EMPLOYEES_PER_25K_ROWS = 20
+COMPANIES = ['АТБ-Маркет', 'Корпорація АТБ', 'ЧП Транс Логістик', 'Логістік Юніон',
+             'Рітейл Девелопмент', 'КФ-Квітень', 'Фоззі']
+PROCESSES = ['Управління документацією', 'Моніторинг подій ІБ', 'Управління інцидентами ІБ',
+             'Управління правами доступу', 'Управління життєвим циклом ІС', 'Управління ризиками ІБ',
+             'Управління вразливостями', 'Навчання та обізнаність', 'Аудит ІБ', 'Безперервність бізнесу',
+             'Захист персональних даних', 'Криптографічний захист', 'Управління змінами',
+             'Контроль постачальників', 'Фізична безпека']
+PLAN_HOURS = {1.0: 18, 2.0: 16, 4.0: 12, 5.0: 9, 0.5: 8, 3.0: 7, 8.0: 6, 16.0: 4, 6.0: 3, 10.0: 2, None: 1}
+MONTH_WEIGHTS = [2856, 2562, 3352, 2976, 2378, 2150, 1407, 1226, 1534, 1606, 1791, 2079]
+ALL_COMPANIES_SHARE = 0.6  # остальные задачи - на 1-3 предприятия
+UNMAPPED_PROCESS_SHARE = 0.05  # недельные планы без _process_id
+QUARTERLY_COVERAGE = 0.85  # доля (отдел, процесс, квартал) с квартальным планом
+
+
+def parse_size(value):
+    """'100k' / '1m' / '25000' -> число строк"""
+    value = value.lower().replace('_', '')
+    if value in SIZES:
+        return SIZES[value]
+    if value[-1:] in ('k', 'm'):
+        return int(float(value[:-1]) * (1000 if value[-1] == 'k' else 1_000_000))
+    return int(value)
+
+
+def _zipf(n, s=1.1):
+    return [1 / (i + 1) ** s for i in range(n)]
+
+
+class BdibShape:
+    """Справочники и веса для заданного числа строк; всё детерминировано seed"""
+
+    def __init__(self, n_rows, seed=42):
+        self.rnd = random.Random(seed)
+        n_employees = max(len(DEPARTMENTS), round(n_rows * EMPLOYEES_PER_25K_ROWS / 25_000))
+        self.departments = list(DEPARTMENTS)
+        self.dept_weights = list(DEPARTMENTS.values())
+        self.employees = {}
+        for dept, share in DEPARTMENTS.items():
+            count = max(1, round(n_employees * share))
+            self.employees[dept] = ([f'{dept} співробітник {i + 1}' for i in range(count)], _zipf(count))
+        # У каждого отдела свой порядок процессов по частоте
+        self.processes = {}
+        for dept in self.departments:
+            rest = PROCESSES[1:]
+            self.rnd.shuffle(rest)
+            self.processes[dept] = ([PROCESSES[0], *rest], _zipf(len(PROCESSES), 1.3))
+        self.days_by_month = [[datetime(YEAR, m, d) for d in range(1, 32) if _valid(YEAR, m, d)] for m in range(1, 13)]
+
+    def tasks(self, n_rows):
+        """Задачи: (process, main_task, dept, employee, plan_hours, plan_date, task, fact_date, companies, spent)"""
+        rnd = self.rnd
+        produced = 0
+        i = 0
+        while produced < n_rows:
+            dept = rnd.choices(self.departments, self.dept_weights)[0]
+            employees, employee_weights = self.employees[dept]
+            processes, process_weights = self.processes[dept]
+            process = rnd.choices(processes, process_weights)[0]
+            plan_date = rnd.choice(self.days_by_month[rnd.choices(range(12), MONTH_WEIGHTS)[0]])
+            plan_hours = rnd.choices(list(PLAN_HOURS), list(PLAN_HOURS.values()))[0]
+            done = rnd.random() < 0.999
+            companies = COMPANIES if rnd.random() < ALL_COMPANIES_SHARE else rnd.sample(COMPANIES, rnd.randint(1, 3))
+            companies = companies[:n_rows - produced]
+            yield (
+                process, f'{process}: напрям {rnd.randrange(12) + 1}', dept,
+                rnd.choices(employees, employee_weights)[0], plan_hours, plan_date,
+                f'Задача {i + 1}. Аналіз та підготовка документа',
+                plan_date + timedelta(days=rnd.randrange(5)) if done else None,
+                companies, (plan_hours or 1.0) * rnd.uniform(0.5, 1.2) if done else None,
+            )
+            produced += len(companies)
+            i += 1
+
+
+def _valid(year, month, day):
+    try:
+        datetime(year, month, day)
+        return True
+    except ValueError:
+        return False
+
+
+def synthetic_rows(n_rows, seed=42):
+    """Строки листа bdib (values_only=True) списком - для бенчмарков форматирования"""
+    return [row for task in BdibShape(n_rows, seed).tasks(n_rows) for row in sheet_rows(task)]
+
+
+def sheet_rows(task):
+    """Задача -> строки листа (по строке на предприятие) в порядке COLUMNS"""
+    process, main_task, dept, employee, plan_hours, plan_date, name, fact_date, companies, spent = task
+    fact_hours = spent / len(companies) if spent is not None else None
+    week = f'{plan_date.isocalendar()[1]} {plan_date.year}'
+    for company in companies:
+        yield (process, main_task, dept, employee, plan_hours, plan_date, name, fact_date,
+               None, None, company, fact_hours, week)
+
+
+def generate(n_rows, output_dir, excel=True, seed=42):
+    """
+    Записать bdib_synthetic.xlsx (если excel) и JSON-файлы импорта в output_dir.
+    Один проход по задачам: строки листа и weekly_tasks пишутся потоково,
+    в памяти только справочники и недельные планы. Вернуть {файл: строк}.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    shape = BdibShape(n_rows, seed)
+    rnd = random.Random(seed + 1)
+    new_id = lambda: str(uuid.UUID(int=rnd.getrandbits(128)))
+
+    process_ids = {p: new_id() for p in PROCESSES}
+    department_ids = {d: new_id() for d in DEPARTMENTS}
+    company_ids = {c: new_id() for c in COMPANIES}
+    user_ids = {e: new_id() for names, _ in shape.employees.values() for e in names}
+    unmapped = {p for p in PROCESSES if rnd.random() < UNMAPPED_PROCESS_SHARE}
+
+    weekly = {}  # (сотрудник, процесс, понедельник) -> план
+    counts = {'rows': 0, 'weekly_tasks': 0}
+
+    book_path = os.path.join(output_dir, 'bdib_synthetic.xlsx')
+    wb = ws = None
+    if excel:
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet('bdib')
+        ws.append(EXCEL_HEADERS)
+
+    with atomic_open(os.path.join(output_dir, 'weekly_tasks.json'), binary=True) as f:
+        tasks = RowWriter(f, ndjson=False)
+        for task in shape.tasks(n_rows):
+            process, main_task, dept, employee, plan_hours, plan_date, name, fact_date, companies, spent = task
+            monday = plan_date - timedelta(days=plan_date.weekday())
+            key = (employee, process, monday)
+            plan = weekly.get(key)
+            if plan is None:
+                plan = weekly[key] = {
+                    'weekly_id': new_id(), 'weekly_date': monday.strftime('%Y-%m-%d'),
+                    'expected_result': main_task, 'planned_hours': 0.0, 'quarterly_id': None,
+                    '_process_id': None if process in unmapped else process_ids[process],
+                    '_process_excel': process, '_department_id': department_ids[dept],
+                    '_user_id': user_ids[employee], '_companies': set(),
+                }
+            plan['planned_hours'] += plan_hours or 0
+            plan['_companies'].update(companies)
+            if spent is not None:
+                tasks.write({
+                    'weekly_tasks_id': new_id(), 'weekly_plan_id': plan['weekly_id'], 'user_id': user_ids[employee],
+                    'spent_hours': round(spent, 2), 'description': name,
+                    'completed_at': fact_date.strftime('%Y-%m-%d'),
+                })
+            if ws is not None:
+                for row in sheet_rows(task):
+                    ws.append(row)
+            counts['rows'] += len(companies)
+        counts['weekly_tasks'] = tasks.close()
+
+    if wb is not None:
+        wb.save(book_path)
+        counts['bdib_synthetic.xlsx'] = counts['rows']
+
+    quarterly = [
+        {'quarterly_id': new_id(), 'process_id': process_ids[p], 'department_id': department_ids[d],
+         'quarter': q, 'process_name': p, 'expected_result': f'{p}: результат за {q} квартал'}
+        for d in DEPARTMENTS for p in PROCESSES for q in range(1, 5) if rnd.random() < QUARTERLY_COVERAGE
+    ]
+    plans = list(weekly.values())
+    assignees = [{'weekly_plan_id': p['weekly_id'], 'user_id': p['_user_id']} for p in plans]
+    companies = [{'weekly_id': p['weekly_id'], 'company_id': company_ids[c]}
+                 for p in plans for c in sorted(p['_companies'])]
+    for p in plans:
+        del p['_companies']
+        p['planned_hours'] = round(p['planned_hours'], 2)
+
+    for name, rows in (('quarterly_plans', quarterly), ('weekly_plans_full', plans),
+                       ('weekly_plan_assignees', assignees), ('weekly_plan_companies', companies)):
+        counts[name] = write_rows(os.path.join(output_dir, f'{name}.json'), rows)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Синтетические данные в форме bdib')
+    parser.add_argument('--rows', default='10k', help=f'Строк листа: число или {", ".join(SIZES)}')
+    parser.add_argument('--output-dir', required=True, help='Каталог для книги и JSON')
+    parser.add_argument('--no-excel', action='store_true', help='Только JSON-файлы импорта')
+    parser.add_argument('--seed', type=int, default=42)
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with instrument.session('synthetic_data', args), instrument.stage('generate') as st:
+        counts = generate(parse_size(args.rows), args.output_dir, not args.no_excel, args.seed)
+        st.add(rows=counts['rows'])
+    print(f'Готово за {time.perf_counter() - start:.1f} s -> {args.output_dir}')
+    for name, n in counts.items():
+        print(f'  {name}: {n}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""Скрипты импортируют соседей напрямую (import instrument), как при запуске из scripts/"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import os
+
+import openpyxl
+
+from excel_to_csv import plan_jobs, unique_filename
+
+
+def out_dirs(jobs, root):
+    return [os.path.relpath(job[2], root) for job in jobs]
+
+
+def test_unique_filename_is_case_insensitive():
+    assert unique_filename('ОКБ', '.csv', []) == 'ОКБ.csv'
+    assert unique_filename('all_data', '.csv', ['ALL_DATA.csv']) == 'all_data_2.csv'
+    assert unique_filename('a', '', ['a', 'A_2']) == 'a_3'
+
+
+def test_same_stem_books_get_separate_dirs(tmp_path):
+    out = tmp_path / 'out'
+    inputs = [str(tmp_path / 'a' / 'book.xlsx'), str(tmp_path / 'b' / 'book.xlsx')]
+    jobs = plan_jobs(inputs, all_sheets=False, output_dir=str(out))
+    assert out_dirs(jobs, out) == ['book', 'book_2']
+
+
+def test_same_book_listed_twice_is_planned_once(tmp_path):
+    out = tmp_path / 'out'
+    path = str(tmp_path / 'book.xlsx')
+    jobs = plan_jobs([path, path, f'{path}::Лист', f'{path}::Лист'], all_sheets=False, output_dir=str(out))
+    assert [(job[1], os.path.relpath(job[2], out)) for job in jobs] == [
+        (None, 'book'), ('Лист', os.path.join('book', 'Лист'))]
+
+
+def test_sheets_with_same_safe_name_get_separate_dirs(tmp_path):
+    path = tmp_path / 'book.xlsx'
+    wb = openpyxl.Workbook()
+    wb.active.title = 'A B'
+    wb.create_sheet('A_B')
+    wb.create_sheet('План')
+    wb.save(path)
+
+    out = tmp_path / 'out'
+    jobs = plan_jobs([str(path)], all_sheets=True, output_dir=str(out))
+    assert [job[1] for job in jobs] == ['A B', 'A_B', 'План']
+    assert out_dirs(jobs, out) == [os.path.join('book', name) for name in ('A_B', 'A_B_2', 'План')]
+
+
+def test_unreadable_book_is_one_job(tmp_path):
+    path = tmp_path / 'broken.xlsx'
+    path.write_bytes(b'not a zip')
+    jobs = plan_jobs([str(path)], all_sheets=True, output_dir=str(tmp_path / 'out'))
+    assert [(job[1], out_dirs([job], tmp_path / 'out')[0]) for job in jobs] == [(None, 'broken')]
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from link_weekly_to_quarterly import build_quarterly_index, link_keys, monthly_key_columns, weekly_key_columns
+
+
+def test_plan_without_year_matches_any_year():
+    index = build_quarterly_index([{'quarterly_id': 'q1', 'process_id': 'p', 'quarter': 1}])
+    weekly = [{'_process_id': 'p', 'weekly_date': '2024-01-08'},
+              {'_process_id': 'p', 'weekly_date': '2025-03-31'},
+              {'_process_id': 'p', 'weekly_date': '2025-04-07'}]
+    assert link_keys(index, *weekly_key_columns(weekly)) == ['q1', 'q1', None]
+
+
+def test_plan_with_year_matches_only_its_year():
+    index = build_quarterly_index([{'quarterly_id': 'q1', 'process_id': 'p', 'quarter': 4, 'year': 2025}])
+    weekly = [{'_process_id': 'p', 'weekly_date': '2025-12-29'},
+              {'_process_id': 'p', 'weekly_date': '2024-12-30'}]
+    assert link_keys(index, *weekly_key_columns(weekly)) == ['q1', None]
+
+
+def test_own_year_wins_over_plan_without_year():
+    index = build_quarterly_index([
+        {'quarterly_id': 'any', 'process_id': 'p', 'quarter': 2},
+        {'quarterly_id': 'y2025', 'process_id': 'p', 'quarter': 2, 'year': '2025'},
+    ])
+    weekly = [{'_process_id': 'p', 'weekly_date': '2025-05-05'},
+              {'_process_id': 'p', 'weekly_date': '2026-05-04'}]
+    assert link_keys(index, *weekly_key_columns(weekly)) == ['y2025', 'any']
+
+
+def test_first_duplicate_wins_and_missing_process_is_not_linked():
+    index = build_quarterly_index([
+        {'quarterly_id': 'first', 'process_id': 'p', 'quarter': 3},
+        {'quarterly_id': 'second', 'process_id': 'p', 'quarter': 3},
+    ])
+    weekly = [{'_process_id': None, 'weekly_date': '2025-07-07'},
+              {'_process_id': 'p', 'weekly_date': '2025-07-07'},
+              {'_process_id': 'p', 'weekly_date': ''}]
+    assert link_keys(index, *weekly_key_columns(weekly)) == [None, 'first', None]
+
+
+def test_monthly_plans_use_year_and_month():
+    index = build_quarterly_index([{'quarterly_id': 'q3', 'process_id': 'p', 'quarter': 3, 'year': 2025}])
+    monthly = [{'process_id': 'p', 'year': 2025, 'month': 9},
+               {'_process_id': 'p', 'year': 2025, 'month': 10},
+               {'process_id': 'p', 'year': 2024, 'month': 9},
+               {'process_id': 'p', 'year': 2025, 'month': 13}]
+    assert link_keys(index, *monthly_key_columns(monthly)) == ['q3', None, None, None]
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+import supabase_loader
+from supabase_loader import BulkLoader
+
+
+class FakeLoader(BulkLoader):
+    """_send без сети: строки с "bad" отвергаются статусом reject_status"""
+
+    def __init__(self, tmp_path, reject_status=409, responses=()):
+        super().__init__('http://postgrest.test', 'key', workers=1, dead_letter_dir=str(tmp_path))
+        self.reject_status = reject_status
+        self.responses = list(responses)
+        self.sent = []
+
+    def _send(self, table_name, batch, on_conflict=None):
+        self.sent.append(len(batch))
+        if self.responses:
+            return self.responses.pop(0)
+        if any(b'"bad"' in raw for raw in batch):
+            return self.reject_status, '{"code":"23505","message":"duplicate key"}'
+        return 201, ''
+
+
+def encoded(*names):
+    return [json.dumps({'id': name}).encode() for name in names]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(supabase_loader, 'BACKOFF_BASE', 0)
+
+
+def test_bisect_isolates_rejected_row(tmp_path):
+    loader = FakeLoader(tmp_path)
+    batch = encoded('a', 'b', 'c', 'bad', 'e', 'f', 'g', 'h')
+    inserted, failed = loader.post_batch('weekly_plans', batch)
+    assert inserted == 7
+    assert [(raw, status) for raw, status, _ in failed] == [(batch[3], 409)]
+    # Целые половины без плохой строки уходят одним запросом
+    assert loader.sent == [8, 4, 2, 2, 1, 1, 4]
+
+
+@pytest.mark.parametrize('status', [400, 409])
+def test_row_level_rejections_are_bisected(tmp_path, status):
+    loader = FakeLoader(tmp_path, reject_status=status)
+    inserted, failed = loader.post_batch('weekly_plans', encoded('bad', 'b', 'c', 'bad'))
+    assert inserted == 2
+    assert len(failed) == 2
+
+
+@pytest.mark.parametrize('status', [401, 403, 404])
+def test_fatal_status_fails_whole_batch_without_bisecting(tmp_path, status):
+    loader = FakeLoader(tmp_path, responses=[(status, 'denied')])
+    batch = encoded('a', 'b', 'c', 'd')
+    inserted, failed = loader.post_batch('weekly_plans', batch)
+    assert inserted == 0
+    assert [raw for raw, _, _ in failed] == batch
+    assert loader.sent == [4]
+
+
+def test_transient_error_is_retried_before_bisecting(tmp_path):
+    loader = FakeLoader(tmp_path, responses=[(503, 'busy')])
+    inserted, failed = loader.post_batch('weekly_plans', encoded('a', 'b'))
+    assert (inserted, failed) == (2, [])
+    assert loader.sent == [2, 2]
+
+
+def test_import_rows_counts_failures(tmp_path):
+    loader = FakeLoader(tmp_path)
+    rows = [{'id': name} for name in ('a', 'bad', 'c')]
+    loader.import_rows('weekly_plans', rows, total=len(rows))
+    assert loader.failed_count() == 1
+    assert loader.failures == {'weekly_plans': 1}
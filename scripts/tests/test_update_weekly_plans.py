@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from update_weekly_plans import _key_of, compute_delta, row_hash
+
+
+def test_compute_delta_splits_inserts_updates_deletes():
+    local = {('a',): b'1', ('b',): b'2', ('c',): b'3'}
+    remote = {('b',): b'2', ('c',): b'old', ('d',): b'4'}
+    inserts, updates, deletes = compute_delta(local, remote)
+    assert inserts == {('a',)}
+    assert updates == {('c',)}
+    assert deletes == {('d',)}
+
+
+def test_compute_delta_no_changes():
+    index = {('a',): b'1'}
+    assert compute_delta(index, dict(index)) == (set(), set(), set())
+
+
+def test_float_and_int_from_db_are_same_row():
+    # 8.0 из JSON и 8 из numeric-колонки не должны давать лишних обновлений
+    key = _key_of(('weekly_id',))
+    local_row = {'weekly_id': 'w1', 'planned_hours': 8.0, 'quarterly_id': None}
+    remote_row = {'quarterly_id': None, 'planned_hours': 8, 'weekly_id': 'w1'}
+    local = {key(local_row): row_hash(local_row)}
+    remote = {key(remote_row): row_hash(remote_row)}
+    assert compute_delta(local, remote) == (set(), set(), set())
+
+
+def test_junction_key_canonicalizes_numbers():
+    key = _key_of(('weekly_id', 'company_id'))
+    assert key({'weekly_id': 'w1', 'company_id': 3.0}) == key({'company_id': 3, 'weekly_id': 'w1'})
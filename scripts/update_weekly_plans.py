@@ -2,76 +2,262 @@
 # -*- coding: utf-8 -*-
 """
 Обновление недельных планов в Supabase с quarterly_id.
+
+По умолчанию - синхронизация дельтой: читаем из БД ключи и хеши строк,
+локально считаем вставки/изменения/удаления и отправляем только их
+(upsert через on_conflict, удаление по ключам). Таблицы не пустеют ни на миг,
+а время работы зависит от размера изменений, а не таблиц.
+--full-reload - старый режим "удалить всё и вставить заново".
+
+--staging: ключи и хеши файла и БД загружаются в SQLite (см. staging),
+дельта - запросы по индексу (key, hash), а строки на upsert читаются из
+базы постранично. Словари ключей в памяти не строятся.
 """
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
+import argparse
+import hashlib
+import itertools
 import json
 import os
-import requests
 from dotenv import load_dotenv
 
+import instrument
+import staging
+from jsonio import iter_json_rows, resolve_import_file
+from supabase_loader import DEFAULT_GZIP, DEFAULT_WORKERS, BulkLoader
+
 # Загружаем .env.local
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env.local'))
 
 SUPABASE_URL = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 
-IMPORT_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'import')
+IMPORT_DIR = os.getenv('IMPORT_DIR') or os.path.join(os.path.dirname(__file__), '..', 'data', 'import')
 
-HEADERS = {
-    'apikey': SUPABASE_KEY,
-    'Authorization': f'Bearer {SUPABASE_KEY}',
-    'Content-Type': 'application/json',
-    'Prefer': 'return=minimal'
-}
+# Порядок важен: внешние ключи (upsert - сверху вниз, удаление - снизу вверх).
+# Ключ None - таблица-связка, строка идентифицируется всеми своими колонками.
+SYNC_TABLES = [
+    ('weekly_plans', 'weekly_plans.json', ('weekly_id',)),
+    ('weekly_plan_assignees', 'weekly_plan_assignees.json', None),
+    ('weekly_plan_companies', 'weekly_plan_companies.json', None),
+    ('weekly_tasks', 'weekly_tasks.json', ('weekly_tasks_id',)),
+]
 
-BATCH_SIZE = 500
 
-
-def delete_all(table_name):
+def delete_all(loader, table_name, column):
     """Удалить все записи из таблицы"""
     # Используем фильтр который всегда true
-    url = f'{SUPABASE_URL}/rest/v1/{table_name}?weekly_id=neq.00000000-0000-0000-0000-000000000000'
-    response = requests.delete(url, headers=HEADERS)
-    return response.status_code in (200, 204)
+    url = f'{loader.table_url(table_name)}?{column}=neq.00000000-0000-0000-0000-000000000000'
+    response = loader.session.delete(url)
+    return response.status_code
 
 
-def import_table(table_name, json_file):
+def import_table(loader, table_name, json_file):
     """Импорт данных в таблицу"""
-    filepath = os.path.join(IMPORT_DIR, json_file)
+    with instrument.stage(f'import:{table_name}', loader, table_name):
+        return loader.import_file(table_name, os.path.join(IMPORT_DIR, json_file))
 
-    with open(filepath, 'r', encoding='utf-8') as f:
-        data = json.load(f)
 
-    total = len(data)
-    print(f'  📦 {table_name}: {total} записей...', end=' ', flush=True)
+def _canon(value):
+    # 8.0 из JSON и 8 из numeric-колонки - одно и то же
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
 
-    imported = 0
-    errors = 0
 
-    for i in range(0, total, BATCH_SIZE):
-        batch = data[i:i + BATCH_SIZE]
+def _key_of(key_cols):
+    """Ключ строки в каноническом виде: одинаковый для файла, БД и фильтра upsert"""
+    return lambda row: tuple(_canon(row.get(c)) for c in key_cols)
 
-        url = f'{SUPABASE_URL}/rest/v1/{table_name}'
-        response = requests.post(url, headers=HEADERS, json=batch)
 
-        if response.status_code in (200, 201):
-            imported += len(batch)
-            pct = 100 * imported / total
-            print(f'\r  📦 {table_name}: {imported}/{total} ({pct:.0f}%)', end='', flush=True)
-        else:
-            errors += len(batch)
-            print(f'\n  ❌ Ошибка: {response.status_code} - {response.text[:200]}')
+def row_hash(row):
+    """Хеш строки без учёта порядка ключей; отсутствующая колонка == null"""
+    items = sorted((k, _canon(v)) for k, v in row.items() if v is not None)
+    return hashlib.blake2b(json.dumps(items, ensure_ascii=False, default=str).encode('utf-8'), digest_size=16).digest()
 
-    if errors == 0:
-        print(f'\r  ✅ {table_name}: {imported} записей импортировано')
-    else:
-        print(f'\r  ⚠️  {table_name}: {imported} OK, {errors} ошибок')
 
-    return imported
+def local_index(path, key_cols):
+    """
+    Пройти файл потоково: {ключ: хеш}, ключевые колонки и все колонки файла.
+    Для таблиц-связок ключ - все колонки первой строки.
+    """
+    index, columns, key = {}, {}, None
+    for row in iter_json_rows(path):
+        columns.update(dict.fromkeys(row))
+        if key_cols is None:
+            key_cols = tuple(sorted(row))
+        if key is None:
+            key = _key_of(key_cols)
+        index[key(row)] = row_hash(row)
+    return index, key_cols, list(columns)
+
+
+def remote_index(loader, table_name, key_cols, columns):
+    """{ключ: хеш} для строк таблицы в БД (только колонки, которые есть в файле)"""
+    key = _key_of(key_cols)
+    return {key(row): row_hash(row) for row in loader.fetch_rows(table_name, columns, key_cols)}
+
+
+def compute_delta(local, remote):
+    """Ключи на вставку, на обновление и на удаление"""
+    inserts = local.keys() - remote.keys()
+    updates = {k for k in local.keys() & remote.keys() if local[k] != remote[k]}
+    deletes = remote.keys() - local.keys()
+    return inserts, updates, deletes
+
+
+def sync(loader, dry_run=False):
+    """Синхронизировать таблицы дельтой"""
+    print('🔍 Сравнение с БД...')
+    plans = []
+    for table_name, json_file, declared_key in SYNC_TABLES:
+        path = resolve_import_file(os.path.join(IMPORT_DIR, json_file))
+        if path is None:
+            print(f'  ⚠️  Файл не найден: {json_file}, таблица пропущена')
+            continue
+        with instrument.stage(f'local_index:{table_name}') as st:
+            local, key_cols, columns = local_index(path, declared_key)
+            st.add(rows=len(local), bytes=os.path.getsize(path))
+        if not columns:
+            print(f'  ⚠️  Пустой файл: {json_file}, таблица пропущена')
+            continue
+        with instrument.stage(f'remote_index:{table_name}') as st:
+            remote = remote_index(loader, table_name, key_cols, columns)
+            st.add(rows=len(remote))
+        inserts, updates, deletes = compute_delta(local, remote)
+        print(f'  {table_name}: +{len(inserts)} ~{len(updates)} -{len(deletes)} (в файле {len(local)}, в БД {len(remote)})')
+        # Для связок обновлений не бывает - обычная вставка, без on_conflict
+        on_conflict = ','.join(key_cols) if declared_key else None
+        plans.append((table_name, path, key_cols, on_conflict, inserts | updates, deletes))
+
+    if dry_run:
+        return
+
+    print()
+    print('📥 Применение изменений...')
+    for table_name, path, key_cols, on_conflict, changed, _ in plans:
+        if not changed:
+            continue
+        key = _key_of(key_cols)
+        rows = (row for row in iter_json_rows(path) if key(row) in changed)
+        with instrument.stage(f'upsert:{table_name}', loader, table_name):
+            loader.import_rows(table_name, rows, total=len(changed), on_conflict=on_conflict)
+
+    for table_name, _, key_cols, _, _, deletes in reversed(plans):
+        if deletes:
+            with instrument.stage(f'delete:{table_name}') as st:
+                deleted = loader.delete_keys(table_name, key_cols, deletes)
+                st.add(rows=deleted)
+            print(f'  🗑️  {table_name}: удалено {deleted}')
+
+
+def sync_staged(loader, store, dry_run=False):
+    """sync() через хранилище: local_<таблица> и remote_<таблица>, дельта - SQL"""
+    print(f'🔍 Сравнение с БД (хранилище {store.path})...')
+    plans = []
+    for table_name, json_file, declared_key in SYNC_TABLES:
+        path = resolve_import_file(os.path.join(IMPORT_DIR, json_file))
+        if path is None:
+            print(f'  ⚠️  Файл не найден: {json_file}, таблица пропущена')
+            continue
+        rows = iter_json_rows(path)
+        first = next(rows, None)
+        if first is None:
+            print(f'  ⚠️  Пустой файл: {json_file}, таблица пропущена')
+            continue
+        key_cols = declared_key or tuple(sorted(first))
+        columns = dict.fromkeys(first)
+
+        def collect(rows):
+            for row in rows:
+                columns.update(dict.fromkeys(row))
+                yield row
+
+        local, remote = f'local_{table_name}', f'remote_{table_name}'
+        with instrument.stage(f'local_index:{table_name}') as st:
+            n_local = store.load_rows(local, collect(itertools.chain([first], rows)),
+                                      key=_key_of(key_cols), hash_row=row_hash)
+            st.add(rows=n_local, bytes=os.path.getsize(path))
+        with instrument.stage(f'remote_index:{table_name}') as st:
+            n_remote = store.load_rows(remote, loader.fetch_rows(table_name, list(columns), key_cols),
+                                       key=_key_of(key_cols), hash_row=row_hash, body=False)
+            st.add(rows=n_remote)
+        inserts, updates, deletes = store.delta_counts(local, remote)
+        print(f'  {table_name}: +{inserts} ~{updates} -{deletes} (в файле {n_local}, в БД {n_remote})')
+        on_conflict = ','.join(key_cols) if declared_key else None
+        plans.append((table_name, local, remote, key_cols, on_conflict, inserts + updates, deletes))
+
+    if dry_run:
+        return
+
+    print()
+    print('📥 Применение изменений...')
+    for table_name, local, remote, _, on_conflict, changed, _ in plans:
+        if not changed:
+            continue
+        with instrument.stage(f'upsert:{table_name}', loader, table_name):
+            loader.import_rows(table_name, store.changed_rows(local, remote),
+                               total=store.changed_count(local, remote), on_conflict=on_conflict)
+
+    for table_name, local, remote, key_cols, _, _, deletes in reversed(plans):
+        if deletes:
+            with instrument.stage(f'delete:{table_name}') as st:
+                deleted = loader.delete_keys(table_name, key_cols, store.deleted_keys(local, remote))
+                st.add(rows=deleted)
+            print(f'  🗑️  {table_name}: удалено {deleted}')
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Обновление недельных планов в Supabase')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_WORKERS,
+                        help=f'Батчей одновременно в полёте (по умолчанию {DEFAULT_WORKERS}, env IMPORT_WORKERS)')
+    parser.add_argument('--gzip', action='store_true', default=DEFAULT_GZIP,
+                        help='Сжимать тела запросов gzip (env IMPORT_GZIP=1)')
+    parser.add_argument('--full-reload', action='store_true', help='Удалить всё и импортировать заново')
+    parser.add_argument('--dry-run', action='store_true', help='Только показать дельту (режим синхронизации)')
+    staging.add_argument(parser)
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    with instrument.session('update_weekly_plans', args), \
+            BulkLoader(SUPABASE_URL, SUPABASE_KEY, workers=args.workers, gzip=args.gzip) as loader:
+        if args.full_reload:
+            failed = run(loader) + loader.failed_count()
+        else:
+            failed = run_sync(args, loader)
+    if failed:
+        sys.exit(1)
+
+
+def print_failures(loader):
+    print(f'⚠️  Не применено {loader.failed_count()} строк '
+          f'({", ".join(f"{t}: {n}" for t, n in loader.failures.items())}), см. {loader.dead_letter_dir}')
+
+
+def run_sync(args, loader):
+    """Синхронизация дельтой; вернуть число строк, которые не удалось записать или удалить"""
+    print('='*60)
+    print('СИНХРОНИЗАЦИЯ НЕДЕЛЬНЫХ ПЛАНОВ С SUPABASE')
+    print('='*60)
+    print(f'URL: {SUPABASE_URL}')
+    print()
+    if args.staging:
+        with staging.StagingStore(args.staging) as store:
+            sync_staged(loader, store, args.dry_run)
+    else:
+        sync(loader, args.dry_run)
+    print()
+    if loader.failed_count():
+        print_failures(loader)
+        print('❌ Синхронизация завершена частично')
+    else:
+        print('✅ Синхронизация завершена!')
+    return loader.failed_count()
+
+
+def run(loader):
+    """Полная перезагрузка; вернуть число таблиц, которые не удалось очистить"""
     print('='*60)
     print('ОБНОВЛЕНИЕ НЕДЕЛЬНЫХ ПЛАНОВ В SUPABASE')
     print('='*60)
@@ -81,37 +267,37 @@ def main():
     # 1. Удаляем связанные данные
     print('🗑️  Удаление старых данных...')
 
-    # Сначала задачи (зависят от weekly_plans)
-    url = f'{SUPABASE_URL}/rest/v1/weekly_tasks?weekly_plan_id=neq.00000000-0000-0000-0000-000000000000'
-    response = requests.delete(url, headers=HEADERS)
-    print(f'  weekly_tasks: {"OK" if response.status_code in (200, 204) else response.status_code}')
-
-    # Связи с сотрудниками
-    url = f'{SUPABASE_URL}/rest/v1/weekly_plan_assignees?weekly_plan_id=neq.00000000-0000-0000-0000-000000000000'
-    response = requests.delete(url, headers=HEADERS)
-    print(f'  weekly_plan_assignees: {"OK" if response.status_code in (200, 204) else response.status_code}')
-
-    # Связи с компаниями
-    url = f'{SUPABASE_URL}/rest/v1/weekly_plan_companies?weekly_id=neq.00000000-0000-0000-0000-000000000000'
-    response = requests.delete(url, headers=HEADERS)
-    print(f'  weekly_plan_companies: {"OK" if response.status_code in (200, 204) else response.status_code}')
-
-    # Сами недельные планы
-    url = f'{SUPABASE_URL}/rest/v1/weekly_plans?weekly_id=neq.00000000-0000-0000-0000-000000000000'
-    response = requests.delete(url, headers=HEADERS)
-    print(f'  weekly_plans: {"OK" if response.status_code in (200, 204) else response.status_code}')
+    # Сначала задачи (зависят от weekly_plans), затем связи и сами планы
+    not_cleared = 0
+    for table_name, column in (
+        ('weekly_tasks', 'weekly_plan_id'),
+        ('weekly_plan_assignees', 'weekly_plan_id'),
+        ('weekly_plan_companies', 'weekly_id'),
+        ('weekly_plans', 'weekly_id'),
+    ):
+        with instrument.stage(f'delete_all:{table_name}'):
+            status = delete_all(loader, table_name, column)
+        print(f'  {table_name}: {"OK" if status in (200, 204) else status}')
+        if status not in (200, 204):
+            not_cleared += 1
 
     print()
 
     # 2. Импортируем обновленные данные
     print('📥 Импорт обновленных данных...')
-    import_table('weekly_plans', 'weekly_plans.json')
-    import_table('weekly_plan_assignees', 'weekly_plan_assignees.json')
-    import_table('weekly_plan_companies', 'weekly_plan_companies.json')
-    import_table('weekly_tasks', 'weekly_tasks.json')
+    import_table(loader, 'weekly_plans', 'weekly_plans.json')
+    import_table(loader, 'weekly_plan_assignees', 'weekly_plan_assignees.json')
+    import_table(loader, 'weekly_plan_companies', 'weekly_plan_companies.json')
+    import_table(loader, 'weekly_tasks', 'weekly_tasks.json')
 
     print()
-    print('✅ Обновление завершено!')
+    if not_cleared or loader.failed_count():
+        if loader.failed_count():
+            print_failures(loader)
+        print(f'❌ Обновление завершено с ошибками (не очищено таблиц: {not_cleared})')
+    else:
+        print('✅ Обновление завершено!')
+    return not_cleared
 
 
 if __name__ == '__main__':